@@ -0,0 +1,8 @@
+"""
+Benchmarks
+==========
+Reproducible performance measurements for the RajaOngkir MCP server.
+
+Run from the repository root, e.g.:
+    python -m benchmarks.bench_response
+"""
@@ -0,0 +1,146 @@
+"""
+Location Tree Benchmark
+=======================
+Memory footprint and lookup speed of the full location hierarchy
+(38 provinces, 514 cities, 7277 districts, 83763 subdistricts) held as
+the plain dicts returned by extract_api_data ("dicts") versus the
+array-backed LocationTree ("tree"), and the cost of writing and mapping
+the same hierarchy as a location snapshot file ("snapshot").
+
+Memory is measured with tracemalloc while building each representation
+from the same JSON response bodies, parsed inside the measurement as the
+server would, so only what the representation keeps alive is counted.
+
+Usage:
+    python -m benchmarks.bench_location_tree [--repeat 2000] [--json out.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+from src.location_snapshot import LocationSnapshot, write_snapshot
+from src.location_tree import LocationTree
+
+from .fixtures import hierarchy
+
+
+Bodies = list[tuple[str, int | None, str]]
+
+
+def _bodies() -> Bodies:
+    """Every child list as a JSON body."""
+    return [(level, parent, json.dumps(rows)) for level, parent, rows in hierarchy()]
+
+
+def build_dicts(bodies: Bodies) -> dict[Any, list[dict[str, Any]]]:
+    """Child lists keyed by (level, parent), as a dict cache would keep them."""
+    return {(level, parent): json.loads(body) for level, parent, body in bodies}
+
+
+def build_tree(bodies: Bodies) -> LocationTree:
+    tree = LocationTree()
+    for level, parent, body in bodies:
+        tree.set_children(level, parent, json.loads(body))
+    return tree
+
+
+def _retained(build: Any, bodies: Bodies) -> tuple[Any, int, float]:
+    """Build under tracemalloc; return the result, bytes kept alive and build time."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = build(bodies)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, after - before, elapsed
+
+
+def _per_call_us(function: Any, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000, help="Lookups per timing")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    bodies = _bodies()
+    dicts, dict_bytes, dict_build = _retained(build_dicts, bodies)
+    tree, tree_bytes, tree_build = _retained(build_tree, bodies)
+    tree.get("subdistrict", 0)  # build the lookup index outside the timings
+
+    district = bodies[-1][1]
+    subdistrict_id = json.loads(bodies[-1][2])[-1]["id"]
+    results = {
+        "locations": len(tree),
+        "dicts": {
+            "retained_mib": round(dict_bytes / 2**20, 2),
+            "build_ms": round(dict_build * 1000, 1),
+            "list_subdistricts_us": round(_per_call_us(lambda: dicts[("subdistrict", district)], args.repeat), 2),
+        },
+        "tree": {
+            "retained_mib": round(tree_bytes / 2**20, 2),
+            "build_ms": round(tree_build * 1000, 1),
+            "list_subdistricts_us": round(
+                _per_call_us(lambda: tree.children_records("subdistrict", district), args.repeat), 2
+            ),
+            "get_us": round(_per_call_us(lambda: tree.get("subdistrict", subdistrict_id), args.repeat), 2),
+            "ancestors_us": round(
+                _per_call_us(lambda: tree.ancestors("subdistrict", subdistrict_id), args.repeat), 2
+            ),
+            "stats": tree.stats(),
+        },
+    }
+    results["memory_ratio"] = round(dict_bytes / tree_bytes, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "locations.snap")
+        start = time.perf_counter()
+        summary = write_snapshot(tree, path)
+        write_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        snapshot = LocationSnapshot(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        results["snapshot"] = {
+            "file_mib": round(summary["bytes"] / 2**20, 2),
+            "write_ms": round(write_ms, 1),
+            "open_ms": round(open_ms, 3),
+            "list_subdistricts_us": round(
+                _per_call_us(lambda: snapshot.children_records("subdistrict", district), args.repeat), 2
+            ),
+            "get_us": round(_per_call_us(lambda: snapshot.get("subdistrict", subdistrict_id), args.repeat), 2),
+        }
+        del snapshot
+
+    print(f"{'':<8}{'retained MiB':>14}{'build ms':>10}{'list us':>10}")
+    for name in ("dicts", "tree"):
+        row = results[name]
+        print(f"{name:<8}{row['retained_mib']:>14}{row['build_ms']:>10}{row['list_subdistricts_us']:>10}")
+    tree_row = results["tree"]
+    print(f"tree get {tree_row['get_us']} us, ancestors {tree_row['ancestors_us']} us, "
+          f"{results['memory_ratio']}x less memory for {results['locations']} locations")
+    snapshot_row = results["snapshot"]
+    print(f"snapshot {snapshot_row['file_mib']} MiB, write {snapshot_row['write_ms']} ms, "
+          f"open {snapshot_row['open_ms']} ms, list {snapshot_row['list_subdistricts_us']} us, "
+          f"get {snapshot_row['get_us']} us")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
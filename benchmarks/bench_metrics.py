@@ -0,0 +1,70 @@
+"""
+Metrics Overhead Benchmark
+==========================
+Measures the hot-path cost of the metrics layer: the per-call overhead of
+instrument_tool around a tool (untraced and with every call traced), and
+the raw cost of counter, gauge and histogram updates.
+
+Usage:
+    python -m benchmarks.bench_metrics [--calls 200000]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any
+
+from src.instrument import instrument_tool
+from src.metrics import Counter, Gauge, Histogram
+from src.tracing import create_exporter, tracer
+
+
+async def _noop_tool(query: str) -> dict[str, Any]:
+    return {"success": True, "data": query}
+
+
+async def _time_calls(fn: Any, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fn("x")
+    return (time.perf_counter() - start) / calls
+
+
+def _time_op(op: Any, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        op()
+    return (time.perf_counter() - start) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    bare = asyncio.run(_time_calls(_noop_tool, args.calls))
+    wrapped = asyncio.run(_time_calls(instrument_tool(_noop_tool), args.calls))
+    tracer.sample_rate, tracer.exporter = 1.0, create_exporter("none", "")
+    traced = asyncio.run(_time_calls(instrument_tool(_noop_tool), args.calls))
+    tracer.sample_rate = 0.0
+
+    counter = Counter("bench_total", "bench", ("tool", "outcome"))
+    gauge = Gauge("bench_in_flight", "bench", ("tool",))
+    histogram = Histogram("bench_seconds", "bench", ("tool",))
+    labels = ("get_provinces",)
+
+    results = {
+        "tool call, bare": bare,
+        "tool call, instrumented": wrapped,
+        "instrumentation overhead per call": wrapped - bare,
+        "tool call, instrumented and traced": traced,
+        "counter.inc": _time_op(lambda: counter.inc(("get_provinces", "success")), args.calls),
+        "gauge.inc": _time_op(lambda: gauge.inc(labels), args.calls),
+        "histogram.observe": _time_op(lambda: histogram.observe(labels, 0.042), args.calls),
+    }
+    for name, seconds in results.items():
+        print(f"{name:<36}{seconds * 1e9:>10.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Offload Benchmark
+=================
+Event loop lag under mixed load, with large list responses built on the
+loop ("inline") versus in the worker pool ("process").
+
+Each round runs on one event loop:
+
+- `--clients` tasks that repeatedly build a whole subdistrict list of
+  `--items` records and hand it through FastMCP's result conversion, as a
+  location tool with paging disabled does
+- a stream of short I/O-bound calls (a 5 ms sleep each), whose latency
+  above 5 ms is the delay other sessions see
+- a LoopLagMonitor sampling every 10 ms
+
+It reports lists per second, loop lag p50/p99/max, the share of lag
+samples over the budget, and the extra latency of the short calls.
+
+Usage:
+    python -m benchmarks.bench_offload [--items 2000 20000] [--clients 4] [--seconds 3]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any
+
+import jsonschema
+from mcp.server.fastmcp.utilities.func_metadata import func_metadata
+from mcp.types import CallToolResult
+
+from src.offload import LoopLagMonitor, offload_list_response, worker_pool
+from src.response import EncodedResponse
+
+from . import fixtures
+
+
+async def _tool() -> dict[str, Any]:
+    """Stand-in with the same return annotation as the real tools."""
+    return {}
+
+
+_METADATA = func_metadata(_tool)
+
+
+def _wire(result: Any) -> bytes:
+    """What FastMCP and the low-level server send for a tool result."""
+    if isinstance(result, EncodedResponse):
+        result = result.tool_result
+    converted = _METADATA.convert_result(result)
+    if isinstance(converted, CallToolResult):
+        return converted.model_dump_json(by_alias=True, exclude_none=True).encode()
+    content, structured = converted
+    jsonschema.validate(instance=structured, schema=_METADATA.output_schema)
+    wire = CallToolResult(content=content, structuredContent=structured)
+    return wire.model_dump_json(by_alias=True, exclude_none=True).encode()
+
+
+class _Recorder(LoopLagMonitor):
+    """Lag monitor that keeps its samples."""
+
+    def __init__(self, interval_ms: float, budget_ms: float) -> None:
+        super().__init__(interval_ms, budget_ms)
+        self.samples: list[float] = []
+
+    def observe(self, lag: float) -> None:
+        self.samples.append(lag)
+
+
+def _quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+async def _round(items: list[dict[str, Any]], clients: int, seconds: float, budget_ms: float) -> dict[str, Any]:
+    monitor = _Recorder(10.0, budget_ms)
+    await monitor.start()
+    stop = time.perf_counter() + seconds
+    built = 0
+    io_delays: list[float] = []
+
+    async def client() -> None:
+        nonlocal built
+        while time.perf_counter() < stop:
+            _wire(await offload_list_response(items, "subdistricts", page_size=0))
+            built += 1
+            # The transport write between calls lets other tasks run
+            await asyncio.sleep(0)
+
+    async def io_calls() -> None:
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            io_delays.append(time.perf_counter() - start - 0.005)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)), io_calls())
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    lags = monitor.samples
+    return {
+        "lists_per_s": round(built / elapsed, 1),
+        "lag_p50_ms": round(_quantile(lags, 0.50) * 1000, 2),
+        "lag_p99_ms": round(_quantile(lags, 0.99) * 1000, 2),
+        "lag_max_ms": round(max(lags, default=0.0) * 1000, 2),
+        "over_budget": round(sum(lag > monitor.budget for lag in lags) / max(len(lags), 1), 3),
+        "io_extra_p50_ms": round(statistics.median(io_delays) * 1000, 2) if io_delays else 0.0,
+        "io_extra_p99_ms": round(_quantile(io_delays, 0.99) * 1000, 2),
+    }
+
+
+async def _main(args: argparse.Namespace) -> list[dict[str, Any]]:
+    workers = worker_pool.workers or 2
+    rows = []
+    for count in args.items:
+        items = fixtures.subdistricts(1391, count=count)["data"]
+        for mode in ("inline", "process"):
+            worker_pool.workers = 0 if mode == "inline" else workers
+            worker_pool.min_items = 1
+            if mode == "process":
+                worker_pool.start()
+                # Let the spawned workers finish importing before measuring
+                await worker_pool.run("warmup", int)
+                await offload_list_response(items[:10], page_size=0)
+            result = await _round(items, args.clients, args.seconds, args.budget_ms)
+            rows.append({"items": count, "mode": mode, **result})
+    await worker_pool.stop()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[2000, 20000], help="Records per list")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent large-list callers")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each round")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Loop lag budget")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    rows = asyncio.run(_main(args))
+    print(
+        f"{'items':>6}  {'mode':<8}{'lists/s':>9}{'lag p50':>9}{'lag p99':>9}{'lag max':>9}"
+        f"{'>budget':>9}{'io +p50':>9}{'io +p99':>9}"
+    )
+    for row in rows:
+        print(
+            f"{row['items']:>6}  {row['mode']:<8}{row['lists_per_s']:>9}{row['lag_p50_ms']:>9}"
+            f"{row['lag_p99_ms']:>9}{row['lag_max_ms']:>9}{row['over_budget']:>9.1%}"
+            f"{row['io_extra_p50_ms']:>9}{row['io_extra_p99_ms']:>9}"
+        )
+    print("lag and io columns in ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Response Payload Benchmark
+==========================
+Measures payload bytes and build + serialisation time of tool responses
+for recorded payloads, comparing the default JSON output ("before") with
+field projection and the compact (columns + rows) encoding.
+
+Serialisation goes through FastMCP's own result conversion for a tool
+returning dict[str, Any] (indented text content plus structured content),
+then dumps the CallToolResult as it is sent over the wire.
+
+Usage:
+    python -m benchmarks.bench_response [--repeat 200] [--json out.json]
+"""
+
+import argparse
+import json
+import time
+from typing import Any
+
+from mcp.server.fastmcp.utilities.func_metadata import func_metadata
+from mcp.types import CallToolResult
+
+from src.response import extract_api_data, list_response, success_response
+
+from .fixtures import RECORDED
+
+# Field selections an agent would typically ask for per scenario
+SCENARIO_FIELDS = {
+    "provinces": ["id", "name"],
+    "cities": ["id", "name"],
+    "districts": ["id", "name"],
+    "subdistricts": ["id", "name"],
+    "domestic_search": ["id", "label"],
+    "district_cost_3_couriers": ["code", "service", "cost", "etd"],
+    "tracking": ["summary.status", "delivery_status", "manifest"],
+}
+
+VARIANTS = [
+    ("json", None, "json"),
+    ("compact", None, "compact"),
+    ("fields", "fields", "json"),
+    ("fields+compact", "fields", "compact"),
+]
+
+
+def _build(data: Any, fields: list[str] | None, response_format: str) -> dict[str, Any]:
+    if isinstance(data, list):
+        return list_response(data, "items", fields, response_format, page_size=0)
+    return success_response(data, fields=fields, response_format=response_format)
+
+
+async def _tool() -> dict[str, Any]:
+    """Stand-in with the same return annotation as the real tools."""
+    return {}
+
+
+_METADATA = func_metadata(_tool)
+
+
+def _encode(response: dict[str, Any]) -> tuple[int, bytes]:
+    """Return (text content bytes, full wire payload) for a tool response."""
+    content, structured = _METADATA.convert_result(response)
+    wire = CallToolResult(content=content, structuredContent=structured)
+    payload = wire.model_dump_json(by_alias=True, exclude_none=True).encode()
+    return len(content[0].text.encode()), payload
+
+
+def measure(scenario: str, repeat: int) -> list[dict[str, Any]]:
+    """Measure every variant of one scenario."""
+    data = extract_api_data(RECORDED[scenario]())
+    results = []
+
+    for label, use_fields, response_format in VARIANTS:
+        fields = SCENARIO_FIELDS[scenario] if use_fields else None
+        text_bytes, wire = _encode(_build(data, fields, response_format))
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            _encode(_build(data, fields, response_format))
+        elapsed = (time.perf_counter() - start) / repeat
+
+        results.append({
+            "scenario": scenario,
+            "variant": label,
+            "text_bytes": text_bytes,
+            "wire_bytes": len(wire),
+            "time_us": round(elapsed * 1e6, 2),
+        })
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200, help="Iterations per variant")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    rows = []
+    for scenario in RECORDED:
+        rows.extend(measure(scenario, args.repeat))
+
+    print(
+        f"{'scenario':<26}{'variant':<16}{'text B':>9}{'wire B':>9}{'vs json':>9}"
+        f"{'time µs':>10}{'vs json':>9}"
+    )
+    baseline: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        base = baseline.setdefault(row["scenario"], row)
+        print(
+            f"{row['scenario']:<26}{row['variant']:<16}{row['text_bytes']:>9}{row['wire_bytes']:>9}"
+            f"{row['wire_bytes'] / base['wire_bytes']:>8.0%} {row['time_us']:>9.1f}"
+            f"{row['time_us'] / base['time_us']:>8.0%}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Response Cache Benchmark
+========================
+Per-call cost of serving a stored location list through FastMCP, with
+the response built and encoded on every call ("uncached") versus served
+from the response cache as a pre-built CallToolResult ("cached").
+
+The lists are the recorded province, city, district and subdistrict
+fixtures (the subdistrict one is a whole Kabupaten Bogor list), with
+paging disabled so every list is returned whole. Both paths read the
+list from a LocationTree, go through FastMCP's result conversion for a
+tool returning dict[str, Any] and the low-level server's output schema
+check, then dump the result as it is sent over the wire, so "wire" time
+is included on both sides.
+
+Usage:
+    python -m benchmarks.bench_response_cache [--repeat 300] [--json out.json]
+"""
+
+import argparse
+import json
+import time
+from typing import Any
+
+import jsonschema
+from mcp.server.fastmcp.utilities.func_metadata import func_metadata
+from mcp.types import CallToolResult
+
+from src.location_tree import LocationTree
+from src.response import ResponseCache, list_response
+
+from . import fixtures
+
+VARIANTS = [
+    ("json", None, "json"),
+    ("fields+compact", ["id", "name"], "compact"),
+]
+
+
+async def _tool() -> dict[str, Any]:
+    """Stand-in with the same return annotation as the real tools."""
+    return {}
+
+
+_METADATA = func_metadata(_tool)
+
+
+def _wire(result: Any) -> bytes:
+    """What FastMCP and the low-level server send for a tool result."""
+    converted = _METADATA.convert_result(result)
+    if isinstance(converted, CallToolResult):
+        return converted.model_dump_json(by_alias=True, exclude_none=True).encode()
+    content, structured = converted
+    jsonschema.validate(instance=structured, schema=_METADATA.output_schema)
+    wire = CallToolResult(content=content, structuredContent=structured)
+    return wire.model_dump_json(by_alias=True, exclude_none=True).encode()
+
+
+LISTS = [
+    ("province", None, fixtures.provinces),
+    ("city", 9, fixtures.cities),
+    ("district", 78, fixtures.districts),
+    ("subdistrict", 1391, fixtures.subdistricts),
+]
+
+
+def _stored_lists() -> tuple[LocationTree, list[tuple[str, int | None, int]]]:
+    """Tree holding the fixture lists and the (level, parent, size) of each."""
+    tree = LocationTree()
+    lists = []
+    for level, parent, fixture in LISTS:
+        rows = fixture()["data"] if parent is None else fixture(parent)["data"]
+        tree.set_children(level, parent, rows)
+        lists.append((level, parent, len(rows)))
+    return tree, lists
+
+
+def _per_call_us(function: Any, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=300, help="Calls per measurement")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    tree, lists = _stored_lists()
+    cache = ResponseCache()
+    rows = []
+    for level, parent, size in lists:
+        for label, fields, response_format in VARIANTS:
+            def uncached() -> bytes:
+                records = tree.children_records(level, parent)
+                return _wire(list_response(records, level, fields, response_format, page_size=0))
+
+            key = (level, parent, label)
+
+            def cached() -> bytes:
+                encoded = cache.get(key)
+                if encoded is None:
+                    records = tree.children_records(level, parent)
+                    encoded = cache.put(key, list_response(records, level, fields, response_format, page_size=0))
+                return _wire(encoded.tool_result)
+
+            assert json.loads(uncached()) == json.loads(cached())
+            before = _per_call_us(uncached, args.repeat)
+            after = _per_call_us(cached, args.repeat)
+            rows.append({
+                "list": level,
+                "items": size,
+                "variant": label,
+                "wire_bytes": len(cached()),
+                "uncached_us": round(before, 1),
+                "cached_us": round(after, 1),
+                "speedup": round(before / after, 1),
+            })
+
+    print(f"{'list':<13}{'items':>6}  {'variant':<16}{'wire B':>9}{'uncached µs':>13}{'cached µs':>11}{'speedup':>9}")
+    for row in rows:
+        print(
+            f"{row['list']:<13}{row['items']:>6}  {row['variant']:<16}{row['wire_bytes']:>9}"
+            f"{row['uncached_us']:>13}{row['cached_us']:>11}{row['speedup']:>8}x"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Scheduler Benchmark
+===================
+Queue time of interactive requests behind a bulk flood, with the
+upstream slots handed out first come first served ("fifo", a plain
+semaphore) versus by priority class ("fair", the FairScheduler).
+
+Each round runs on one event loop with `--slots` upstream slots:
+
+- `--bulk` tasks that send bulk requests back to back, as an export does
+- a quote request every `--quote-interval-ms` and a lookup request every
+  `--lookup-interval-ms`, each arriving on its own
+
+Every request holds its slot for `--latency-ms`. It reports the time
+requests waited for a slot per class (p50/p99/max) and the bulk
+throughput, which the fair scheduler must not starve.
+
+Before the rounds it checks that a merged district cost request (see
+batching) is sent in the most urgent class of its callers, and exits 1
+if not.
+
+Usage:
+    python -m benchmarks.bench_scheduler [--slots 10] [--bulk 100] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any
+
+from src.batching import CostBatcher
+from src.scheduler import CLASSES, FairScheduler, current_priority, priority_scope
+
+
+class _Fifo:
+    """The slots as a plain semaphore, in arrival order."""
+
+    def __init__(self, capacity: int) -> None:
+        self._slots = asyncio.Semaphore(capacity)
+
+    async def acquire(self, request_class: str) -> None:
+        await self._slots.acquire()
+
+    def release(self) -> None:
+        self._slots.release()
+
+
+async def _batch_priority() -> list[str]:
+    """Classes the cost batcher sends in, for one bulk and one quote caller."""
+    sent: list[str] = []
+
+    async def send(origin: str, destination: str, weight: int, courier: str, price: str) -> dict[str, Any]:
+        sent.append(current_priority())
+        return {"data": [{"code": code} for code in courier.split(":")]}
+
+    batcher = CostBatcher(send, window_ms=5.0, max_couriers=10)
+
+    async def call(request_class: str, courier: str) -> None:
+        with priority_scope(request_class):
+            await batcher.submit("1", "2", 1000, courier, "lowest")
+
+    await asyncio.gather(call("bulk", "jne"), call("quote", "tiki"))
+    return sent
+
+
+def _quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+async def _round(mode: str, args: argparse.Namespace) -> dict[str, Any]:
+    slots: Any = _Fifo(args.slots) if mode == "fifo" else FairScheduler(args.slots, max_wait_ms=args.max_wait_ms)
+    latency = args.latency_ms / 1000
+    waits: dict[str, list[float]] = {cls: [] for cls in CLASSES}
+    stop = time.perf_counter() + args.seconds
+    pending: set[asyncio.Task[None]] = set()
+
+    async def request(request_class: str) -> None:
+        start = time.perf_counter()
+        await slots.acquire(request_class)
+        waits[request_class].append(time.perf_counter() - start)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            slots.release()
+
+    async def bulk() -> None:
+        while time.perf_counter() < stop:
+            await request("bulk")
+
+    async def arrivals(request_class: str, interval: float) -> None:
+        while time.perf_counter() < stop:
+            task = asyncio.create_task(request(request_class))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(
+        *(bulk() for _ in range(args.bulk)),
+        arrivals("quote", args.quote_interval_ms / 1000),
+        arrivals("lookup", args.lookup_interval_ms / 1000),
+    )
+    await asyncio.gather(*pending)
+    row: dict[str, Any] = {"mode": mode, "bulk_per_s": round(len(waits["bulk"]) / args.seconds, 1)}
+    for cls in CLASSES:
+        row[cls] = {
+            "requests": len(waits[cls]),
+            "p50_ms": round(_quantile(waits[cls], 0.50) * 1000, 1),
+            "p99_ms": round(_quantile(waits[cls], 0.99) * 1000, 1),
+            "max_ms": round(max(waits[cls], default=0.0) * 1000, 1),
+        }
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--slots", type=int, default=10, help="Upstream slots (MAX_CONCURRENT_REQUESTS)")
+    parser.add_argument("--bulk", type=int, default=100, help="Concurrent bulk senders")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Upstream latency per request")
+    parser.add_argument("--quote-interval-ms", type=float, default=25.0, help="Time between quote arrivals")
+    parser.add_argument("--lookup-interval-ms", type=float, default=50.0, help="Time between lookup arrivals")
+    parser.add_argument("--max-wait-ms", type=float, default=2000.0, help="SCHEDULER_MAX_WAIT_MS")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each round")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sent = asyncio.run(_batch_priority())
+    print(f"merged cost request sent as: {', '.join(sent)}")
+    if sent != ["quote"]:
+        print("expected one request in the quote class", file=sys.stderr)
+        sys.exit(1)
+
+    rows = [asyncio.run(_round(mode, args)) for mode in ("fifo", "fair")]
+    print(f"{'mode':<6}{'class':<8}{'requests':>9}{'p50':>9}{'p99':>9}{'max':>9}")
+    for row in rows:
+        for cls in CLASSES:
+            stats = row[cls]
+            print(
+                f"{row['mode']:<6}{cls:<8}{stats['requests']:>9}{stats['p50_ms']:>9}"
+                f"{stats['p99_ms']:>9}{stats['max_ms']:>9}"
+            )
+        print(f"{row['mode']:<6}bulk throughput {row['bulk_per_s']}/s")
+    print("queue times in ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
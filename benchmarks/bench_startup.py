@@ -0,0 +1,154 @@
+"""
+Startup Benchmark
+=================
+Measures cold start of the stdio server, the path every agent session
+pays when it launches `python server.py`:
+
+1. `python -X importtime` report for `import src.server`: total import
+   time, the project's own share, and self time summed per package.
+2. Wall-clock time from process spawn to the first `tools/list` result
+   over stdio (median of several runs).
+
+It also fails if modules that must stay deferred (optional or heavy
+dependencies only needed by some tools) are imported at startup, and can
+compare against a saved baseline so regressions fail CI.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+    python -m benchmarks.bench_startup --save-baseline benchmarks/startup_baseline.json
+    python -m benchmarks.bench_startup --baseline benchmarks/startup_baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported until a tool that needs them runs
+DEFERRED_MODULES = [
+    "src.models",
+    "sqlite3",
+    "cProfile",
+    "tracemalloc",
+    "pyarrow",
+    "numpy",
+    "concurrent.futures.process",
+]
+
+# Allowed slowdown against a saved baseline before the check fails
+TOLERANCE = 0.25
+
+
+def _server_env() -> dict[str, str]:
+    return {**os.environ, "RAJAONGKIR_API_KEY": os.environ.get("RAJAONGKIR_API_KEY", "startup-bench")}
+
+
+def import_report(top: int = 10) -> dict[str, Any]:
+    """Parse `python -X importtime -c 'import src.server'`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.server"],
+        cwd=ROOT,
+        env=_server_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules: dict[str, tuple[int, int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+
+    top_level = {name: cum for name, (_, cum, depth) in modules.items() if depth == 0}
+    by_package: dict[str, int] = {}
+    for name, (own, _, _) in modules.items():
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + own
+
+    return {
+        "import_total_ms": round(sum(top_level.values()) / 1000, 1),
+        "import_project_ms": round(by_package.get("src", 0) / 1000, 1),
+        "slowest_packages": [
+            {"package": name, "ms": round(us / 1000, 1)}
+            for name, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+        ],
+        "deferred_violations": [name for name in DEFERRED_MODULES if name in modules],
+    }
+
+
+async def _time_to_tools_list() -> float:
+    start = time.perf_counter()
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(ROOT, "server.py")],
+        env=_server_env(),
+        cwd=ROOT,
+    )
+    with open(os.devnull, "w") as devnull:
+        async with stdio_client(params, errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await session.list_tools()
+                return time.perf_counter() - start
+
+
+def tools_list_report(runs: int) -> dict[str, Any]:
+    """Spawn the stdio server `runs` times and time the first tools/list."""
+    samples = [asyncio.run(_time_to_tools_list()) for _ in range(runs)]
+    return {
+        "tools_list_median_ms": round(statistics.median(samples) * 1000, 1),
+        "tools_list_min_ms": round(min(samples) * 1000, 1),
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """Return human-readable regressions against a baseline."""
+    failures = []
+    for key in ("import_project_ms", "tools_list_median_ms"):
+        limit = baseline[key] * (1 + TOLERANCE)
+        if report[key] > limit:
+            failures.append(f"{key}: {report[key]} ms > {limit:.1f} ms (baseline {baseline[key]} ms)")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Spawns for tools/list timing")
+    parser.add_argument("--baseline", help="Fail if slower than this saved report")
+    parser.add_argument("--save-baseline", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = {**import_report(), **tools_list_report(args.runs)}
+    print(json.dumps(report, indent=2))
+
+    failures = [f"deferred module imported at startup: {name}" for name in report["deferred_violations"]]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures.extend(compare(report, json.load(f)))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if failures:
+        print("\n".join(["", "STARTUP REGRESSION:", *failures]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Tool Benchmark Suite
+====================
+Runs every MCP tool against the local fake upstream (fake_upstream.py)
+at increasing concurrency and reports throughput, p50/p95/p99 latency
+and memory allocations per tool and concurrency level.
+
+Calls go through FastMCP's call_tool, so argument validation, the tool
+wrappers and result conversion are measured, without a transport. Each
+level runs twice: a timed pass, then a pass under tracemalloc that
+records the peak and retained allocations (kept separate because
+tracemalloc slows every allocation).
+
+Results are written as JSON; pass an earlier result file to --compare to
+print throughput and p95 changes and fail on regressions.
+
+Usage:
+    python -m benchmarks.bench_tools [--latency-ms 20] [--levels 1,4,16,64,256]
+    python -m benchmarks.bench_tools --tools get_provinces,calculate_district_cost
+    python -m benchmarks.bench_tools --output new.json --compare old.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from . import fake_upstream
+from .load_http import percentile
+
+# Arguments per tool, matching the fixture payloads
+SCENARIOS: dict[str, dict[str, Any]] = {
+    "search_domestic_destination": {"query": "JAKARTA"},
+    "search_international_destination": {"query": "SING"},
+    "calculate_domestic_cost": {
+        "origin": "17001", "destination": "17002", "weight": 1000, "courier": "jne:sicepat:jnt",
+    },
+    "calculate_international_cost": {
+        "origin": "17001", "destination": "101", "weight": 1000, "courier": "pos",
+    },
+    "get_provinces": {},
+    "get_cities": {"province_id": "9"},
+    "get_districts": {"city_id": "78"},
+    "get_subdistricts": {"district_id": "1391"},
+    "calculate_district_cost": {
+        "origin": "1391", "destination": "1376", "weight": 1000, "courier": "jne:sicepat:jnt",
+    },
+    "track_package": {"awb": "JP1234567890", "courier": "jnt"},
+    "get_next_page": {},  # cursor is filled in from a get_subdistricts call
+    "get_server_metrics": {},
+}
+
+# Allowed change against a compared run before it counts as a regression
+TOLERANCE = 0.25
+
+
+def _succeeded(result: Any) -> bool:
+    """Whether a call_tool result is a success response."""
+    structured = result[1] if isinstance(result, tuple) else result
+    return not isinstance(structured, dict) or structured.get("success", True) is not False
+
+
+async def _arguments(mcp: Any, tool: str) -> dict[str, Any]:
+    if tool != "get_next_page":
+        return SCENARIOS[tool]
+    _, first_page = await mcp.call_tool("get_subdistricts", SCENARIOS["get_subdistricts"])
+    return {"cursor": first_page["meta"]["next_cursor"]}
+
+
+async def _run_level(
+    mcp: Any,
+    tool: str,
+    arguments: dict[str, Any],
+    calls: int,
+    concurrency: int,
+) -> tuple[list[float], int, float]:
+    """Run `calls` calls with `concurrency` workers; return latencies, errors and elapsed time."""
+    latencies: list[float] = []
+    errors = 0
+    remaining = calls
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                ok = _succeeded(await mcp.call_tool(tool, arguments))
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def bench_tool(mcp: Any, tool: str, levels: list[int], calls: int) -> dict[str, Any]:
+    """Benchmark one tool at every concurrency level."""
+    arguments = await _arguments(mcp, tool)
+    await _run_level(mcp, tool, arguments, 5, 1)  # warm up pool and caches
+
+    report: dict[str, Any] = {}
+    for concurrency in levels:
+        level_calls = max(calls, 2 * concurrency)
+        latencies, errors, elapsed = await _run_level(mcp, tool, arguments, level_calls, concurrency)
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        await _run_level(mcp, tool, arguments, level_calls, concurrency)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report[str(concurrency)] = {
+            "calls": level_calls,
+            "errors": errors,
+            "throughput_per_s": round(level_calls / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "peak_alloc_kib": round((peak - before) / 1024, 1),
+            "retained_kib": round((after - before) / 1024, 1),
+        }
+        print(f"{tool:<36}c={concurrency:<4}{json.dumps(report[str(concurrency)])}", file=sys.stderr)
+    return report
+
+
+async def run_suite(tools: list[str], levels: list[int], calls: int) -> dict[str, Any]:
+    """Benchmark the given tools; the server module is imported here, after env setup."""
+    from src import lifecycle
+    from src.server import mcp
+
+    # FastMCP configures INFO logging; one httpx line per call would dominate
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {}
+    async with lifecycle.lifespan():
+        for tool in tools:
+            results[tool] = await bench_tool(mcp, tool, levels, calls)
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=fake_upstream.ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """Print per-level changes against a baseline and return regressions."""
+    failures = []
+    for tool, levels in report["results"].items():
+        for level, current in levels.items():
+            previous = baseline.get("results", {}).get(tool, {}).get(level)
+            if not previous:
+                continue
+            throughput = current["throughput_per_s"] / previous["throughput_per_s"] - 1
+            p95 = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+            print(f"{tool:<36}c={level:<4}throughput {throughput:+7.1%}   p95 {p95:+7.1%}")
+            if throughput < -TOLERANCE:
+                failures.append(f"{tool} c={level}: throughput {throughput:+.1%}")
+            if p95 > TOLERANCE:
+                failures.append(f"{tool} c={level}: p95 {p95:+.1%}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tools", default=",".join(SCENARIOS), help="Comma-separated tool names")
+    parser.add_argument("--levels", default="1,4,16,64,256", help="Comma-separated concurrency levels")
+    parser.add_argument("--calls", type=int, default=100, help="Calls per tool and level (at least 2x level)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Fake upstream jitter")
+    parser.add_argument("--port", type=int, default=8766, help="Fake upstream port")
+    parser.add_argument("--output", default="bench_tools.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    tools = [name.strip() for name in args.tools.split(",") if name.strip()]
+    unknown = [name for name in tools if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)}")
+    levels = [int(level) for level in args.levels.split(",")]
+
+    upstream = fake_upstream.spawn(args.port, args.latency_ms, args.jitter_ms)
+    os.environ["RAJAONGKIR_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("RAJAONGKIR_API_KEY", "bench")
+    try:
+        results = asyncio.run(run_suite(tools, levels, args.calls))
+    finally:
+        upstream.terminate()
+        upstream.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "levels": levels,
+            "calls": args.calls,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            failures = compare(report, json.load(f))
+        if failures:
+            print("\n".join(["", "REGRESSION:", *failures]), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
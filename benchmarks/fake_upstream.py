@@ -0,0 +1,154 @@
+"""
+Fake RajaOngkir Upstream
+========================
+Local stand-in for the Komerce V2 API that serves the recorded fixture
+payloads with configurable latency, so benchmarks are reproducible
+without an API key or network.
+
+Routes mirror the endpoints used by src/client.py. Path IDs and the
+courier/weight form fields select the payload; encoded bodies are cached
+so the fake server stays cheap next to the server under test. Requests
+without a `key` header get a 401, like the real API.
+
+Usage:
+    python -m benchmarks.fake_upstream --port 8766 --latency-ms 50 --jitter-ms 20
+    RAJAONGKIR_BASE_URL=http://127.0.0.1:8766 python server.py
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any
+from urllib.parse import parse_qsl
+
+import httpx
+
+from . import fixtures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@functools.lru_cache(maxsize=1024)
+def _payload(path: str, query: tuple[tuple[str, str], ...]) -> tuple[int, bytes]:
+    """Status and encoded body for a request, or 404 for unknown paths."""
+    params = dict(query)
+    parts = path.strip("/").split("/")
+    tail = parts[-1]
+
+    if path.endswith("/destination/province"):
+        body = fixtures.provinces()
+    elif "/destination/city/" in path and tail.isdigit():
+        body = fixtures.cities(int(tail))
+    elif "/destination/district/" in path and tail.isdigit():
+        body = fixtures.districts(int(tail))
+    elif "/destination/sub-district/" in path and tail.isdigit():
+        body = fixtures.subdistricts(int(tail))
+    elif path.endswith("/destination/domestic-destination"):
+        body = fixtures.domestic_destinations(params.get("search", ""))
+    elif path.endswith("/destination/international-destination"):
+        body = fixtures.international_destinations(params.get("search", ""))
+    elif path.endswith("/calculate/international-cost"):
+        body = fixtures.international_cost(params.get("courier", "pos"), int(params.get("weight", 1000)))
+    elif path.endswith("/domestic-cost"):
+        body = fixtures.cost(params.get("courier", "jne"), int(params.get("weight", 1000)))
+    elif path.endswith("/track/waybill"):
+        body = fixtures.waybill(params.get("awb", ""), params.get("courier", "jne"))
+    elif path == "/healthz":
+        body = {"status": "ok"}
+    else:
+        return 404, json.dumps({"meta": {"code": 404, "message": "Not Found"}}).encode()
+    return 200, json.dumps(body).encode()
+
+
+class FakeUpstream:
+    """ASGI app serving fixture payloads after a simulated upstream delay."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0) -> None:
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.random = random.Random(seed)
+        self.requests = 0
+
+    async def _read_body(self, receive: Any) -> bytes:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        headers = dict(scope["headers"])
+        query = parse_qsl(scope["query_string"].decode())
+        body = await self._read_body(receive)
+        if body:
+            query += parse_qsl(body.decode())
+
+        if scope["path"] != "/healthz" and not headers.get(b"key"):
+            status, payload = 401, b'{"meta": {"code": 401, "message": "Invalid Api key"}}'
+        else:
+            status, payload = _payload(scope["path"], tuple(sorted(query)))
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            if delay > 0 and scope["path"] != "/healthz":
+                await asyncio.sleep(delay)
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+def spawn(port: int, latency_ms: float = 0.0, jitter_ms: float = 0.0) -> subprocess.Popen:
+    """Start the fake upstream in a subprocess and wait until it answers."""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_upstream",
+            "--port", str(port),
+            "--latency-ms", str(latency_ms),
+            "--jitter-ms", str(jitter_ms),
+        ],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+
+    process.kill()
+    raise RuntimeError("Fake upstream did not start within 15s")
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random delay")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the jitter sequence")
+    args = parser.parse_args()
+
+    app = FakeUpstream(args.latency_ms, args.jitter_ms, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", backlog=4096)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark Fixtures
+==================
+Deterministic payloads in the shape of recorded RajaOngkir Komerce V2
+responses. Sizes match real lists (38 provinces, the largest province
+city list, a large regency's districts and subdistricts), names are
+synthetic so no live API key or network is needed.
+"""
+
+from collections.abc import Iterator
+from typing import Any
+
+_META = {"message": "Success Get Data", "code": 200, "status": "success"}
+
+_SYLLABLES = [
+    "su", "ka", "ma", "ja", "ya", "ban", "dung", "to", "ra", "wi",
+    "sa", "ri", "pa", "ti", "go", "no", "lo", "me", "ng", "si",
+]
+
+COURIER_NAMES = {
+    "jne": "Jalur Nugraha Ekakurir (JNE)",
+    "sicepat": "SiCepat Express",
+    "jnt": "J&T Express",
+    "pos": "POS Indonesia (POS)",
+    "tiki": "Citra Van Titipan Kilat (TIKI)",
+    "anteraja": "AnterAja",
+    "ninja": "Ninja Xpress",
+    "lion": "Lion Parcel",
+    "ide": "ID Express",
+    "sap": "SAP Express",
+}
+
+_SERVICES = [
+    ("REG", "Layanan Reguler", "2-3 day", 1.0),
+    ("YES", "Yakin Esok Sampai", "1 day", 1.9),
+    ("OKE", "Ongkos Kirim Ekonomis", "3-5 day", 0.8),
+]
+
+# Number of list items per level, taken from real responses
+PROVINCE_COUNT = 38
+CITY_COUNT = 27          # Jawa Barat
+DISTRICT_COUNT = 40      # Kabupaten Bogor
+SUBDISTRICT_COUNT = 435  # all subdistricts of Kabupaten Bogor
+SEARCH_COUNT = 20        # search endpoints return at most `limit` rows
+
+# Size of the full hierarchy (Kepmendagri 2022 counts)
+TOTAL_CITIES = 514
+TOTAL_DISTRICTS = 7277
+TOTAL_SUBDISTRICTS = 83763
+
+
+def _name(seed: int, parts: int = 3) -> str:
+    """Deterministic pseudo-Indonesian place name."""
+    syllables = []
+    for i in range(parts):
+        seed = (seed * 1103515245 + 12345 + i) & 0x7FFFFFFF
+        syllables.append(_SYLLABLES[seed % len(_SYLLABLES)])
+    return "".join(syllables).upper()
+
+
+def _wrap(data: Any) -> dict[str, Any]:
+    return {"meta": dict(_META), "data": data}
+
+
+def provinces() -> dict[str, Any]:
+    """GET /destination/province"""
+    return _wrap([{"id": i, "name": _name(i)} for i in range(1, PROVINCE_COUNT + 1)])
+
+
+def cities(province_id: int = 9) -> dict[str, Any]:
+    """GET /destination/city/{province_id}"""
+    base = province_id * 100
+    return _wrap([
+        {"id": base + i, "name": f"KABUPATEN {_name(base + i)}", "zip_code": "0"}
+        for i in range(1, CITY_COUNT + 1)
+    ])
+
+
+def districts(city_id: int = 78) -> dict[str, Any]:
+    """GET /destination/district/{city_id}"""
+    base = city_id * 100
+    return _wrap([
+        {"id": base + i, "name": _name(base + i, 4), "zip_code": "0"}
+        for i in range(1, DISTRICT_COUNT + 1)
+    ])
+
+
+def subdistricts(district_id: int = 1391, count: int = SUBDISTRICT_COUNT) -> dict[str, Any]:
+    """GET /destination/sub-district/{district_id}"""
+    base = district_id * 1000
+    return _wrap([
+        {"id": base + i, "name": _name(base + i, 4), "zip_code": str(16110 + i % 900)}
+        for i in range(1, count + 1)
+    ])
+
+
+def domestic_destinations(query: str = "JAKARTA") -> dict[str, Any]:
+    """GET /destination/domestic-destination"""
+    rows = []
+    for i in range(1, SEARCH_COUNT + 1):
+        subdistrict = _name(i * 7, 3)
+        district = _name(i * 11, 3)
+        city = f"JAKARTA {_name(i, 2)}"
+        rows.append({
+            "id": 17000 + i,
+            "label": f"{subdistrict}, {district}, {city}, DKI JAKARTA, {10110 + i}",
+            "province_name": "DKI JAKARTA",
+            "city_name": city,
+            "district_name": district,
+            "subdistrict_name": subdistrict,
+            "zip_code": str(10110 + i),
+        })
+    return _wrap(rows)
+
+
+def international_destinations(query: str = "SING") -> dict[str, Any]:
+    """GET /destination/international-destination"""
+    return _wrap([
+        {"country_id": str(100 + i), "country_name": f"{query.upper()}{_name(i, 2)}"}
+        for i in range(1, 6)
+    ])
+
+
+def cost(courier: str = "jne", weight: int = 1000) -> dict[str, Any]:
+    """POST /calculate/domestic-cost and /calculate/district/domestic-cost"""
+    kg = max(1, -(-weight // 1000))
+    rows = []
+    for code in courier.split(":"):
+        for index, (service, description, etd, factor) in enumerate(_SERVICES):
+            rows.append({
+                "name": COURIER_NAMES.get(code, code.upper()),
+                "code": code,
+                "service": service,
+                "description": description,
+                "cost": int(9000 * factor * kg) + 500 * (len(code) + index),
+                "etd": etd,
+            })
+    return _wrap(rows)
+
+
+def international_cost(courier: str = "pos", weight: int = 1000) -> dict[str, Any]:
+    """POST /calculate/international-cost"""
+    kg = max(1, -(-weight // 1000))
+    return _wrap([
+        {
+            "name": COURIER_NAMES.get(courier, courier.upper()),
+            "code": courier,
+            "service": "EMS",
+            "description": "Express Mail Service",
+            "currency": "IDR",
+            "cost": 350000 + 120000 * (kg - 1),
+            "etd": "3-7 day",
+        }
+    ])
+
+
+def waybill(awb: str = "JP1234567890", courier: str = "jnt", events: int = 12) -> dict[str, Any]:
+    """POST /track/waybill"""
+    manifest = [
+        {
+            "manifest_code": str(i),
+            "manifest_description": f"Paket diproses di {_name(i, 3)} GATEWAY",
+            "manifest_date": f"2024-05-{1 + i // 4:02d}",
+            "manifest_time": f"{8 + i % 10:02d}:{(i * 7) % 60:02d}:00",
+            "city_name": _name(i * 3, 3),
+        }
+        for i in range(events)
+    ]
+    return _wrap({
+        "delivered": True,
+        "summary": {
+            "courier_code": courier,
+            "courier_name": COURIER_NAMES.get(courier, courier.upper()),
+            "waybill_number": awb,
+            "service_code": "EZ",
+            "waybill_date": "2024-05-01",
+            "shipper_name": "TOKO MAJU",
+            "receiver_name": "BUDI",
+            "origin": "JAKARTA",
+            "destination": "BANDUNG",
+            "status": "DELIVERED",
+        },
+        "details": {
+            "waybill_number": awb,
+            "waybill_date": "2024-05-01",
+            "waybill_time": "08:00:00",
+            "weight": "1",
+            "origin": "JAKARTA",
+            "destination": "BANDUNG",
+            "shipper_name": "TOKO MAJU",
+            "shipper_address1": "JL. MERDEKA NO. 1",
+            "shipper_city": "JAKARTA",
+            "receiver_name": "BUDI",
+            "receiver_address1": "JL. ASIA AFRIKA NO. 8",
+            "receiver_city": "BANDUNG",
+        },
+        "delivery_status": {
+            "status": "DELIVERED",
+            "pod_receiver": "BUDI",
+            "pod_date": "2024-05-04",
+            "pod_time": "13:20:00",
+        },
+        "manifest": manifest,
+    })
+
+
+# Recorded payloads used by the response benchmarks, keyed by scenario name
+def hierarchy() -> Iterator[tuple[str, int | None, list[dict[str, Any]]]]:
+    """
+    The full province → subdistrict hierarchy at real size.
+
+    Yields:
+        (child level, parent ID or None, child records) per child list, in
+        the shapes of the get_* endpoints.
+    """
+    province_rows = provinces()["data"]
+    yield "province", None, province_rows
+
+    def spread(total: int, parents: int, index: int) -> int:
+        return total // parents + (index < total % parents)
+
+    city_index = district_index = 0
+    for province in province_rows:
+        city_count = spread(TOTAL_CITIES, PROVINCE_COUNT, province["id"] - 1)
+        city_rows = [
+            {"id": 1000 + city_index + i, "name": f"KABUPATEN {_name(1000 + city_index + i)}", "zip_code": "0"}
+            for i in range(city_count)
+        ]
+        city_index += city_count
+        yield "city", province["id"], city_rows
+
+        for city in city_rows:
+            district_count = spread(TOTAL_DISTRICTS, TOTAL_CITIES, city["id"] - 1000)
+            district_rows = [
+                {"id": 10000 + district_index + i, "name": _name(10000 + district_index + i, 4), "zip_code": "0"}
+                for i in range(district_count)
+            ]
+            district_index += district_count
+            yield "district", city["id"], district_rows
+
+            for district in district_rows:
+                count = spread(TOTAL_SUBDISTRICTS, TOTAL_DISTRICTS, district["id"] - 10000)
+                yield "subdistrict", district["id"], subdistricts(district["id"], count)["data"]
+
+
+RECORDED = {
+    "provinces": provinces,
+    "cities": cities,
+    "districts": districts,
+    "subdistricts": subdistricts,
+    "domestic_search": domestic_destinations,
+    "district_cost_3_couriers": lambda: cost("jne:sicepat:jnt"),
+    "tracking": waybill,
+}
@@ -0,0 +1,155 @@
+"""
+HTTP Session Load Test
+======================
+Opens many concurrent MCP sessions against a streamable HTTP deployment
+and reports sessions per second and per-session latency.
+
+Each session runs initialize -> tools/list -> one tool call. The default
+call (get_next_page with an unknown cursor) stays inside the server, so
+the numbers measure the MCP serving path rather than the upstream API.
+
+Usage:
+    # against a running server
+    python -m benchmarks.load_http --url http://127.0.0.1:8000/mcp
+    # or start one with N workers for the duration of the test
+    python -m benchmarks.load_http --spawn --workers 4 --sessions 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+import httpx
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_session(url: str, tool: str, arguments: dict[str, Any]) -> float:
+    """Run one MCP session and return its wall-clock duration."""
+    start = time.perf_counter()
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            await session.list_tools()
+            await session.call_tool(tool, arguments)
+    return time.perf_counter() - start
+
+
+async def run_load(
+    url: str,
+    sessions: int,
+    concurrency: int,
+    tool: str,
+    arguments: dict[str, Any],
+) -> dict[str, Any]:
+    """Run `sessions` sessions with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    durations: list[float] = []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            try:
+                durations.append(await run_session(url, tool, arguments))
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    result: dict[str, Any] = {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(len(durations) / elapsed, 1),
+    }
+    if durations:
+        result.update({
+            "p50_ms": round(statistics.median(durations) * 1000, 1),
+            "p95_ms": round(percentile(durations, 95) * 1000, 1),
+            "p99_ms": round(percentile(durations, 99) * 1000, 1),
+        })
+    return result
+
+
+def spawn_server(host: str, port: int, workers: int) -> subprocess.Popen:
+    """Start server.py in streamable HTTP mode and wait until it is healthy."""
+    env = {
+        **os.environ,
+        "RAJAONGKIR_TRANSPORT": "streamable-http",
+        "RAJAONGKIR_HOST": host,
+        "RAJAONGKIR_PORT": str(port),
+        "RAJAONGKIR_WORKERS": str(workers),
+        "RAJAONGKIR_API_KEY": os.environ.get("RAJAONGKIR_API_KEY", "load-test"),
+    }
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(root, "server.py")],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://{host}:{port}/healthz", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    process.kill()
+    raise RuntimeError("Server did not become healthy within 30s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000/mcp")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tool", default="get_next_page")
+    parser.add_argument("--args", default='{"cursor": "load-test.0"}', help="Tool arguments as JSON")
+    parser.add_argument("--spawn", action="store_true", help="Start a local server for the test")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for --spawn")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.spawn:
+        process = spawn_server("127.0.0.1", args.port, args.workers)
+        url = f"http://127.0.0.1:{args.port}/mcp"
+
+    try:
+        result = asyncio.run(
+            run_load(url, args.sessions, args.concurrency, args.tool, json.loads(args.args))
+        )
+        result["workers"] = args.workers if args.spawn else None
+        print(json.dumps(result, indent=2))
+    finally:
+        if process is not None:
+            # Graceful shutdown: SIGTERM, then wait for in-flight requests
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
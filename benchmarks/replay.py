@@ -0,0 +1,344 @@
+"""
+Trace Replay Load Generator
+===========================
+Replays a recorded mix of MCP tool calls against the server over stdio or
+streamable HTTP, keeping the recorded arrival times (1x), compressing
+them (Nx) or sending as fast as allowed (max).
+
+A trace is JSON Lines, one call per line:
+
+    {"t": 0.42, "tool": "calculate_district_cost", "args": {"origin": "1391", ...}}
+
+where `t` is the arrival time in seconds from the start of the trace.
+Arrivals are open-loop: a slow server does not delay later calls, and the
+report shows how far behind schedule calls were issued.
+
+The report has per-tool latency distributions and error rates, plus the
+upstream requests the server made during the replay (read from the
+get_server_metrics tool before and after). With several HTTP workers the
+metrics come from whichever worker answers, so use one worker for exact
+upstream counts. By default the server talks to the local fake upstream.
+
+Usage:
+    python -m benchmarks.replay benchmarks/traces/sample.jsonl --speed 1
+    python -m benchmarks.replay trace.jsonl --speed 10 --transport http --spawn --workers 1
+    python -m benchmarks.replay trace.jsonl --speed max --max-in-flight 64 --output replay.json
+    python -m benchmarks.replay --generate benchmarks/traces/sample.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import statistics
+import sys
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from . import fake_upstream
+from .load_http import percentile, spawn_server
+
+
+def load_trace(path: str) -> list[dict[str, Any]]:
+    """Read a JSONL trace, sorted by arrival time."""
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            event = json.loads(line)
+            if "tool" not in event:
+                raise ValueError(f"{path}:{line_number}: missing 'tool'")
+            events.append({
+                "t": float(event.get("t", 0.0)),
+                "tool": event["tool"],
+                "args": event.get("args", event.get("arguments", {})),
+            })
+    return sorted(events, key=lambda event: event["t"])
+
+
+# ============================================================================
+# Sessions
+# ============================================================================
+
+@asynccontextmanager
+async def stdio_session(env: dict[str, str]) -> AsyncIterator[ClientSession]:
+    """Spawn `python server.py` and open one MCP session over stdio."""
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(fake_upstream.ROOT, "server.py")],
+        env=env,
+        cwd=fake_upstream.ROOT,
+    )
+    with open(os.devnull, "w") as devnull:
+        async with stdio_client(params, errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+
+@asynccontextmanager
+async def http_session(url: str) -> AsyncIterator[ClientSession]:
+    """Open one MCP session over streamable HTTP."""
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+async def _upstream_counts(session: ClientSession) -> dict[str, float]:
+    """Upstream requests per endpoint and status, from get_server_metrics."""
+    result = await session.call_tool("get_server_metrics", {})
+    snapshot = (result.structuredContent or {}).get("data", {})
+    return {
+        f"{item['endpoint']} {item['status']}": item["value"]
+        for item in snapshot.get("rajaongkir_upstream_requests_total", [])
+    }
+
+
+# ============================================================================
+# Replay
+# ============================================================================
+
+def _is_error(result: Any) -> bool:
+    if result.isError:
+        return True
+    structured = result.structuredContent
+    return isinstance(structured, dict) and structured.get("success") is False
+
+
+async def replay(
+    session: ClientSession,
+    events: list[dict[str, Any]],
+    speed: float | None,
+    max_in_flight: int,
+) -> dict[str, Any]:
+    """
+    Replay events on a session.
+
+    Args:
+        session: Initialized MCP client session.
+        events: Trace events sorted by arrival time.
+        speed: Time compression factor, or None to send as fast as allowed.
+        max_in_flight: Limit on concurrent calls (queued calls count as late).
+
+    Returns:
+        Per-tool and overall latency, error and lateness statistics.
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    error_codes: dict[str, int] = {}
+    lateness: list[float] = []
+
+    async def call(event: dict[str, Any], scheduled: float) -> None:
+        async with semaphore:
+            issued = time.perf_counter()
+            lateness.append(issued - scheduled)
+            tool = event["tool"]
+            try:
+                result = await session.call_tool(tool, event["args"])
+                failed = _is_error(result)
+                if failed:
+                    code = (result.structuredContent or {}).get("error", {}).get("code", "TOOL_ERROR")
+                    error_codes[code] = error_codes.get(code, 0) + 1
+            except Exception as e:
+                failed = True
+                error_codes[type(e).__name__] = error_codes.get(type(e).__name__, 0) + 1
+            latencies.setdefault(tool, []).append(time.perf_counter() - issued)
+            errors[tool] = errors.get(tool, 0) + failed
+
+    before = await _upstream_counts(session)
+    start = time.perf_counter()
+    tasks = []
+    for event in events:
+        scheduled = start + (event["t"] / speed if speed else 0.0)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(call(event, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    after = await _upstream_counts(session)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "calls": len(events),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(events) / elapsed, 1) if elapsed else None,
+        "error_rate": round(sum(errors.values()) / len(events), 4) if events else 0.0,
+        "errors_by_code": error_codes,
+        "latency": _distribution(all_latencies),
+        "issue_lateness_ms": {
+            "p50": round(statistics.median(lateness) * 1000, 2) if lateness else None,
+            "max": round(max(lateness) * 1000, 2) if lateness else None,
+        },
+        "tools": {
+            tool: {
+                "calls": len(values),
+                "error_rate": round(errors[tool] / len(values), 4),
+                **_distribution(values),
+            }
+            for tool, values in sorted(latencies.items())
+        },
+        "upstream_requests": {
+            key: after[key] - before.get(key, 0.0)
+            for key in sorted(after)
+            if after[key] - before.get(key, 0.0)
+        },
+    }
+
+
+def _distribution(values: list[float]) -> dict[str, float | None]:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+# ============================================================================
+# Sample trace generator
+# ============================================================================
+
+def generate_trace(duration: float = 60.0, seed: int = 7) -> list[dict[str, Any]]:
+    """
+    Synthetic trace with the production shape: mostly searches, bursts of
+    cost quotes for one route, and tracking polls over a long tail of AWBs.
+    """
+    rng = random.Random(seed)
+    queries = ["JAKARTA", "BANDUNG", "SURABAYA", "BOGOR", "DEPOK", "MEDAN", "SEMARANG", "MALANG"]
+    couriers = ["jne", "sicepat", "jnt", "pos", "tiki", "anteraja"]
+    # Zipf-like popularity: a few AWBs are polled often, most only once or twice
+    awbs = [f"JP{1000000000 + i}" for i in range(400)]
+    awb_weights = [1 / (rank + 1) for rank in range(len(awbs))]
+
+    events: list[dict[str, Any]] = []
+    t = 0.0
+    while t < duration:
+        t += rng.expovariate(8.0)  # ~8 calls/s on average
+        kind = rng.random()
+        if kind < 0.65:
+            events.append({"t": t, "tool": "search_domestic_destination", "args": {"query": rng.choice(queries)}})
+        elif kind < 0.72:
+            route = (str(rng.randint(1300, 1400)), str(rng.randint(1300, 1400)))
+            for i in range(rng.randint(3, 8)):  # burst: one route, several weights and couriers
+                events.append({
+                    "t": t + i * rng.uniform(0.02, 0.2),
+                    "tool": "calculate_district_cost",
+                    "args": {
+                        "origin": route[0],
+                        "destination": route[1],
+                        "weight": rng.choice([500, 1000, 1500, 2000, 5000]),
+                        "courier": ":".join(rng.sample(couriers, 3)),
+                    },
+                })
+        elif kind < 0.94:
+            awb = rng.choices(awbs, awb_weights)[0]
+            events.append({"t": t, "tool": "track_package", "args": {"awb": awb, "courier": "jnt"}})
+        elif kind < 0.98:
+            level = rng.choice([("get_cities", "province_id", 9), ("get_districts", "city_id", 78)])
+            events.append({"t": t, "tool": level[0], "args": {level[1]: str(level[2])}})
+        else:
+            events.append({"t": t, "tool": "get_provinces", "args": {}})
+
+    events.sort(key=lambda event: event["t"])
+    for event in events:
+        event["t"] = round(event["t"], 3)
+    return events
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _parse_speed(value: str) -> float | None:
+    if value == "max":
+        return None
+    speed = float(value.rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+async def _run(args: argparse.Namespace, events: list[dict[str, Any]], env: dict[str, str]) -> dict[str, Any]:
+    if args.transport == "stdio":
+        session_context = stdio_session(env)
+    else:
+        session_context = http_session(args.url)
+    async with session_context as session:
+        return await replay(session, events, args.speed, args.max_in_flight)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace", nargs="?", help="JSONL trace to replay")
+    parser.add_argument("--speed", type=_parse_speed, default=1.0, help="1, N (e.g. 10 or 10x) or max")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Concurrent call limit")
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/mcp", help="Server URL for --transport http")
+    parser.add_argument("--spawn", action="store_true", help="Start a local HTTP server for the replay")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for --spawn")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--upstream", choices=["fake", "real"], default="fake",
+                        help="Spawned server talks to the fake upstream (default) or RAJAONGKIR_BASE_URL")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=30.0, help="Fake upstream jitter")
+    parser.add_argument("--upstream-port", type=int, default=8766, help="Fake upstream port")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--generate", metavar="PATH", help="Write a synthetic sample trace and exit")
+    args = parser.parse_args()
+
+    if args.generate:
+        with open(args.generate, "w", encoding="utf-8") as f:
+            for event in generate_trace():
+                f.write(json.dumps(event) + "\n")
+        print(f"Wrote {args.generate}", file=sys.stderr)
+        return
+    if not args.trace:
+        parser.error("a trace file is required")
+
+    events = load_trace(args.trace)
+    upstream = server = None
+    if args.upstream == "fake":
+        upstream = fake_upstream.spawn(args.upstream_port, args.latency_ms, args.jitter_ms)
+        os.environ["RAJAONGKIR_BASE_URL"] = f"http://127.0.0.1:{args.upstream_port}"
+        os.environ.setdefault("RAJAONGKIR_API_KEY", "replay")
+    env = dict(os.environ)
+
+    try:
+        if args.transport == "http" and args.spawn:
+            server = spawn_server("127.0.0.1", args.port, args.workers)
+            args.url = f"http://127.0.0.1:{args.port}/mcp"
+        report = asyncio.run(_run(args, events, env))
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        if upstream is not None:
+            upstream.terminate()
+            upstream.wait(timeout=10)
+
+    report["trace"] = args.trace
+    report["speed"] = args.speed or "max"
+    report["transport"] = args.transport
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
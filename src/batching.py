@@ -0,0 +1,190 @@
+"""
+Batching Module
+===============
+Micro-batcher that merges concurrent district cost calls into one
+multi-courier upstream request.
+
+The district cost endpoint accepts colon-joined couriers. Calls for the
+same origin, destination, weight and price that arrive within
+COST_BATCH_WINDOW_MS share one POST with the union of their couriers;
+each caller gets back only the rows for its own couriers (matched on the
+row's `code`). Identical concurrent calls collapse into one request.
+
+If a merged request is rejected as invalid (400 or 422, e.g. one courier
+is not served on the route), each caller is retried with its own request,
+so one caller's couriers cannot fail another's. Any other failure (rate
+limiting, 5xx, network, quota) is passed to every caller as is: splitting
+would only multiply upstream calls while the upstream is struggling.
+
+Only calls of the same tenant are merged. The batch is sent on behalf of
+that tenant, in the most urgent priority class among its callers.
+"""
+
+import asyncio
+import contextvars
+from collections.abc import Awaitable, Callable
+from contextlib import nullcontext
+from typing import Any
+
+from .deadline import deadline_scope, remaining
+from .exceptions import APIError
+from .metrics import COST_BATCH_SIZE
+from .scheduler import CLASSES, current_priority, priority_scope
+from .tenants import current_tenant, tenant_namespace, tenant_scope
+
+# (tenant, origin, destination, weight, price)
+BatchKey = tuple[str, str, str, int, str]
+SendFunction = Callable[[str, str, int, str, str], Awaitable[dict[str, Any]]]
+# Per caller courier string: its response, or the error to raise
+BatchResults = dict[str, dict[str, Any] | Exception]
+
+# Statuses of a merged request that are retried per caller
+SPLIT_STATUSES = (400, 422)
+
+
+class _Batch:
+    """Calls collected for one key during the window."""
+
+    __slots__ = ("key", "tenant", "priority", "couriers", "callers", "future", "deadline", "timer")
+
+    def __init__(self, key: BatchKey) -> None:
+        self.key = key
+        self.tenant = current_tenant()
+        # Most urgent priority class among the callers
+        self.priority = CLASSES[-1]
+        self.couriers: list[str] = []
+        self.callers: list[str] = []
+        self.future: asyncio.Future[BatchResults] = asyncio.get_running_loop().create_future()
+        # Longest time any caller is willing to wait, None if one has no deadline
+        self.deadline: float | None = 0.0
+        self.timer: asyncio.TimerHandle | None = None
+
+    def add(self, courier: str) -> None:
+        if courier not in self.callers:
+            self.callers.append(courier)
+        request_class = current_priority()
+        if CLASSES.index(request_class) < CLASSES.index(self.priority):
+            self.priority = request_class
+        for code in courier.split(":"):
+            if code not in self.couriers:
+                self.couriers.append(code)
+        left = remaining()
+        if left is None or self.deadline is None:
+            self.deadline = None
+        else:
+            self.deadline = max(self.deadline, left)
+
+
+def split_rows(response: dict[str, Any], courier: str) -> dict[str, Any]:
+    """
+    The part of a multi-courier cost response that belongs to `courier`.
+
+    Args:
+        response: Raw API response with a list of rows in `data`.
+        courier: Colon-joined courier codes of one caller.
+
+    Returns:
+        The response with `data` filtered to rows whose `code` is one of
+        the caller's couriers. Non-list payloads are returned unchanged.
+    """
+    rows = response.get("data")
+    if not isinstance(rows, list):
+        return response
+    wanted = set(courier.split(":"))
+    return {
+        **response,
+        "data": [row for row in rows if str(row.get("code", "")).lower() in wanted],
+    }
+
+
+class CostBatcher:
+    """Collects district cost calls per key and sends them as one request."""
+
+    def __init__(self, send: SendFunction, window_ms: float, max_couriers: int) -> None:
+        """
+        Args:
+            send: Coroutine performing one upstream request
+                (origin, destination, weight, courier, price).
+            window_ms: How long the first call of a batch waits for others.
+            max_couriers: Send a batch early once it has this many couriers.
+        """
+        self.send = send
+        self.window = window_ms / 1000
+        self.max_couriers = max_couriers
+        self._pending: dict[BatchKey, _Batch] = {}
+
+    async def submit(
+        self,
+        origin: str,
+        destination: str,
+        weight: int,
+        courier: str,
+        price: str,
+    ) -> dict[str, Any]:
+        """Queue one call and wait for its share of the batched response."""
+        key = (tenant_namespace(), origin, destination, weight, price)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch(key)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, batch)
+        batch.add(courier)
+        if len(batch.couriers) >= self.max_couriers:
+            batch.timer.cancel()
+            self._flush(batch)
+
+        # Shielded: a caller that gives up must not cancel the others' request
+        results = await asyncio.shield(batch.future)
+        result = results[courier]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self, batch: _Batch) -> None:
+        """Close the batch and send it from a task outside any caller's context."""
+        if self._pending.get(batch.key) is batch:
+            del self._pending[batch.key]
+        # Empty context: the request is not part of the first caller's trace
+        # and is bounded by the batch deadline rather than that caller's.
+        # _run restores the batch's tenant and priority class.
+        contextvars.Context().run(asyncio.ensure_future, self._run(batch))
+
+    async def _run(self, batch: _Batch) -> None:
+        COST_BATCH_SIZE.observe((), len(batch.callers))
+        scope = deadline_scope(batch.deadline) if batch.deadline is not None else nullcontext()
+        try:
+            with scope, tenant_scope(batch.tenant), priority_scope(batch.priority):
+                results = await self._send_batch(batch)
+        except asyncio.CancelledError:
+            batch.future.cancel()
+            raise
+        except Exception as e:
+            batch.future.set_exception(e)
+            # Mark as retrieved in case every caller has already given up
+            batch.future.exception()
+        else:
+            batch.future.set_result(results)
+
+    async def _send_batch(self, batch: _Batch) -> BatchResults:
+        _, origin, destination, weight, price = batch.key
+        if len(batch.callers) == 1:
+            courier = batch.callers[0]
+            return {courier: await self.send(origin, destination, weight, courier, price)}
+
+        try:
+            response = await self.send(origin, destination, weight, ":".join(batch.couriers), price)
+            return {courier: split_rows(response, courier) for courier in batch.callers}
+        except APIError as e:
+            if e.status_code not in SPLIT_STATUSES:
+                raise
+
+        # Merged request rejected: send each caller's couriers on their own
+        responses = await asyncio.gather(
+            *(self.send(origin, destination, weight, courier, price) for courier in batch.callers),
+            return_exceptions=True,
+        )
+        results: BatchResults = {}
+        for courier, response in zip(batch.callers, responses):
+            if isinstance(response, BaseException) and not isinstance(response, Exception):
+                raise response
+            results[courier] = response
+        return results
@@ -5,12 +5,76 @@ Async HTTP client for RajaOngkir Komerce API V2.
 Based on the official Postman Collection specifications.
 """
 
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from typing import Any
 
+import anyio
 import httpx
 
+from .batching import CostBatcher
 from .config import settings
-from .exceptions import APIError, ConfigurationError, NetworkError
+from .deadline import bounded_timeout, remaining
+from .exceptions import APIError, ConfigurationError, DeadlineExceededError, NetworkError
+from .key_pool import KEY_STATUSES, ApiKey, KeyPool, key_pool
+from .lifecycle import on_shutdown
+from .metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_LATENCY, UPSTREAM_REQUESTS, UPSTREAM_TIMEOUTS
+from .quota import QuotaTracker, UpstreamCache, quota_tracker
+from .scheduler import FairScheduler, current_priority
+from .state import usage_sync
+from .tenants import Tenant, TenantLimiter, current_tenant, tenant_registry
+from .tracing import Span, current_span, traced, tracer
+
+
+class _HttpPhases:
+    """
+    httpx "trace" extension that splits a request into phases for its span.
+
+    httpcore reports connection and HTTP/1.1 events; time before the first
+    event (queue_ms) is request setup plus waiting for a free connection
+    in the pool.
+    """
+
+    def __init__(self, span: Span) -> None:
+        self.span = span
+        self.start = time.perf_counter()
+        self.events: dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: dict[str, Any]) -> None:
+        # "http11.send_request_headers.started" -> "send_request_headers.started"
+        self.events.setdefault(event_name.split(".", 1)[1], time.perf_counter())
+
+    def _ms(self, start: float | None, end: float | None) -> float | None:
+        if start is None or end is None:
+            return None
+        return round((end - start) * 1000, 3)
+
+    def record(self) -> None:
+        """Attach phase durations (ms) to the span."""
+        events = self.events
+        if not events:
+            return
+        connect_end = events.get("start_tls.complete", events.get("connect_tcp.complete"))
+        phases = {
+            "queue_ms": self._ms(self.start, min(events.values())),
+            "connect_ms": self._ms(events.get("connect_tcp.started"), connect_end),
+            "send_ms": self._ms(
+                events.get("send_request_headers.started"),
+                events.get("send_request_body.complete"),
+            ),
+            "upstream_ms": self._ms(
+                events.get("send_request_body.complete"),
+                events.get("receive_response_headers.complete"),
+            ),
+            "receive_ms": self._ms(
+                events.get("receive_response_headers.complete"),
+                events.get("receive_response_body.complete"),
+            ),
+        }
+        self.span.set_attributes({k: v for k, v in phases.items() if v is not None})
 
 
 class RajaOngkirClient:
@@ -19,28 +83,170 @@ class RajaOngkirClient:
 
     This client handles all HTTP communication with the RajaOngkir API,
     including authentication, request formatting, and error handling.
+    All requests share one connection pool per event loop, and at most
+    MAX_CONCURRENT_REQUESTS are in flight; both the wait for a slot and the
+    request itself are bounded by the calling tool's deadline. Each
+    request is sent with a key from the key pool.
+
+    A tenant's client (see get_client) sends through the pool of the
+    shared client, with its own keys, limits and concurrency cap.
+
+    Quote, search and tracking answers are kept in an upstream cache and
+    reused as the quota tracker's policy allows (see quota).
     """
 
-    def __init__(self) -> None:
-        """Initialize the client with settings."""
-        self.api_key = settings.API_KEY
+    def __init__(self, tenant: Tenant | None = None, shared: "RajaOngkirClient | None" = None) -> None:
+        """
+        Initialize the client with settings.
+
+        Args:
+            tenant: Tenant the client works for (None: the deployment).
+            shared: Client whose connection pool and concurrency slots
+                this one shares.
+        """
         self.timeout = settings.REQUEST_TIMEOUT
+        self.tenant = tenant
+        self._shared = shared
+        self.keys = key_pool
+        self.quota = quota_tracker
+        self.cache = UpstreamCache(settings.UPSTREAM_CACHE_MAX_ENTRIES)
+        self.limiter: TenantLimiter | None = None
+        self.max_concurrent = settings.MAX_CONCURRENT_REQUESTS
+        if tenant is not None:
+            self.limiter = tenant_registry.limiter(tenant)
+            self.max_concurrent = tenant.max_concurrent
+            if tenant.api_keys:
+                self.keys = KeyPool(
+                    tenant.api_keys,
+                    default_quota=settings.API_KEY_DAILY_QUOTA,
+                    cooldown=settings.API_KEY_COOLDOWN,
+                    disable_seconds=settings.API_KEY_DISABLE_SECONDS,
+                    path=_tenant_path(settings.API_KEY_USAGE_FILE, tenant),
+                    prefix=f"{tenant.name}/",
+                )
+                # The tenant's own keys are its own plan
+                self.quota = QuotaTracker(tenant.name, self.keys, path=_tenant_path(settings.QUOTA_USAGE_FILE, tenant))
+                usage_sync.add(self.keys.sync)
+                usage_sync.add(self.quota.sync)
+        self._http: httpx.AsyncClient | None = None
+        self._http_loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._scheduler: FairScheduler | None = None
+        self._cost_batcher: CostBatcher | None = None
+        if settings.COST_BATCH_WINDOW_MS > 0:
+            self._cost_batcher = CostBatcher(
+                self._district_domestic_cost_request,
+                window_ms=settings.COST_BATCH_WINDOW_MS,
+                max_couriers=settings.COST_BATCH_MAX_COURIERS,
+            )
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Return the pooled httpx client, creating it on first use.
+
+        A pool is bound to the event loop it was created on, so a new one is
+        created if the client is used from another loop (e.g. scripts that
+        call asyncio.run() more than once). A tenant's client returns the
+        shared client's pool.
+        """
+        loop = asyncio.get_running_loop()
+        if self._shared is not None:
+            if self._http_loop is not loop:
+                self._http_loop = loop
+                self._slots = None
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_concurrent)
+            return self._shared._get_http_client()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.MAX_CONNECTIONS,
+                ),
+            )
+            self._http_loop = loop
+            self._scheduler = None
+        if self._scheduler is None:
+            self._scheduler = self._new_scheduler()
+        return self._http
+
+    def _new_scheduler(self) -> FairScheduler:
+        return FairScheduler(
+            self.max_concurrent,
+            weights=settings.SCHEDULER_WEIGHTS,
+            max_wait_ms=settings.SCHEDULER_MAX_WAIT_MS,
+        )
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """
+        Hold one upstream concurrency slot, waiting at most until the deadline.
+
+        Waiting requests are served by priority class (see scheduler.py).
+        The slot is released on every exit path, including cancellation.
+        A tenant's client takes one of its own slots first, then one of
+        the shared client's, so it never holds more than its cap of the
+        shared slots.
+
+        Raises:
+            DeadlineExceededError: If no slot frees up before the deadline.
+        """
+        if self._shared is not None:
+            slots = self._slots or asyncio.Semaphore(self.max_concurrent)
+            self._slots = slots
+            with anyio.move_on_after(remaining()) as scope:
+                await slots.acquire()
+            if scope.cancelled_caught:
+                raise self._no_slot_error()
+            try:
+                async with self._shared._slot():
+                    yield
+            finally:
+                slots.release()
+            return
+
+        scheduler = self._scheduler or self._new_scheduler()
+        self._scheduler = scheduler
+        with anyio.move_on_after(remaining()) as scope:
+            await scheduler.acquire(current_priority())
+        if scope.cancelled_caught:
+            raise self._no_slot_error()
+        try:
+            yield
+        finally:
+            scheduler.release()
+
+    @staticmethod
+    def _no_slot_error() -> DeadlineExceededError:
+        return DeadlineExceededError(
+            message="Deadline exceeded",
+            detail="No upstream request slot became free before the deadline.",
+        )
+
+    async def aclose(self) -> None:
+        """Close the connection pool (a tenant's client has none of its own)."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._http_loop = None
 
     def _get_headers(self, include_content_type: bool = False) -> dict[str, str]:
-        """Generate headers for API requests."""
-        headers = {"key": self.api_key or ""}
+        """Generate headers for API requests (the key is added per request)."""
+        headers: dict[str, str] = {}
         if include_content_type:
             headers["content-type"] = "application/x-www-form-urlencoded"
         return headers
 
     def _ensure_configured(self) -> None:
         """Ensure API key is configured."""
-        if not settings.is_configured:
+        if not self.keys:
             raise ConfigurationError(
                 message="API key not configured",
-                detail="Please set RAJAONGKIR_API_KEY in .env file.",
+                detail="Please set RAJAONGKIR_API_KEY (or RAJAONGKIR_API_KEYS) in .env file.",
             )
 
+    @traced("http.decode")
     def _handle_response(self, response: httpx.Response) -> dict[str, Any]:
         """
         Handle API response and raise errors if needed.
@@ -107,38 +313,155 @@ class RajaOngkirClient:
                 detail="The API returned an invalid JSON response.",
             )
 
-    async def _get(self, url: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+    @staticmethod
+    def _endpoint_label(url: str) -> str:
+        """Metric label for a URL: the API path with numeric IDs replaced."""
+        path = url[len(settings.BASE_URL):] if url.startswith(settings.BASE_URL) else httpx.URL(url).path
+        return "/".join(":id" if part.isdigit() else part for part in path.split("/"))
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        params: dict[str, Any] | None = None,
+        data: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
         """
-        Make a GET request.
+        Send a request with a pooled API key.
+
+        A 401, 403 or 429 answer is retried on each other key in turn.
+        When no key is usable, the call waits for the first one to come
+        back if that is before its deadline (REQUEST_TIMEOUT without one).
+        A tenant's request is first admitted by its rate and quota limits.
 
         Args:
+            method: HTTP method.
             url: The URL to request.
+            headers: Request headers.
             params: Optional query parameters.
+            data: Optional form data.
 
         Returns:
             Parsed JSON response.
+
+        Raises:
+            APIError: The last key's error, 401/429 if no key is usable, or
+                429 from the tenant's limits.
         """
         self._ensure_configured()
-
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        if self.limiter is not None:
+            await self.limiter.acquire()
+
+        keys = self.keys
+        failed: set[str] = set()
+        last_error: APIError | None = None
+        while True:
+            key = keys.acquire(failed)
+            if key is None:
+                wait = keys.wait_time(failed)
+                left = remaining()
+                if wait is None or wait >= (self.timeout if left is None else left):
+                    raise last_error or keys.unavailable_error()
+                await asyncio.sleep(max(wait, 0.01))
+                continue
             try:
-                response = await client.get(
-                    url,
-                    headers=self._get_headers(),
-                    params=params,
-                )
-                return self._handle_response(response)
+                return await self._send(method, url, {**headers, "key": key.value}, params, data, key)
+            except APIError as e:
+                if e.status_code not in KEY_STATUSES or len(keys) == 1:
+                    raise
+                failed.add(key.fingerprint)
+                last_error = e
+            finally:
+                keys.release(key)
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        params: dict[str, Any] | None,
+        data: dict[str, Any] | None,
+        key: ApiKey,
+    ) -> dict[str, Any]:
+        """Send one request through the shared pool and record upstream metrics."""
+        endpoint = self._endpoint_label(url)
+        with tracer.span("http.request", {"http.method": method, "endpoint": endpoint}) as span:
+            # Inside the span: the first call builds the pool (and SSL context)
+            client = self._get_http_client()
+            slot_wait_start = time.perf_counter()
+            async with self._slot():
+                # Never wait on upstream longer than the tool has left
+                timeout = bounded_timeout(self.timeout)
+                phases = None
+                if span.sampled:
+                    span.set_attributes({
+                        "slot_wait_ms": round((time.perf_counter() - slot_wait_start) * 1000, 3),
+                        "priority": current_priority(),
+                    })
+                    phases = _HttpPhases(span)
+                UPSTREAM_IN_FLIGHT.inc()
+                start = time.perf_counter()
+                try:
+                    response = await client.request(
+                        method,
+                        url,
+                        headers=headers,
+                        params=params,
+                        data=data,
+                        timeout=timeout,
+                        extensions={"trace": phases} if phases else None,
+                    )
+                    UPSTREAM_REQUESTS.inc((endpoint, str(response.status_code)))
+                    self.keys.record(key, response.status_code, response.headers.get("retry-after"))
+                    self.quota.record(endpoint, response.status_code)
+                    if phases:
+                        phases.record()
+                        span.set_attributes({
+                            "http.status_code": response.status_code,
+                            "bytes": len(response.content),
+                            "api_key": key.label,
+                        })
+                    return self._handle_response(response)
+
+                except httpx.TimeoutException:
+                    UPSTREAM_TIMEOUTS.inc((endpoint,))
+                    UPSTREAM_REQUESTS.inc((endpoint, "timeout"))
+                    if timeout < self.timeout:
+                        raise DeadlineExceededError(
+                            message="Deadline exceeded",
+                            detail="The upstream API did not answer before the call's deadline.",
+                        )
+                    raise NetworkError(
+                        message="Request timeout",
+                        detail="The request took too long. Please try again.",
+                    )
+                except httpx.RequestError as e:
+                    UPSTREAM_REQUESTS.inc((endpoint, "network_error"))
+                    raise NetworkError(
+                        message="Network request failed",
+                        detail=str(e),
+                    )
+                except asyncio.CancelledError:
+                    # Tool deadline or MCP cancellation: httpx aborts the request
+                    UPSTREAM_REQUESTS.inc((endpoint, "cancelled"))
+                    raise
+                finally:
+                    UPSTREAM_LATENCY.observe((endpoint,), time.perf_counter() - start)
+                    UPSTREAM_IN_FLIGHT.dec()
 
-            except httpx.TimeoutException:
-                raise NetworkError(
-                    message="Request timeout",
-                    detail="The request took too long. Please try again.",
-                )
-            except httpx.RequestError as e:
-                raise NetworkError(
-                    message="Network request failed",
-                    detail=str(e),
-                )
+    async def _get(self, url: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        """
+        Make a GET request.
+
+        Args:
+            url: The URL to request.
+            params: Optional query parameters.
+
+        Returns:
+            Parsed JSON response.
+        """
+        return await self._request("GET", url, self._get_headers(), params=params)
 
     async def _post(
         self,
@@ -157,28 +480,34 @@ class RajaOngkirClient:
         Returns:
             Parsed JSON response.
         """
-        self._ensure_configured()
+        return await self._request(
+            "POST",
+            url,
+            self._get_headers(include_content_type=True if data else False),
+            params=params,
+            data=data,
+        )
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                response = await client.post(
-                    url,
-                    headers=self._get_headers(include_content_type=True if data else False),
-                    data=data,
-                    params=params,
-                )
-                return self._handle_response(response)
+    async def _cached(
+        self,
+        url: str,
+        args: dict[str, Any],
+        fetch: Callable[[], Awaitable[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        """
+        An answer from the upstream cache if the quota policy allows its age, else fetch().
 
-            except httpx.TimeoutException:
-                raise NetworkError(
-                    message="Request timeout",
-                    detail="The request took too long. Please try again.",
-                )
-            except httpx.RequestError as e:
-                raise NetworkError(
-                    message="Network request failed",
-                    detail=str(e),
-                )
+        Fetched answers are cached. Reused ones are returned as a
+        CachedPayload carrying their age.
+        """
+        key = (url, *sorted(args.items()))
+        cached = self.cache.get(key, self.quota.cache_ttl())
+        if cached is not None:
+            current_span().set_attributes({"cache": "hit", "source": "upstream_cache"})
+            return cached
+        payload = await fetch()
+        self.cache.put(key, payload)
+        return payload
 
     # ========================================================================
     # Search Method Endpoints
@@ -191,10 +520,9 @@ class RajaOngkirClient:
         offset: int = 0,
     ) -> dict[str, Any]:
         """Search domestic destinations (cities/districts)."""
-        return await self._get(
-            settings.domestic_destination_url,
-            params={"search": query, "limit": limit, "offset": offset},
-        )
+        url = settings.domestic_destination_url
+        params = {"search": query, "limit": limit, "offset": offset}
+        return await self._cached(url, params, lambda: self._get(url, params=params))
 
     async def search_international_destination(
         self,
@@ -203,10 +531,9 @@ class RajaOngkirClient:
         offset: int = 0,
     ) -> dict[str, Any]:
         """Search international destinations (countries)."""
-        return await self._get(
-            settings.international_destination_url,
-            params={"search": query, "limit": limit, "offset": offset},
-        )
+        url = settings.international_destination_url
+        params = {"search": query, "limit": limit, "offset": offset}
+        return await self._cached(url, params, lambda: self._get(url, params=params))
 
     # ========================================================================
     # Step-by-Step Method Endpoints
@@ -241,16 +568,15 @@ class RajaOngkirClient:
         price: str = "lowest",
     ) -> dict[str, Any]:
         """Calculate domestic shipping cost (Search Method)."""
-        return await self._post(
-            settings.domestic_cost_url,
-            data={
-                "origin": origin,
-                "destination": destination,
-                "weight": weight,
-                "courier": courier,
-                "price": price,
-            },
-        )
+        url = settings.domestic_cost_url
+        data = {
+            "origin": origin,
+            "destination": destination,
+            "weight": weight,
+            "courier": courier,
+            "price": price,
+        }
+        return await self._cached(url, data, lambda: self._post(url, data=data))
 
     async def calculate_district_domestic_cost(
         self,
@@ -260,7 +586,30 @@ class RajaOngkirClient:
         courier: str,
         price: str = "lowest",
     ) -> dict[str, Any]:
-        """Calculate domestic shipping cost using District IDs (Step-by-Step)."""
+        """
+        Calculate domestic shipping cost using District IDs (Step-by-Step).
+
+        Concurrent calls for the same route, weight and price are merged
+        into one multi-courier request (see CostBatcher); each caller still
+        receives only its own couriers' rows.
+        """
+        async def fetch() -> dict[str, Any]:
+            if self._cost_batcher is not None:
+                return await self._cost_batcher.submit(origin, destination, weight, courier, price)
+            return await self._district_domestic_cost_request(origin, destination, weight, courier, price)
+
+        args = {"origin": origin, "destination": destination, "weight": weight, "courier": courier, "price": price}
+        return await self._cached(settings.district_domestic_cost_url, args, fetch)
+
+    async def _district_domestic_cost_request(
+        self,
+        origin: str,
+        destination: str,
+        weight: int,
+        courier: str,
+        price: str,
+    ) -> dict[str, Any]:
+        """Send one district cost request (unbatched)."""
         return await self._post(
             settings.district_domestic_cost_url,
             data={
@@ -281,16 +630,15 @@ class RajaOngkirClient:
         price: str = "lowest",
     ) -> dict[str, Any]:
         """Calculate international shipping cost."""
-        return await self._post(
-            settings.international_cost_url,
-            data={
-                "origin": origin,
-                "destination": destination,
-                "weight": weight,
-                "courier": courier,
-                "price": price,
-            },
-        )
+        url = settings.international_cost_url
+        data = {
+            "origin": origin,
+            "destination": destination,
+            "weight": weight,
+            "courier": courier,
+            "price": price,
+        }
+        return await self._cached(url, data, lambda: self._post(url, data=data))
 
     # ========================================================================
     # Tracking Endpoint
@@ -301,11 +649,37 @@ class RajaOngkirClient:
         Track a package by AWB number.
         NOTE: Uses query params even though it's a POST request (per Postman spec).
         """
-        return await self._post(
-            settings.track_waybill_url,
-            params={"awb": awb, "courier": courier},
-        )
+        url = settings.track_waybill_url
+        params = {"awb": awb, "courier": courier}
+        return await self._cached(url, params, lambda: self._post(url, params=params))
+
+
+def _tenant_path(path: str, tenant: Tenant) -> str:
+    """A tenant's own variant of a state file path ('' stays '')."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{tenant.name}{ext}" if root else ""
 
 
 # Global client instance
 api_client = RajaOngkirClient()
+on_shutdown(api_client.aclose)
+
+# Clients of the tenants that have made calls, by tenant name
+_tenant_clients: dict[str, RajaOngkirClient] = {}
+
+
+def get_client() -> RajaOngkirClient:
+    """
+    The client of the current tool call's tenant.
+
+    Returns api_client in single-tenant mode and outside tool calls.
+    """
+    tenant = current_tenant()
+    if tenant is None:
+        return api_client
+    client = _tenant_clients.get(tenant.name)
+    if client is None:
+        client = _tenant_clients[tenant.name] = RajaOngkirClient(tenant, shared=api_client)
+    return client
+
+
@@ -6,12 +6,7 @@ Handles all configuration and environment variable loading.
 
 import os
 import sys
-from dataclasses import dataclass
-
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+from dataclasses import dataclass, field
 
 
 @dataclass(frozen=True)
@@ -21,16 +16,127 @@ class Settings:
     # API Configuration
     BASE_URL: str = "https://rajaongkir.komerce.id/api/v1"
     API_KEY: str | None = None
+    API_KEYS: tuple[str, ...] = ()  # key pool, "key" or "key=daily quota" entries
+    API_KEY_DAILY_QUOTA: int = 0  # requests per key and day, 0 = unknown
+    API_KEY_COOLDOWN: float = 5.0  # seconds a key rests after a 429 without Retry-After
+    API_KEY_DISABLE_SECONDS: float = 3600.0  # after a 401/403, 0 = until restart
+    API_KEY_USAGE_FILE: str = ""  # empty keeps daily usage counts in memory only
+
+    # Multi-Tenant Mode (tenants, their tokens and keys from a JSON file)
+    TENANTS_FILE: str = ""  # empty serves a single tenant with the keys above
+    TENANT: str | None = None  # tenant of a stdio session
+    TENANT_RATE_PER_MINUTE: float = 0.0  # default upstream requests per minute, 0 = unlimited
+    TENANT_DAILY_QUOTA: int = 0  # default upstream requests per day, 0 = unlimited
+    TENANT_MAX_CONCURRENT: int = 25  # default upstream requests in flight per tenant
+    TENANT_USAGE_FILE: str = ""  # empty keeps daily tenant usage counts in memory only
+
+    # Daily Quota Budget (accounting and cache-first degradation)
+    QUOTA_DAILY_LIMIT: int = 0  # upstream calls per day, 0 = sum of key quotas (if all known)
+    QUOTA_CONSERVE_AT: float = 0.5  # share of the budget left below which cached answers are reused
+    QUOTA_STALE_AT: float = 0.2  # ... below which old cached answers are served
+    QUOTA_SHED_AT: float = 0.05  # ... below which QUOTA_SHED_TOOLS are refused
+    QUOTA_RATE_HALF_LIFE: float = 900.0  # seconds, for the projected call rate
+    QUOTA_CONSERVE_TTL: float = 1800.0
+    QUOTA_STALE_MAX_AGE: float = 86400.0
+    QUOTA_SHED_TOOLS: tuple[str, ...] = ("export_quotes",)
+    QUOTA_USAGE_FILE: str = ""  # empty keeps daily call counts in memory only
+    UPSTREAM_CACHE_TTL: float = 0.0  # reuse answers this long at a normal budget, 0 = never
+    UPSTREAM_CACHE_MAX_ENTRIES: int = 5000  # recent answers kept for reuse, 0 disables
 
     # HTTP Client Configuration
     REQUEST_TIMEOUT: float = 30.0
+    MAX_CONNECTIONS: int = 100
+    MAX_CONCURRENT_REQUESTS: int = 100  # upstream requests in flight per process
+
+    # Request Priorities (weighted fair queue for the upstream slots)
+    SCHEDULER_WEIGHTS: dict[str, float] = field(default_factory=dict)  # overrides of quote=8,lookup=4,bulk=1
+    SCHEDULER_MAX_WAIT_MS: float = 2000.0  # queued longer goes next regardless of class, 0 disables
+    TOOL_PRIORITIES: dict[str, str] = field(default_factory=dict)  # per-tool class overrides
+
+    # District Cost Batching (merge concurrent calls into one multi-courier request)
+    COST_BATCH_WINDOW_MS: float = 5.0  # 0 disables
+    COST_BATCH_MAX_COURIERS: int = 10
+
+    # Tool Deadline Configuration (seconds)
+    TOOL_DEADLINE: float = 30.0
+    TOOL_DEADLINES: dict[str, float] = field(default_factory=dict)  # per-tool overrides
+
+    # Location Hierarchy Cache (get_provinces/cities/districts/subdistricts)
+    LOCATION_TREE: bool = True
+    # Memory-mapped snapshot file, default locations.snap in DATA_DIR, empty disables.
+    # The server only reads it; `location_snapshot build` and refresh write it.
+    LOCATION_SNAPSHOT: str = ""
+    LOCATION_SNAPSHOT_CHECK_INTERVAL: float = 5.0  # seconds between checks for a new file
+    LOCATION_CHANGE_LOG: str = ""  # JSONL report of each snapshot refresh, empty disables
+
+    # List Paging Configuration
+    LIST_PAGE_SIZE: int = 100  # 0 disables paging, as do WORKERS > 1
+    RESULT_STORE_TTL: float = 300.0
+    RESULT_STORE_MAX_ENTRIES: int = 256
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256  # pre-encoded responses, 0 disables
+    RESPONSE_CACHE_MAX_BYTES: int = 16 * 2**20
+
+    # CPU Offload (large responses built in worker processes)
+    OFFLOAD_WORKERS: int = 2  # 0 builds every response on the event loop
+    OFFLOAD_MIN_ITEMS: int = 1000  # list size sent to the workers
+    LOOP_LAG_INTERVAL_MS: float = 100.0  # event loop lag probe, 0 disables
+    LOOP_LAG_BUDGET_MS: float = 50.0
+
+    # Local State Configuration
+    DATA_DIR: str = os.path.join(os.path.expanduser("~"), ".cache", "rajaongkir-mcp")
+    COURIER_DETECT_FILE: str = ""  # empty keeps learned detection stats in memory only
+
+    # Courier-Lane Matrix (learned from district cost responses)
+    LANE_MATRIX_FILE: str = ""  # empty keeps the matrix in memory only
+    LANE_PRUNE: bool = False  # drop couriers known not to serve a lane
+    LANE_MIN_OBSERVATIONS: float = 3.0
+    LANE_HALF_LIFE_DAYS: float = 30.0
+    LANE_MATRIX_MAX_LANES: int = 50_000
+
+    # Offline Cost Estimation (learned from live cost responses)
+    COST_ESTIMATE_FILE: str = ""  # empty keeps the statistics in memory only
+    COST_ESTIMATE_FALLBACK: bool = False  # answer with an estimate when the upstream fails
+    COST_ESTIMATE_HALF_LIFE_DAYS: float = 90.0
+
+    # Quote and Tracking History (SQLite)
+    HISTORY_DB: str = ""  # empty disables the history store
+    HISTORY_BATCH_SIZE: int = 500  # buffered rows that trigger a write
+    HISTORY_FLUSH_INTERVAL: float = 2.0  # seconds between writes otherwise
+    HISTORY_MAX_PENDING: int = 20_000  # buffered rows beyond this are dropped
+
+    # Quote Export (CSV / Parquet)
+    EXPORT_DIR: str = ""
+    EXPORT_PARQUET_BATCH_ROWS: int = 10_000  # rows per Parquet row group
+    EXPORT_MAX_LANES: int = 500  # lanes per live export
+    EXPORT_CONCURRENCY: int = 4  # live lanes quoted at once
+
+    # Tracking Courier Detection
+    TRACK_DETECT_PARALLEL: int = 3  # candidate couriers queried at once
+    TRACK_DETECT_MAX_ATTEMPTS: int = 6
 
     # Server Configuration
     SERVER_NAME: str = "RajaOngkir Komerce"
+    TRANSPORT: str = "stdio"  # stdio, streamable-http or sse
+    HOST: str = "127.0.0.1"
+    PORT: int = 8000
+    WORKERS: int = 1
+    SHUTDOWN_TIMEOUT: float = 10.0
+
+    # Observability Configuration
+    METRICS_PORT: int = 0  # stdio mode only, 0 disables
+    METRICS_HOST: str = "127.0.0.1"
+    TRACE_SAMPLE_RATE: float = 0.0  # share of tool calls traced, 0 disables
+    TRACE_EXPORTER: str = "console"  # console, file or none
+    TRACE_FILE: str = "traces.jsonl"
+    PROFILE_SAMPLE_RATE: float = 0.0  # share of tool calls profiled, 0 disables
+    PROFILE_THRESHOLD_MS: float = 0.0  # also profile calls slower than this, 0 disables
+    PROFILE_DIR: str = "profiles"
+    PROFILE_KEEP: int = 20  # slowest profiles kept in PROFILE_DIR
+    PROFILE_INTERVAL_MS: float = 5.0
 
     def __post_init__(self) -> None:
         """Validate settings after initialization."""
-        if not self.API_KEY:
+        if not self.API_KEY and not self.API_KEYS and not self.TENANTS_FILE:
             print(
                 "⚠️  WARNING: RAJAONGKIR_API_KEY is not set in .env file!",
                 file=sys.stderr,
@@ -47,7 +153,15 @@ class Settings:
     @property
     def is_configured(self) -> bool:
         """Check if the API key is configured."""
-        return bool(self.API_KEY)
+        return bool(self.API_KEY or self.API_KEYS)
+
+    @property
+    def api_keys(self) -> tuple[str, ...]:
+        """Key pool entries: API_KEYS plus API_KEY if it is not among them."""
+        keys = tuple(entry for entry in self.API_KEYS if entry)
+        if self.API_KEY and self.API_KEY not in (entry.partition("=")[0] for entry in keys):
+            keys += (self.API_KEY,)
+        return keys
 
     # ========================================================================
     # Search Method Endpoints
@@ -108,6 +222,58 @@ class Settings:
         return f"{self.BASE_URL}/track/waybill"
 
 
+def _env_int(name: str, default: int) -> int:
+    """Read an integer environment variable, falling back to default."""
+    value = os.getenv(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        print(f"⚠️  WARNING: {name}={value!r} is not an integer, using {default}", file=sys.stderr)
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float environment variable, falling back to default."""
+    value = os.getenv(name)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        print(f"⚠️  WARNING: {name}={value!r} is not a number, using {default}", file=sys.stderr)
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean environment variable (1/true/yes/on), falling back to default."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_float_map(name: str) -> dict[str, float]:
+    """Read a "key=seconds,key=seconds" environment variable."""
+    result: dict[str, float] = {}
+    for item in (os.getenv(name) or "").split(","):
+        key, _, value = item.partition("=")
+        if not key.strip():
+            continue
+        try:
+            result[key.strip()] = float(value)
+        except ValueError:
+            print(f"⚠️  WARNING: ignoring {name} entry {item.strip()!r}", file=sys.stderr)
+    return result
+
+
+def _env_str_map(name: str) -> dict[str, str]:
+    """Read a "key=value,key=value" environment variable."""
+    result: dict[str, str] = {}
+    for item in (os.getenv(name) or "").split(","):
+        key, _, value = item.partition("=")
+        if key.strip() and value.strip():
+            result[key.strip()] = value.strip()
+    return result
+
+
 def get_settings() -> Settings:
     """
     Factory function to create Settings instance.
@@ -115,9 +281,105 @@ def get_settings() -> Settings:
     Returns:
         Settings: Application settings loaded from environment.
     """
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    data_dir = os.path.expanduser(os.getenv("RAJAONGKIR_DATA_DIR") or Settings.DATA_DIR)
+    workers = _env_int("RAJAONGKIR_WORKERS", 1)
     return Settings(
         BASE_URL=os.getenv("RAJAONGKIR_BASE_URL", "https://rajaongkir.komerce.id/api/v1"),
         API_KEY=os.getenv("RAJAONGKIR_API_KEY"),
+        API_KEYS=tuple(key.strip() for key in (os.getenv("RAJAONGKIR_API_KEYS") or "").split(",") if key.strip()),
+        API_KEY_DAILY_QUOTA=max(0, _env_int("RAJAONGKIR_API_KEY_DAILY_QUOTA", 0)),
+        API_KEY_COOLDOWN=max(0.0, _env_float("RAJAONGKIR_API_KEY_COOLDOWN", 5.0)),
+        API_KEY_DISABLE_SECONDS=max(0.0, _env_float("RAJAONGKIR_API_KEY_DISABLE_SECONDS", 3600.0)),
+        API_KEY_USAGE_FILE=os.path.expanduser(os.getenv("RAJAONGKIR_API_KEY_USAGE_FILE") or ""),
+        TENANTS_FILE=os.path.expanduser(os.getenv("RAJAONGKIR_TENANTS_FILE") or ""),
+        TENANT=os.getenv("RAJAONGKIR_TENANT") or None,
+        TENANT_RATE_PER_MINUTE=max(0.0, _env_float("RAJAONGKIR_TENANT_RATE_PER_MINUTE", 0.0)),
+        TENANT_DAILY_QUOTA=max(0, _env_int("RAJAONGKIR_TENANT_DAILY_QUOTA", 0)),
+        TENANT_MAX_CONCURRENT=max(1, _env_int("RAJAONGKIR_TENANT_MAX_CONCURRENT", 25)),
+        TENANT_USAGE_FILE=os.path.expanduser(
+            os.getenv("RAJAONGKIR_TENANT_USAGE_FILE", os.path.join(data_dir, "tenant_usage.json"))
+        ),
+        QUOTA_DAILY_LIMIT=max(0, _env_int("RAJAONGKIR_QUOTA_DAILY_LIMIT", 0)),
+        QUOTA_CONSERVE_AT=_env_float("RAJAONGKIR_QUOTA_CONSERVE_AT", 0.5),
+        QUOTA_STALE_AT=_env_float("RAJAONGKIR_QUOTA_STALE_AT", 0.2),
+        QUOTA_SHED_AT=_env_float("RAJAONGKIR_QUOTA_SHED_AT", 0.05),
+        QUOTA_RATE_HALF_LIFE=max(1.0, _env_float("RAJAONGKIR_QUOTA_RATE_HALF_LIFE", 900.0)),
+        QUOTA_CONSERVE_TTL=max(0.0, _env_float("RAJAONGKIR_QUOTA_CONSERVE_TTL", 1800.0)),
+        QUOTA_STALE_MAX_AGE=max(0.0, _env_float("RAJAONGKIR_QUOTA_STALE_MAX_AGE", 86400.0)),
+        QUOTA_SHED_TOOLS=tuple(
+            tool.strip() for tool in os.getenv("RAJAONGKIR_QUOTA_SHED_TOOLS", "export_quotes").split(",") if tool.strip()
+        ),
+        QUOTA_USAGE_FILE=os.path.expanduser(os.getenv("RAJAONGKIR_QUOTA_USAGE_FILE") or ""),
+        UPSTREAM_CACHE_TTL=max(0.0, _env_float("RAJAONGKIR_UPSTREAM_CACHE_TTL", 0.0)),
+        UPSTREAM_CACHE_MAX_ENTRIES=max(0, _env_int("RAJAONGKIR_UPSTREAM_CACHE_MAX_ENTRIES", 5000)),
+        REQUEST_TIMEOUT=_env_float("RAJAONGKIR_REQUEST_TIMEOUT", 30.0),
+        MAX_CONNECTIONS=_env_int("RAJAONGKIR_MAX_CONNECTIONS", 100),
+        MAX_CONCURRENT_REQUESTS=_env_int("RAJAONGKIR_MAX_CONCURRENT_REQUESTS", 100),
+        SCHEDULER_WEIGHTS=_env_float_map("RAJAONGKIR_SCHEDULER_WEIGHTS"),
+        SCHEDULER_MAX_WAIT_MS=max(0.0, _env_float("RAJAONGKIR_SCHEDULER_MAX_WAIT_MS", 2000.0)),
+        TOOL_PRIORITIES=_env_str_map("RAJAONGKIR_TOOL_PRIORITIES"),
+        COST_BATCH_WINDOW_MS=_env_float("RAJAONGKIR_COST_BATCH_WINDOW_MS", 5.0),
+        COST_BATCH_MAX_COURIERS=_env_int("RAJAONGKIR_COST_BATCH_MAX_COURIERS", 10),
+        TOOL_DEADLINE=_env_float("RAJAONGKIR_TOOL_DEADLINE", 30.0),
+        TOOL_DEADLINES=_env_float_map("RAJAONGKIR_TOOL_DEADLINES"),
+        TRANSPORT=os.getenv("RAJAONGKIR_TRANSPORT", "stdio").strip().lower(),
+        HOST=os.getenv("RAJAONGKIR_HOST", "127.0.0.1"),
+        PORT=_env_int("RAJAONGKIR_PORT", 8000),
+        WORKERS=workers,
+        SHUTDOWN_TIMEOUT=_env_float("RAJAONGKIR_SHUTDOWN_TIMEOUT", 10.0),
+        METRICS_PORT=_env_int("RAJAONGKIR_METRICS_PORT", 0),
+        METRICS_HOST=os.getenv("RAJAONGKIR_METRICS_HOST", "127.0.0.1"),
+        TRACE_SAMPLE_RATE=_env_float("RAJAONGKIR_TRACE_SAMPLE_RATE", 0.0),
+        TRACE_EXPORTER=os.getenv("RAJAONGKIR_TRACE_EXPORTER", "console").strip().lower(),
+        TRACE_FILE=os.getenv("RAJAONGKIR_TRACE_FILE", "traces.jsonl"),
+        PROFILE_SAMPLE_RATE=_env_float("RAJAONGKIR_PROFILE_SAMPLE_RATE", 0.0),
+        PROFILE_THRESHOLD_MS=_env_float("RAJAONGKIR_PROFILE_THRESHOLD_MS", 0.0),
+        PROFILE_DIR=os.getenv("RAJAONGKIR_PROFILE_DIR", "profiles"),
+        PROFILE_KEEP=_env_int("RAJAONGKIR_PROFILE_KEEP", 20),
+        PROFILE_INTERVAL_MS=_env_float("RAJAONGKIR_PROFILE_INTERVAL_MS", 5.0),
+        LOCATION_TREE=_env_bool("RAJAONGKIR_LOCATION_TREE", True),
+        LOCATION_SNAPSHOT=os.path.expanduser(
+            os.getenv("RAJAONGKIR_LOCATION_SNAPSHOT", os.path.join(data_dir, "locations.snap"))
+        ),
+        LOCATION_SNAPSHOT_CHECK_INTERVAL=_env_float("RAJAONGKIR_LOCATION_SNAPSHOT_CHECK_INTERVAL", 5.0),
+        LOCATION_CHANGE_LOG=os.path.expanduser(
+            os.getenv("RAJAONGKIR_LOCATION_CHANGE_LOG", os.path.join(data_dir, "location_changes.jsonl"))
+        ),
+        # Cursors point into one process's memory, and the next call may reach another worker
+        LIST_PAGE_SIZE=_env_int("RAJAONGKIR_LIST_PAGE_SIZE", 100) if workers <= 1 else 0,
+        RESULT_STORE_TTL=_env_float("RAJAONGKIR_RESULT_STORE_TTL", 300.0),
+        RESULT_STORE_MAX_ENTRIES=_env_int("RAJAONGKIR_RESULT_STORE_MAX_ENTRIES", 256),
+        RESPONSE_CACHE_MAX_ENTRIES=max(0, _env_int("RAJAONGKIR_RESPONSE_CACHE_MAX_ENTRIES", 256)),
+        RESPONSE_CACHE_MAX_BYTES=max(0, _env_int("RAJAONGKIR_RESPONSE_CACHE_MAX_BYTES", 16 * 2**20)),
+        OFFLOAD_WORKERS=max(0, _env_int("RAJAONGKIR_OFFLOAD_WORKERS", 2)),
+        OFFLOAD_MIN_ITEMS=max(1, _env_int("RAJAONGKIR_OFFLOAD_MIN_ITEMS", 1000)),
+        LOOP_LAG_INTERVAL_MS=max(0.0, _env_float("RAJAONGKIR_LOOP_LAG_INTERVAL_MS", 100.0)),
+        LOOP_LAG_BUDGET_MS=_env_float("RAJAONGKIR_LOOP_LAG_BUDGET_MS", 50.0),
+        DATA_DIR=data_dir,
+        COURIER_DETECT_FILE=os.path.expanduser(os.getenv("RAJAONGKIR_COURIER_DETECT_FILE") or ""),
+        LANE_MATRIX_FILE=os.path.expanduser(os.getenv("RAJAONGKIR_LANE_MATRIX_FILE") or ""),
+        LANE_PRUNE=_env_bool("RAJAONGKIR_LANE_PRUNE", False),
+        LANE_MIN_OBSERVATIONS=_env_float("RAJAONGKIR_LANE_MIN_OBSERVATIONS", 3.0),
+        LANE_HALF_LIFE_DAYS=_env_float("RAJAONGKIR_LANE_HALF_LIFE_DAYS", 30.0),
+        LANE_MATRIX_MAX_LANES=_env_int("RAJAONGKIR_LANE_MATRIX_MAX_LANES", 50_000),
+        COST_ESTIMATE_FILE=os.path.expanduser(os.getenv("RAJAONGKIR_COST_ESTIMATE_FILE") or ""),
+        COST_ESTIMATE_FALLBACK=_env_bool("RAJAONGKIR_COST_ESTIMATE_FALLBACK", False),
+        COST_ESTIMATE_HALF_LIFE_DAYS=_env_float("RAJAONGKIR_COST_ESTIMATE_HALF_LIFE_DAYS", 90.0),
+        HISTORY_DB=os.path.expanduser(os.getenv("RAJAONGKIR_HISTORY_DB") or ""),
+        HISTORY_BATCH_SIZE=max(1, _env_int("RAJAONGKIR_HISTORY_BATCH_SIZE", 500)),
+        HISTORY_FLUSH_INTERVAL=max(0.01, _env_float("RAJAONGKIR_HISTORY_FLUSH_INTERVAL", 2.0)),
+        HISTORY_MAX_PENDING=max(1, _env_int("RAJAONGKIR_HISTORY_MAX_PENDING", 20_000)),
+        EXPORT_DIR=os.path.expanduser(os.getenv("RAJAONGKIR_EXPORT_DIR") or os.path.join(data_dir, "exports")),
+        EXPORT_PARQUET_BATCH_ROWS=max(1, _env_int("RAJAONGKIR_EXPORT_PARQUET_BATCH_ROWS", 10_000)),
+        EXPORT_MAX_LANES=max(1, _env_int("RAJAONGKIR_EXPORT_MAX_LANES", 500)),
+        EXPORT_CONCURRENCY=max(1, _env_int("RAJAONGKIR_EXPORT_CONCURRENCY", 4)),
+        TRACK_DETECT_PARALLEL=max(1, _env_int("RAJAONGKIR_TRACK_DETECT_PARALLEL", 3)),
+        TRACK_DETECT_MAX_ATTEMPTS=max(1, _env_int("RAJAONGKIR_TRACK_DETECT_MAX_ATTEMPTS", 6)),
     )
 
 
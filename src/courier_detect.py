@@ -0,0 +1,229 @@
+"""
+Courier Detection Module
+========================
+Ranks likely couriers for an AWB from its prefix, suffix, length and
+character class, so tracking without a courier tries a few likely
+candidates instead of every courier code.
+
+Scores come from two sources:
+
+1. Rules: built-in patterns of common Indonesian waybill formats, plus
+   rules from the state file. A matching rule adds its weight.
+2. Learned statistics: every successful lookup records the courier
+   under the AWB's signatures (first two characters + length, and
+   character class + length). Learned shares add to the score once a
+   signature has been seen a few times, so the ranking adapts to the
+   couriers and formats actually in use. Learned counts are kept per
+   tenant (see tenants), so one merchant's volumes and courier mix never
+   shape another's ranking.
+
+State (extra rules and learned counts) is kept in COURIER_DETECT_FILE
+and written atomically every few updates and at shutdown.
+"""
+
+import sys
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .config import settings
+from .lifecycle import on_shutdown
+from .state import load_state, save_state
+from .tenants import tenant_namespace
+from .validators import DOMESTIC_COURIERS
+
+STATE_VERSION = 1
+
+# Score weight of learned shares per signature level
+PREFIX_SIGNATURE_WEIGHT = 4.0
+SHAPE_SIGNATURE_WEIGHT = 1.5
+# Lookups of a signature before its learned share counts fully
+CONFIDENT_AFTER = 5
+# Save the state file after this many learned lookups
+SAVE_EVERY = 20
+
+
+@dataclass(frozen=True)
+class CourierRule:
+    """A waybill pattern that points to a courier."""
+
+    courier: str
+    prefix: str = ""
+    suffix: str = ""
+    min_length: int = 0
+    max_length: int = 50
+    charset: str = "any"  # digits, alnum or any
+    weight: float = 1.0
+
+    def matches(self, awb: str, charset: str) -> bool:
+        """Whether an upper-cased AWB with the given charset matches."""
+        return (
+            self.min_length <= len(awb) <= self.max_length
+            and awb.startswith(self.prefix)
+            and awb.endswith(self.suffix)
+            and (self.charset == "any" or self.charset == charset or (self.charset == "alnum" and charset == "digits"))
+        )
+
+
+# Common formats; ambiguous ones (plain 12-digit numbers) are settled by learning
+BUILTIN_RULES = [
+    CourierRule("jnt", prefix="JP", min_length=12, max_length=12, charset="alnum", weight=3.0),
+    CourierRule("jnt", prefix="JD", min_length=12, max_length=12, charset="alnum", weight=2.0),
+    CourierRule("sicepat", prefix="00", min_length=12, max_length=12, charset="digits", weight=2.0),
+    CourierRule("tiki", min_length=12, max_length=12, charset="digits", weight=1.0),
+    CourierRule("anteraja", prefix="10", min_length=14, max_length=15, charset="digits", weight=2.0),
+    CourierRule("ninja", prefix="NLID", charset="alnum", weight=3.0),
+    CourierRule("ninja", prefix="NV", min_length=10, charset="alnum", weight=2.0),
+    CourierRule("ide", prefix="IDS", charset="alnum", weight=3.0),
+    CourierRule("ide", prefix="IDE", charset="alnum", weight=3.0),
+    CourierRule("lion", prefix="11LP", charset="alnum", weight=3.0),
+    CourierRule("lion", prefix="19LP", charset="alnum", weight=3.0),
+    # UPU S10 format: two letters, nine digits, country code
+    CourierRule("pos", suffix="ID", min_length=13, max_length=13, charset="alnum", weight=3.0),
+    CourierRule("pos", prefix="P", min_length=13, max_length=13, charset="alnum", weight=1.0),
+    CourierRule("jne", min_length=15, max_length=16, charset="digits", weight=1.5),
+    *(
+        CourierRule("jne", prefix=origin, min_length=12, max_length=16, charset="alnum", weight=2.5)
+        for origin in ("CGK", "BDO", "SUB", "JOG", "SRG", "MES", "DPS", "UPG", "BPN", "PLM")
+    ),
+]
+
+
+def charset_of(awb: str) -> str:
+    """Character class of an AWB: digits, alnum or any."""
+    if awb.isdigit():
+        return "digits"
+    if awb.isalnum():
+        return "alnum"
+    return "any"
+
+
+def signatures(awb: str) -> tuple[str, str]:
+    """Learning keys for an upper-cased AWB: prefix + length, class + length."""
+    return f"p:{awb[:2]}:{len(awb)}", f"c:{charset_of(awb)}:{len(awb)}"
+
+
+def _scoped(key: str) -> str:
+    """A learned-count key of the current tenant."""
+    tenant = tenant_namespace()
+    return f"{tenant}/{key}" if tenant else key
+
+
+class CourierDetector:
+    """Scores couriers for AWBs and learns from successful lookups."""
+
+    def __init__(self, path: str = "") -> None:
+        self.path = path
+        self.rules: list[CourierRule] = list(BUILTIN_RULES)
+        # [tenant/]signature -> {courier: lookups}
+        self._learned: dict[str, dict[str, float]] = {}
+        # [tenant/]courier -> lookups
+        self._popularity: dict[str, float] = {}
+        self._unsaved = 0
+        self._loaded = False
+
+    # ========================================================================
+    # Scoring
+    # ========================================================================
+
+    def scores(self, awb: str) -> dict[str, float]:
+        """Score per courier for an AWB (only couriers with some evidence)."""
+        self._ensure_loaded()
+        awb = awb.strip().upper()
+        charset = charset_of(awb)
+        result: dict[str, float] = {}
+        for rule in self.rules:
+            if rule.matches(awb, charset):
+                result[rule.courier] = result.get(rule.courier, 0.0) + rule.weight
+
+        for signature, weight in zip(signatures(awb), (PREFIX_SIGNATURE_WEIGHT, SHAPE_SIGNATURE_WEIGHT)):
+            counts = self._learned.get(_scoped(signature))
+            if not counts:
+                continue
+            total = sum(counts.values())
+            confidence = min(1.0, total / CONFIDENT_AFTER)
+            for courier, count in counts.items():
+                result[courier] = result.get(courier, 0.0) + weight * confidence * count / total
+        return result
+
+    def rank(self, awb: str, limit: int) -> list[str]:
+        """
+        Couriers to try for an AWB, most likely first.
+
+        Couriers with rule or learned evidence come first; the rest follow
+        in order of overall popularity (DOMESTIC_COURIERS order until
+        lookups have been learned).
+
+        Args:
+            awb: Waybill number.
+            limit: Maximum number of candidates.
+
+        Returns:
+            Courier codes.
+        """
+        scores = self.scores(awb)
+        popularity = {courier: self._popularity.get(_scoped(courier), 0.0) for courier in DOMESTIC_COURIERS}
+        ranked = sorted(scores, key=lambda courier: (-scores[courier], -popularity.get(courier, 0.0)))
+        ranked = [courier for courier in ranked if courier in DOMESTIC_COURIERS]
+        if len(ranked) < limit:
+            order = {courier: index for index, courier in enumerate(DOMESTIC_COURIERS)}
+            rest = sorted(
+                (courier for courier in DOMESTIC_COURIERS if courier not in scores),
+                key=lambda courier: (-popularity[courier], order[courier]),
+            )
+            ranked.extend(rest)
+        return ranked[:limit]
+
+    # ========================================================================
+    # Learning and persistence
+    # ========================================================================
+
+    def learn(self, awb: str, courier: str) -> None:
+        """Record a successful lookup of `awb` with `courier`."""
+        self._ensure_loaded()
+        awb = awb.strip().upper()
+        for signature in signatures(awb):
+            counts = self._learned.setdefault(_scoped(signature), {})
+            counts[courier] = counts.get(courier, 0.0) + 1
+        key = _scoped(courier)
+        self._popularity[key] = self._popularity.get(key, 0.0) + 1
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    def add_rule(self, rule: CourierRule) -> None:
+        """Add a rule (kept in the state file on the next save)."""
+        self._ensure_loaded()
+        self.rules.append(rule)
+        self._unsaved += 1
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        state = load_state(self.path, STATE_VERSION)
+        if state is None:
+            return
+        try:
+            self.rules.extend(CourierRule(**rule) for rule in state.get("rules", []))
+        except TypeError as e:
+            print(f"⚠️  WARNING: ignoring invalid courier rule in {self.path}: {e}", file=sys.stderr)
+        self._learned = state.get("learned", {})
+        self._popularity = state.get("popularity", {})
+
+    def save(self) -> None:
+        """Write extra rules and learned counts atomically."""
+        if not self._unsaved:
+            return
+        state: dict[str, Any] = {
+            "version": STATE_VERSION,
+            "rules": [asdict(rule) for rule in self.rules[len(BUILTIN_RULES):]],
+            "learned": self._learned,
+            "popularity": self._popularity,
+        }
+        if save_state(self.path, state):
+            self._unsaved = 0
+
+
+# Global detector instance
+courier_detector = CourierDetector(settings.COURIER_DETECT_FILE)
+on_shutdown(courier_detector.save)
@@ -0,0 +1,84 @@
+"""
+Deadline Module
+===============
+Per-call deadlines, set by the tool layer and read by everything below it.
+
+instrument_tool opens a deadline scope for every tool call (TOOL_DEADLINE
+seconds, overridable per tool with TOOL_DEADLINES) and cancels the call
+when it expires. The deadline lives in a context variable, so the client
+can size each upstream request's timeout and its wait for a concurrency
+slot to the time that is left, without threading it through every
+signature. Retries must stop when remaining() reaches zero.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .config import settings
+from .exceptions import DeadlineExceededError
+
+# Absolute deadline on the time.monotonic() clock (same clock as the event loop)
+_deadline: ContextVar[float | None] = ContextVar("rajaongkir_deadline", default=None)
+
+
+def deadline_for(tool: str) -> float:
+    """Deadline in seconds for a tool: its TOOL_DEADLINES entry or TOOL_DEADLINE."""
+    return settings.TOOL_DEADLINES.get(tool, settings.TOOL_DEADLINE)
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[float]:
+    """
+    Run a block under a deadline `seconds` from now.
+
+    A nested scope can only shorten the deadline, never extend it.
+
+    Yields:
+        The absolute deadline (time.monotonic() clock).
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None and current < deadline:
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """
+    Raise if the current deadline has passed.
+
+    Raises:
+        DeadlineExceededError: If no time is left.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceededError(
+            message="Deadline exceeded",
+            detail="The call ran out of time before the upstream request could be sent.",
+        )
+
+
+def bounded_timeout(timeout: float) -> float:
+    """
+    A timeout capped by the time left before the current deadline.
+
+    Raises:
+        DeadlineExceededError: If no time is left.
+    """
+    check_deadline()
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
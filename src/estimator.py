@@ -0,0 +1,297 @@
+"""
+Estimator Module
+================
+Offline shipping cost estimates from historical quotes, for when the
+upstream is down, out of quota, or the caller asks for `estimate=True`.
+
+Quotes are grouped by endpoint kind, lane (origin and destination region,
+see lane_matrix), courier, service and weight bracket, plus a pooled
+"all weights" group per lane and service. Each group keeps the decayed
+sufficient statistics of billed kilograms x and cost y:
+
+    n, Σx, Σy, Σx², Σxy, Σy²
+
+so base price and per-kg rate come from a closed-form least-squares fit
+(cost = base + rate * kg) in a handful of float operations, and a new
+quote is a constant-time update. Estimates carry a 95% prediction
+interval from the fit's residuals. Counts halve every
+COST_ESTIMATE_HALF_LIFE_DAYS, so tariff changes replace old prices.
+
+In multi-tenant mode every tenant has its own groups, learned only from
+its own quotes, so one merchant's negotiated prices never estimate
+another's.
+
+Statistics are kept in COST_ESTIMATE_FILE and can also be loaded in bulk
+from aggregate queries (load_statistics).
+"""
+
+import math
+import time
+from array import array
+from collections.abc import Iterable
+from typing import Any
+
+from .config import settings
+from .lane_matrix import lane_matrix
+from .lifecycle import on_shutdown
+from .state import load_state, save_state
+from .tenants import tenant_namespace
+from .validators import weight_bracket
+
+STATE_VERSION = 1
+
+# Save the state file after this many recorded quotes
+SAVE_EVERY = 50
+# Decay is applied at most this often per group (seconds)
+DECAY_INTERVAL = 60.0
+# Weight bracket of the pooled per-lane group
+ALL_WEIGHTS = "*"
+
+# Two-sided 95% Student t quantiles by degrees of freedom (1.96 beyond the table)
+_T95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+# Index of each sum in a group's statistics array
+N, SX, SY, SXX, SXY, SYY, UPDATED = range(7)
+
+
+def billed_kg(weight: int) -> int:
+    """Kilograms billed for a weight in grams (rounded up, at least 1)."""
+    return max(1, -(-weight // 1000))
+
+
+def _t95(degrees: float) -> float:
+    index = int(degrees) - 1
+    return _T95[index] if 0 <= index < len(_T95) else 1.96
+
+
+def fit(stats: array) -> dict[str, float] | None:
+    """
+    Least-squares base price and per-kg rate from a group's sums.
+
+    Returns:
+        base, rate, residual standard error, sample count and mean kg,
+        or None without samples.
+    """
+    n = stats[N]
+    if n <= 0:
+        return None
+    mean_x, mean_y = stats[SX] / n, stats[SY] / n
+    sxx = stats[SXX] - n * mean_x * mean_x
+    sxy = stats[SXY] - n * mean_x * mean_y
+    syy = stats[SYY] - n * mean_y * mean_y
+    if sxx > 1e-9 * max(1.0, stats[SXX]):
+        rate = sxy / sxx
+        residual = syy - rate * sxy
+        degrees = n - 2
+    else:
+        # One weight only: the cost is flat within the group
+        rate = 0.0
+        residual = syy
+        degrees = n - 1
+    base = mean_y - rate * mean_x
+    error = math.sqrt(max(residual, 0.0) / degrees) if degrees > 0 else None
+    return {"base": base, "rate": rate, "error": error, "n": n, "mean_x": mean_x, "sxx": max(sxx, 0.0)}
+
+
+def predict(stats: array, kg: float) -> dict[str, Any] | None:
+    """Point estimate and 95% prediction interval for `kg` billed kilograms."""
+    model = fit(stats)
+    if model is None:
+        return None
+    cost = model["base"] + model["rate"] * kg
+    estimate: dict[str, Any] = {"cost": round(max(cost, 0.0)), "samples": round(model["n"], 1)}
+    if model["error"] is None:
+        estimate.update(low=None, high=None, confidence="low")
+        return estimate
+    spread = 1 + 1 / model["n"]
+    if model["sxx"] > 0:
+        spread += (kg - model["mean_x"]) ** 2 / model["sxx"]
+    margin = _t95(model["n"] - 2 if model["rate"] else model["n"] - 1) * model["error"] * math.sqrt(spread)
+    estimate.update(
+        low=round(max(cost - margin, 0.0)),
+        high=round(cost + margin),
+        confidence="high" if model["n"] >= 20 and margin <= 0.15 * max(cost, 1.0) else "medium",
+    )
+    return estimate
+
+
+class CostEstimator:
+    """Per-group regression statistics of historical quotes."""
+
+    def __init__(self, path: str = "", half_life_days: float = 90.0) -> None:
+        self.path = path
+        self.half_life = half_life_days * 86400
+        # group key -> [n, Σx, Σy, Σx², Σxy, Σy², last update]
+        self._groups: dict[str, array] = {}
+        # "courier|service" -> name, description and etd of the latest quote
+        self._services: dict[str, dict[str, Any]] = {}
+        # "[tenant/]kind|lane|courier" -> services with at least one group
+        self._routes: dict[str, set[str]] = {}
+        self._unsaved = 0
+        self._loaded = False
+
+    @staticmethod
+    def group_key(kind: str, lane: str, courier: str, service: str, bracket: str, tenant: str = "") -> str:
+        key = f"{kind}|{lane}|{courier}|{service}|{bracket}"
+        return f"{tenant}/{key}" if tenant else key
+
+    def _index(self, key: str) -> None:
+        route, service, _ = key.rsplit("|", 2)
+        self._routes.setdefault(route, set()).add(service)
+
+    def _stats(self, key: str, now: float, create: bool = False) -> array | None:
+        """A group's sums decayed to `now`."""
+        self._ensure_loaded()
+        stats = self._groups.get(key)
+        if stats is None:
+            if not create:
+                return None
+            stats = self._groups[key] = array("d", [0.0] * 6 + [now])
+            self._index(key)
+        elif now - stats[UPDATED] >= DECAY_INTERVAL and self.half_life > 0:
+            factor = 0.5 ** ((now - stats[UPDATED]) / self.half_life)
+            for index in range(UPDATED):
+                stats[index] *= factor
+            stats[UPDATED] = now
+        return stats
+
+    # ========================================================================
+    # Learning
+    # ========================================================================
+
+    def record(self, kind: str, origin: str, destination: str, weight: int, rows: Any) -> None:
+        """
+        Add the rows of a live cost response.
+
+        Args:
+            kind: 'domestic' (search IDs) or 'district' (district IDs).
+            origin: Origin ID.
+            destination: Destination ID.
+            weight: Weight in grams.
+            rows: The response's data rows.
+        """
+        if not isinstance(rows, list):
+            return
+        now = time.time()
+        lane = lane_matrix.lane(origin, destination)
+        tenant = tenant_namespace()
+        kg = billed_kg(weight)
+        for row in rows:
+            if not isinstance(row, dict) or not isinstance(row.get("cost"), (int, float)):
+                continue
+            courier, service = str(row.get("code", "")).lower(), str(row.get("service", ""))
+            for bracket in (weight_bracket(weight), ALL_WEIGHTS):
+                key = self.group_key(kind, lane, courier, service, bracket, tenant)
+                self._add(self._stats(key, now, True), kg, row["cost"])
+            self._services[f"{courier}|{service}"] = {
+                key: row[key] for key in ("name", "description", "etd") if key in row
+            }
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    @staticmethod
+    def _add(stats: array, x: float, y: float, weight: float = 1.0) -> None:
+        stats[N] += weight
+        stats[SX] += weight * x
+        stats[SY] += weight * y
+        stats[SXX] += weight * x * x
+        stats[SXY] += weight * x * y
+        stats[SYY] += weight * y * y
+
+    def load_statistics(self, groups: Iterable[tuple[str, Iterable[float]]]) -> int:
+        """
+        Replace groups with precomputed sums (e.g. from an aggregate query).
+
+        Args:
+            groups: (group key, (n, Σx, Σy, Σx², Σxy, Σy²)) pairs.
+
+        Returns:
+            Number of groups loaded.
+        """
+        self._ensure_loaded()
+        now = time.time()
+        loaded = 0
+        for key, sums in groups:
+            self._groups[key] = array("d", [*sums, now])
+            self._index(key)
+            loaded += 1
+        self._unsaved += loaded
+        return loaded
+
+    # ========================================================================
+    # Estimating
+    # ========================================================================
+
+    def estimate(self, kind: str, origin: str, destination: str, weight: int, couriers: list[str]) -> list[dict[str, Any]]:
+        """
+        Estimated cost rows for the requested couriers, in the live row shape.
+
+        Each row has an `estimate` object with the 95% interval, sample
+        count and confidence. Couriers without history are left out.
+        """
+        self._ensure_loaded()
+        now = time.time()
+        lane = lane_matrix.lane(origin, destination)
+        tenant = tenant_namespace()
+        prefix = f"{tenant}/" if tenant else ""
+        kg = billed_kg(weight)
+        bracket = weight_bracket(weight)
+        rows = []
+        for courier in couriers:
+            for service in sorted(self._routes.get(f"{prefix}{kind}|{lane}|{courier}", ())):
+                for group in (bracket, ALL_WEIGHTS):
+                    stats = self._stats(self.group_key(kind, lane, courier, service, group, tenant), now)
+                    result = predict(stats, kg) if stats is not None else None
+                    if result is not None:
+                        break
+                if result is None:
+                    continue
+                info = self._services.get(f"{courier}|{service}", {})
+                rows.append({
+                    "name": info.get("name", courier.upper()),
+                    "code": courier,
+                    "service": service,
+                    "description": info.get("description", ""),
+                    "cost": result.pop("cost"),
+                    "etd": info.get("etd", ""),
+                    "estimate": {**result, "weight_bracket": group},
+                })
+        return rows
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        state = load_state(self.path, STATE_VERSION)
+        if state is None:
+            return
+        self._groups = {key: array("d", values) for key, values in state.get("groups", {}).items()}
+        self._services = state.get("services", {})
+        for key in self._groups:
+            self._index(key)
+
+    def save(self) -> None:
+        """Write the statistics atomically."""
+        if not self._unsaved:
+            return
+        state = {
+            "version": STATE_VERSION,
+            "groups": {key: stats.tolist() for key, stats in self._groups.items()},
+            "services": self._services,
+        }
+        if save_state(self.path, state):
+            self._unsaved = 0
+
+
+# Global estimator instance
+cost_estimator = CostEstimator(settings.COST_ESTIMATE_FILE, settings.COST_ESTIMATE_HALF_LIFE_DAYS)
+on_shutdown(cost_estimator.save)
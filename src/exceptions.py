@@ -73,3 +73,31 @@ class DataNotFoundError(RajaOngkirError):
 
     def __init__(self, message: str, detail: str | None = None) -> None:
         super().__init__(message, detail, code="NOT_FOUND")
+
+
+class TenantError(RajaOngkirError):
+    """Raised when a call cannot be attributed to a known tenant."""
+
+    def __init__(self, message: str, detail: str | None = None) -> None:
+        super().__init__(message, detail, code="UNKNOWN_TENANT")
+
+
+class QuotaError(RajaOngkirError):
+    """Raised when a call is refused to save the daily API quota."""
+
+    def __init__(self, message: str, detail: str | None = None) -> None:
+        super().__init__(message, detail, code="QUOTA_CONSERVATION")
+
+
+class DeadlineExceededError(RajaOngkirError):
+    """Raised when a tool call runs past its deadline."""
+
+    def __init__(self, message: str, detail: str | None = None) -> None:
+        super().__init__(message, detail, code="DEADLINE_EXCEEDED")
+
+
+class WorkerError(RajaOngkirError):
+    """Raised when offloaded work cannot be run in a worker process."""
+
+    def __init__(self, message: str, detail: str | None = None) -> None:
+        super().__init__(message, detail, code="WORKER_ERROR")
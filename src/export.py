@@ -0,0 +1,236 @@
+"""
+Export Module
+=============
+Streaming export of cost quotes to CSV or Parquet files.
+
+Quotes come from the history store or from live district cost calls over
+a list of lanes, and are written row by row: the history is read in small
+batches, live lanes are quoted a few at a time, and Parquet output is
+flushed every EXPORT_PARQUET_BATCH_ROWS rows. Memory stays flat however
+many rows are exported.
+
+Two layouts flatten the courier → service → cost structure:
+
+- long: one row per courier service, e.g.
+  `quoted_at, origin, destination, weight, courier, service, cost, etd`
+- wide: one row per quote request, with one column per courier service
+  and value, e.g. `jne.REG.cost`, `jne.REG.etd`, `sicepat.BEST.cost`
+
+`columns` picks and orders the long columns; in the wide layout the
+chosen value columns (cost, etd) become the per-service columns and
+courier and service move into the column names.
+
+Parquet needs pyarrow, which is imported only when a Parquet file is
+written.
+"""
+
+import csv
+import os
+import secrets
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import CancelledError
+from datetime import datetime
+from typing import Any
+
+from .exceptions import ConfigurationError, ValidationError
+
+EXPORT_FORMATS = ["csv", "parquet"]
+EXPORT_LAYOUTS = ["long", "wide"]
+
+# Long layout columns and their types
+COLUMN_TYPES: dict[str, str] = {
+    "quoted_at": "str",
+    "kind": "str",
+    "origin": "str",
+    "destination": "str",
+    "weight": "int",
+    "courier": "str",
+    "service": "str",
+    "cost": "int",
+    "etd": "str",
+}
+DEFAULT_COLUMNS = ["quoted_at", "origin", "destination", "weight", "courier", "service", "cost", "etd"]
+# Columns that identify one quote request; rows with equal keys form one wide row
+KEY_COLUMNS = ("quoted_at", "kind", "origin", "destination", "weight")
+# Columns that become per-service columns in the wide layout
+VALUE_COLUMNS = ("cost", "etd")
+
+
+def quoted_at(ts: float) -> str:
+    """ISO timestamp (local time, seconds) of a quote."""
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+def parse_columns(columns: str | None) -> list[str]:
+    """
+    Validate a comma-separated column selection.
+
+    Raises:
+        ValidationError: If a column is unknown or none is left.
+    """
+    if not columns:
+        return list(DEFAULT_COLUMNS)
+    selected = [column.strip().lower() for column in columns.split(",") if column.strip()]
+    unknown = [column for column in selected if column not in COLUMN_TYPES]
+    if unknown or not selected:
+        raise ValidationError(
+            message=f"Invalid export columns: {', '.join(unknown) or columns}",
+            detail=f"Valid columns: {', '.join(COLUMN_TYPES)}",
+        )
+    return list(dict.fromkeys(selected))
+
+
+# ============================================================================
+# Layouts
+# ============================================================================
+
+class Layout:
+    """Header, column types and row flattening of an export."""
+
+    def __init__(
+        self,
+        layout: str,
+        columns: list[str],
+        services: list[tuple[str, str]] | None = None,
+        separator: str = ".",
+    ) -> None:
+        self.layout = layout
+        self.columns = columns
+        self.separator = separator
+        self.unmapped = 0
+        if layout == "long":
+            self.header = columns
+            self.types = {column: COLUMN_TYPES[column] for column in columns}
+            return
+        self.keys = [column for column in columns if column in KEY_COLUMNS]
+        self.values = [column for column in columns if column in VALUE_COLUMNS] or ["cost"]
+        self.services = list(dict.fromkeys(services or []))
+        self.header = list(self.keys)
+        self.types = {column: COLUMN_TYPES[column] for column in self.keys}
+        self._service_columns: dict[tuple[str, str], list[str]] = {}
+        for courier, service in self.services:
+            names = [separator.join((courier, service, value)) for value in self.values]
+            self._service_columns[(courier, service)] = names
+            self.header.extend(names)
+            self.types.update({name: COLUMN_TYPES[value] for name, value in zip(names, self.values)})
+
+    def rows(self, quotes: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """Flatten long quote rows (all COLUMN_TYPES keys) into output rows."""
+        if self.layout == "long":
+            for quote in quotes:
+                yield {column: quote.get(column) for column in self.columns}
+            return
+
+        current_key: tuple[Any, ...] | None = None
+        row: dict[str, Any] = {}
+        for quote in quotes:
+            key = tuple(quote.get(column) for column in KEY_COLUMNS)
+            if key != current_key:
+                if current_key is not None:
+                    yield row
+                current_key = key
+                row = {column: quote.get(column) for column in self.keys}
+            names = self._service_columns.get((quote["courier"], quote["service"]))
+            if names is None:
+                self.unmapped += 1
+                continue
+            for name, value in zip(names, self.values):
+                row[name] = quote.get(value)
+        if current_key is not None:
+            yield row
+
+
+# ============================================================================
+# Sinks
+# ============================================================================
+
+class CsvSink:
+    """Writes rows to a CSV file as they arrive."""
+
+    def __init__(self, path: str, header: list[str], types: dict[str, str]) -> None:
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=header, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, row: dict[str, Any]) -> None:
+        self._writer.writerow(row)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _pyarrow() -> Any:
+    """Import pyarrow on first use."""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ConfigurationError(
+            message="Parquet export needs pyarrow",
+            detail="Install it with `pip install pyarrow`, or export as CSV.",
+        ) from e
+    return pyarrow
+
+
+class ParquetSink:
+    """Writes rows to a Parquet file, one row group per `batch_rows` rows."""
+
+    def __init__(self, path: str, header: list[str], types: dict[str, str], batch_rows: int = 10_000) -> None:
+        pa = _pyarrow()
+        arrow_types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+        self._pa = pa
+        self._schema = pa.schema([(column, arrow_types[types[column]]) for column in header])
+        self._writer = pa.parquet.ParquetWriter(path, self._schema)
+        self._batch_rows = batch_rows
+        self._columns: dict[str, list[Any]] = {column: [] for column in header}
+        self._buffered = 0
+
+    def write(self, row: dict[str, Any]) -> None:
+        for column, values in self._columns.items():
+            values.append(row.get(column))
+        self._buffered += 1
+        if self._buffered >= self._batch_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffered:
+            return
+        self._writer.write_table(self._pa.Table.from_pydict(self._columns, schema=self._schema))
+        for values in self._columns.values():
+            values.clear()
+        self._buffered = 0
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+Sink = CsvSink | ParquetSink
+
+
+def open_sink(directory: str, name: str, file_format: str, layout: Layout, batch_rows: int) -> tuple[str, Sink]:
+    """Create the output file for an export; returns its path and sink."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{secrets.token_hex(3)}.{file_format}")
+    if file_format == "parquet":
+        return path, ParquetSink(path, layout.header, layout.types, batch_rows)
+    return path, CsvSink(path, layout.header, layout.types)
+
+
+def write_rows(sink: Sink, rows: Iterable[dict[str, Any]], stop: threading.Event | None = None) -> int:
+    """
+    Write rows to a sink; returns the count.
+
+    Raises:
+        CancelledError: If `stop` is set, e.g. because the export running
+            in a worker thread was cancelled.
+    """
+    count = 0
+    for row in rows:
+        if stop is not None and stop.is_set():
+            raise CancelledError("export stopped")
+        sink.write(row)
+        count += 1
+    return count
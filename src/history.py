@@ -0,0 +1,628 @@
+"""
+History Module
+==============
+Append-only local store of the cost quotes and tracking results the
+server fetches, with aggregate queries over them.
+
+Data is kept in a SQLite database (WAL mode, so several worker processes
+can share it and readers never wait for the writer):
+
+- `quotes`: one row per courier service of every live cost response
+- `shipments`: one row per tracked waybill (latest status, ship and
+  delivery time, transit days), updated on every lookup
+- `tracking_events`: the manifest entries of each waybill, deduplicated
+
+The tool path never touches the database: record_quotes() and
+record_tracking() only append tuples to in-memory buffers. A background
+task started with the server flushes them in batches of
+HISTORY_BATCH_SIZE rows, or every HISTORY_FLUSH_INTERVAL seconds, in one
+transaction on a worker thread. When the writer falls behind by more than
+HISTORY_MAX_PENDING rows, new rows are dropped and counted instead of
+growing memory.
+
+Every row carries the tenant that fetched it (see tenants), and every
+query only reads the current tenant's rows: one merchant's lanes and
+negotiated prices are never visible to another.
+
+Queries (cost_stats, transit_stats) run on a separate read connection
+and filter on indexed columns (tenant, lane, courier, time), so they stay
+fast at millions of rows.
+
+Usage:
+    python -m src.history info [--db PATH]
+    python -m src.history train-estimator [--db PATH]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from .config import settings
+from .exceptions import ConfigurationError
+from .lifecycle import on_shutdown, on_startup
+from .metrics import HISTORY_ROWS
+from .tenants import tenant_namespace
+from .validators import weight_bracket
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# Every row belongs to a tenant ('' in single-tenant mode) and is only
+# ever read back for that tenant
+_SHIPMENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS shipments (
+    courier TEXT NOT NULL,
+    awb TEXT NOT NULL,
+    service TEXT,
+    origin TEXT,
+    destination TEXT,
+    status TEXT,
+    delivered INTEGER NOT NULL DEFAULT 0,
+    shipped_at TEXT,
+    delivered_at TEXT,
+    transit_days REAL,
+    updated REAL NOT NULL,
+    tenant TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (tenant, courier, awb)
+) WITHOUT ROWID
+"""
+_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS tracking_events (
+    courier TEXT NOT NULL,
+    awb TEXT NOT NULL,
+    event_at TEXT NOT NULL,
+    description TEXT NOT NULL,
+    code TEXT,
+    city TEXT,
+    tenant TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (tenant, courier, awb, event_at, description)
+) WITHOUT ROWID
+"""
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS quotes (
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    bracket TEXT NOT NULL,
+    courier TEXT NOT NULL,
+    service TEXT NOT NULL,
+    cost INTEGER NOT NULL,
+    etd TEXT,
+    tenant TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS quotes_tenant_lane ON quotes (tenant, origin, destination, ts);
+CREATE INDEX IF NOT EXISTS quotes_tenant_courier ON quotes (tenant, courier, ts);
+CREATE INDEX IF NOT EXISTS quotes_tenant_ts ON quotes (tenant, ts);
+
+{_SHIPMENTS_TABLE};
+CREATE INDEX IF NOT EXISTS shipments_tenant_courier ON shipments (tenant, courier, shipped_at);
+CREATE INDEX IF NOT EXISTS shipments_tenant_shipped ON shipments (tenant, shipped_at);
+
+{_EVENTS_TABLE};
+"""
+SCHEMA_VERSION = 1
+
+# Databases written before rows had a tenant: their rows become the
+# single-tenant ('') rows
+_MIGRATE_V1 = (
+    "ALTER TABLE quotes ADD COLUMN tenant TEXT NOT NULL DEFAULT ''",
+    "DROP INDEX IF EXISTS quotes_lane",
+    "DROP INDEX IF EXISTS quotes_courier",
+    "DROP INDEX IF EXISTS quotes_ts",
+    "DROP INDEX IF EXISTS shipments_courier",
+    "DROP INDEX IF EXISTS shipments_shipped",
+    "ALTER TABLE shipments RENAME TO shipments_v0",
+    "ALTER TABLE tracking_events RENAME TO tracking_events_v0",
+    _SHIPMENTS_TABLE,
+    _EVENTS_TABLE,
+    "INSERT INTO shipments SELECT *, '' FROM shipments_v0",
+    "INSERT INTO tracking_events SELECT *, '' FROM tracking_events_v0",
+    "DROP TABLE shipments_v0",
+    "DROP TABLE tracking_events_v0",
+)
+
+_INSERT_QUOTE = "INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_UPSERT_SHIPMENT = """
+INSERT INTO shipments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (tenant, courier, awb) DO UPDATE SET
+    service = excluded.service, origin = excluded.origin, destination = excluded.destination,
+    status = excluded.status, delivered = excluded.delivered, shipped_at = excluded.shipped_at,
+    delivered_at = excluded.delivered_at, transit_days = excluded.transit_days, updated = excluded.updated
+"""
+_INSERT_EVENT = "INSERT OR IGNORE INTO tracking_events VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+# Period grouping of query results: strftime format, None for one period
+BUCKETS: dict[str, str | None] = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m", "all": None}
+
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y")
+
+
+def _timestamp(date: Any, clock: Any = None) -> datetime | None:
+    """Parse an upstream date (and optional time) into a datetime."""
+    if not isinstance(date, str) or not date.strip():
+        return None
+    text = f"{date.strip()} {clock.strip()}" if isinstance(clock, str) and clock.strip() else date.strip()
+    for time_format in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+    return None
+
+
+def _iso(value: datetime | None) -> str | None:
+    return None if value is None else value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _median_query(source: str, value: str, group: str) -> str:
+    """Per-group count, mean, median, min and max of `value` over `source` rows."""
+    return f"""
+    WITH ranked AS (
+        SELECT {group}, {value} AS value,
+            ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY {value}) AS position,
+            COUNT(*) OVER (PARTITION BY {group}) AS total
+        FROM ({source})
+    )
+    SELECT {group}, COUNT(*) AS samples, AVG(value) AS mean,
+        AVG(CASE WHEN position IN ((total + 1) / 2, (total + 2) / 2) THEN value END) AS median,
+        MIN(value) AS min, MAX(value) AS max
+    FROM ranked
+    GROUP BY {group}
+    ORDER BY {group}
+    """
+
+
+def _quote_filter(
+    courier: str | None, origin: str | None, destination: str | None, weight: int | None, days: int
+) -> tuple[str, list[Any]]:
+    """WHERE clause and parameters selecting the current tenant's quotes."""
+    conditions, params = ["tenant = ?", "ts >= ?"], [tenant_namespace(), time.time() - days * 86400]
+    for column, value in (("origin", origin), ("destination", destination), ("courier", courier)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if weight is not None:
+        conditions.append("bracket = ?")
+        params.append(weight_bracket(weight))
+    return " AND ".join(conditions), params
+
+
+class HistoryStore:
+    """SQLite-backed quote and tracking history with a batched writer."""
+
+    def __init__(
+        self,
+        path: str = "",
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        max_pending: int = 20_000,
+    ) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._quotes: list[tuple[Any, ...]] = []
+        self._shipments: list[tuple[Any, ...]] = []
+        self._events: list[tuple[Any, ...]] = []
+        self._pending = 0
+        self._writer: sqlite3.Connection | None = None
+        self._reader: sqlite3.Connection | None = None
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # ========================================================================
+    # Recording (tool path, never blocks)
+    # ========================================================================
+
+    def _buffer(self, table: str, target: list[tuple[Any, ...]], rows: list[tuple[Any, ...]]) -> None:
+        if not rows:
+            return
+        if self._pending + len(rows) > self.max_pending:
+            HISTORY_ROWS.inc((table, "dropped"), len(rows))
+            return
+        target.extend(rows)
+        self._pending += len(rows)
+        if self._pending >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def record_quotes(self, kind: str, origin: str, destination: str, weight: int, rows: Any) -> None:
+        """
+        Queue the rows of a live cost response.
+
+        Args:
+            kind: 'domestic' (search IDs) or 'district' (district IDs).
+            origin: Origin ID.
+            destination: Destination ID.
+            weight: Weight in grams.
+            rows: The response's data rows.
+        """
+        if not self.enabled or not isinstance(rows, list):
+            return
+        now = time.time()
+        bracket = weight_bracket(weight)
+        tenant = tenant_namespace()
+        self._buffer("quotes", self._quotes, [
+            (now, kind, origin, destination, weight, bracket, str(row.get("code", "")).lower(),
+             str(row.get("service", "")), int(row["cost"]), row.get("etd"), tenant)
+            for row in rows
+            if isinstance(row, dict) and isinstance(row.get("cost"), (int, float))
+        ])
+
+    def record_tracking(self, awb: str, courier: str, data: Any) -> None:
+        """Queue a tracking result: the shipment summary and its manifest entries."""
+        if not self.enabled or not isinstance(data, dict):
+            return
+        summary = data.get("summary") if isinstance(data.get("summary"), dict) else {}
+        details = data.get("details") if isinstance(data.get("details"), dict) else {}
+        status = data.get("delivery_status") if isinstance(data.get("delivery_status"), dict) else {}
+        courier = str(summary.get("courier_code") or courier).lower()
+        tenant = tenant_namespace()
+
+        shipped = _timestamp(details.get("waybill_date") or summary.get("waybill_date"), details.get("waybill_time"))
+        delivered = bool(data.get("delivered"))
+        delivered_at = _timestamp(status.get("pod_date"), status.get("pod_time")) if delivered else None
+        transit = (delivered_at - shipped).total_seconds() / 86400 if shipped and delivered_at else None
+        self._buffer("shipments", self._shipments, [(
+            courier, awb, summary.get("service_code"),
+            str(summary.get("origin") or details.get("origin") or "").upper() or None,
+            str(summary.get("destination") or details.get("destination") or "").upper() or None,
+            summary.get("status") or status.get("status"), int(delivered),
+            _iso(shipped), _iso(delivered_at), transit, time.time(), tenant,
+        )])
+
+        manifest = data.get("manifest") if isinstance(data.get("manifest"), list) else []
+        events = []
+        for item in manifest:
+            if not isinstance(item, dict):
+                continue
+            event_at = _iso(_timestamp(item.get("manifest_date"), item.get("manifest_time")))
+            if event_at is not None:
+                events.append((
+                    courier, awb, event_at, str(item.get("manifest_description", "")),
+                    item.get("manifest_code"), item.get("city_name"), tenant,
+                ))
+        self._buffer("tracking_events", self._events, events)
+
+    # ========================================================================
+    # Writing (background task + worker thread)
+    # ========================================================================
+
+    def _connect(self) -> "sqlite3.Connection":
+        # Imported here: sqlite3 is only loaded once history is recorded or queried
+        import sqlite3
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        self._migrate(connection)
+        connection.executescript(SCHEMA)
+        connection.create_function("decay", 2, lambda age, half_life: 0.5 ** (age / half_life), deterministic=True)
+        return connection
+
+    @staticmethod
+    def _migrate(connection: "sqlite3.Connection") -> None:
+        """Bring a database written by an older version up to SCHEMA_VERSION."""
+        if connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        # Several workers may open the database at once: migrate under the write lock
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                columns = {row[1] for row in connection.execute("PRAGMA table_info(quotes)")}
+                if columns and "tenant" not in columns:
+                    for statement in _MIGRATE_V1:
+                        connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _write(self, quotes: list[tuple[Any, ...]], shipments: list[tuple[Any, ...]], events: list[tuple[Any, ...]]) -> None:
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            with self._writer:
+                self._writer.executemany(_INSERT_QUOTE, quotes)
+                self._writer.executemany(_UPSERT_SHIPMENT, shipments)
+                self._writer.executemany(_INSERT_EVENT, events)
+        for table, rows in (("quotes", quotes), ("shipments", shipments), ("tracking_events", events)):
+            if rows:
+                HISTORY_ROWS.inc((table, "written"), len(rows))
+
+    async def flush(self) -> None:
+        """Write all buffered rows in one transaction on a worker thread."""
+        if not self._pending:
+            return
+        quotes, shipments, events = self._quotes, self._shipments, self._events
+        self._quotes, self._shipments, self._events = [], [], []
+        self._pending = 0
+        import sqlite3
+
+        try:
+            await asyncio.to_thread(self._write, quotes, shipments, events)
+        except sqlite3.Error as e:
+            print(f"⚠️  WARNING: could not write history to {self.path}: {e}", file=sys.stderr)
+            HISTORY_ROWS.inc(("quotes", "dropped"), len(quotes))
+            HISTORY_ROWS.inc(("shipments", "dropped"), len(shipments))
+            HISTORY_ROWS.inc(("tracking_events", "dropped"), len(events))
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start the background writer on the running loop."""
+        if not self.enabled or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer and flush what is left."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        self._wakeup = None
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    # ========================================================================
+    # Queries
+    # ========================================================================
+
+    def _query(self, sql: str, params: list[Any]) -> list[dict[str, Any]]:
+        import sqlite3
+
+        if not self.enabled:
+            raise ConfigurationError(
+                message="History store is disabled",
+                detail="Set RAJAONGKIR_HISTORY_DB to a file path to record quotes and tracking results.",
+            )
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = self._connect()
+                self._reader.row_factory = sqlite3.Row
+            return [dict(row) for row in self._reader.execute(sql, params)]
+
+    def cost_stats(
+        self,
+        courier: str | None = None,
+        origin: str | None = None,
+        destination: str | None = None,
+        weight: int | None = None,
+        days: int = 30,
+        bucket: str = "week",
+    ) -> list[dict[str, Any]]:
+        """
+        Quoted price per courier service and period.
+
+        Args:
+            courier: Only this courier.
+            origin: Only this origin ID (with destination: one lane).
+            destination: Only this destination ID.
+            weight: Only quotes in this weight's bracket (grams).
+            days: Look back this many days.
+            bucket: Period per row: 'day', 'week', 'month' or 'all'.
+
+        Returns:
+            Rows with period, courier, service, samples, mean, median, min, max.
+        """
+        where, params = _quote_filter(courier, origin, destination, weight, days)
+        period_format = BUCKETS[bucket]
+        period = f"strftime('{period_format}', ts, 'unixepoch')" if period_format else "'all'"
+        source = f"SELECT {period} AS period, courier, service, cost FROM quotes WHERE {where}"
+        rows = self._query(_median_query(source, "cost", "period, courier, service"), params)
+        for row in rows:
+            row["mean"] = round(row["mean"])
+            row["median"] = round(row["median"])
+        return rows
+
+    def quote_services(
+        self,
+        courier: str | None = None,
+        origin: str | None = None,
+        destination: str | None = None,
+        weight: int | None = None,
+        days: int = 30,
+    ) -> list[tuple[str, str]]:
+        """Distinct (courier, service) pairs among the selected quotes."""
+        where, params = _quote_filter(courier, origin, destination, weight, days)
+        rows = self._query(f"SELECT DISTINCT courier, service FROM quotes WHERE {where} ORDER BY 1, 2", params)
+        return [(row["courier"], row["service"]) for row in rows]
+
+    def iter_quotes(
+        self,
+        courier: str | None = None,
+        origin: str | None = None,
+        destination: str | None = None,
+        weight: int | None = None,
+        days: int = 30,
+        batch: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Stream the selected quotes, oldest first.
+
+        Rows are read `batch` at a time on a private read-only connection,
+        so memory stays flat and other queries are not held up. Rows of
+        one response are adjacent.
+        """
+        where, params = _quote_filter(courier, origin, destination, weight, days)
+        self._query("SELECT 1", [])  # create the database and schema if missing
+        import sqlite3
+
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+        try:
+            cursor = connection.execute(
+                "SELECT ts, kind, origin, destination, weight, courier, service, cost, etd FROM quotes "
+                f"WHERE {where} ORDER BY ts, kind, origin, destination, weight",
+                params,
+            )
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            connection.close()
+
+    def transit_stats(
+        self,
+        courier: str | None = None,
+        origin: str | None = None,
+        destination: str | None = None,
+        days: int = 30,
+        bucket: str = "week",
+    ) -> list[dict[str, Any]]:
+        """
+        Transit days of delivered shipments per courier and ship period.
+
+        Args:
+            courier: Only this courier.
+            origin: Only shipments from this origin name (as in tracking summaries).
+            destination: Only shipments to this destination name.
+            days: Look back this many days of ship dates.
+            bucket: Period per row: 'day', 'week', 'month' or 'all'.
+
+        Returns:
+            Rows with period, courier, samples, mean, median, min, max (days).
+        """
+        since = datetime.fromtimestamp(time.time() - days * 86400).strftime("%Y-%m-%d %H:%M:%S")
+        conditions = ["tenant = ?", "shipped_at >= ?", "transit_days IS NOT NULL"]
+        params: list[Any] = [tenant_namespace(), since]
+        for column, value in (("origin", origin), ("destination", destination)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value.upper())
+        if courier is not None:
+            conditions.append("courier = ?")
+            params.append(courier)
+        period_format = BUCKETS[bucket]
+        period = f"strftime('{period_format}', shipped_at)" if period_format else "'all'"
+        source = (
+            f"SELECT {period} AS period, courier, transit_days FROM shipments WHERE {' AND '.join(conditions)}"
+        )
+        rows = self._query(_median_query(source, "transit_days", "period, courier"), params)
+        for row in rows:
+            for key in ("mean", "median", "min", "max"):
+                row[key] = round(row[key], 2)
+        return rows
+
+    def estimator_statistics(self, half_life_days: float) -> list[tuple[str, list[float]]]:
+        """
+        Cost estimator sums (see estimator.CostEstimator.load_statistics).
+
+        Quotes are aggregated per tenant and group with GROUP BY, weighted
+        by age with the estimator's half-life.
+        """
+        from .estimator import ALL_WEIGHTS, CostEstimator
+        from .lane_matrix import lane_matrix
+
+        now = time.time()
+        half_life = max(half_life_days, 1e-9) * 86400
+        rows = self._query(
+            """
+            SELECT tenant, kind, origin, destination, courier, service, bracket,
+                SUM(w) AS n, SUM(w * x) AS sx, SUM(w * y) AS sy,
+                SUM(w * x * x) AS sxx, SUM(w * x * y) AS sxy, SUM(w * y * y) AS syy
+            FROM (
+                SELECT tenant, kind, origin, destination, courier, service, bracket,
+                    MAX(1, (weight + 999) / 1000) AS x, cost AS y, decay(? - ts, ?) AS w
+                FROM quotes
+            )
+            GROUP BY tenant, kind, origin, destination, courier, service, bracket
+            """,
+            [now, half_life],
+        )
+        groups: dict[str, list[float]] = {}
+        for row in rows:
+            lane = lane_matrix.lane(row["origin"], row["destination"])
+            for group in (row["bracket"], ALL_WEIGHTS):
+                key = CostEstimator.group_key(row["kind"], lane, row["courier"], row["service"], group, row["tenant"])
+                sums = groups.setdefault(key, [0.0] * 6)
+                for index, column in enumerate(("n", "sx", "sy", "sxx", "sxy", "syy")):
+                    sums[index] += row[column]
+        return list(groups.items())
+
+    def counts(self) -> dict[str, int]:
+        """Row count per table, over all tenants (for the info command)."""
+        return {
+            table: self._query(f"SELECT COUNT(*) AS n FROM {table}", [])[0]["n"]
+            for table in ("quotes", "shipments", "tracking_events")
+        }
+
+
+# Global history store
+history_store = HistoryStore(
+    settings.HISTORY_DB,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+    max_pending=settings.HISTORY_MAX_PENDING,
+)
+on_startup(history_store.start)
+on_shutdown(history_store.stop)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect the quote and tracking history.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("info", "Print row counts"),
+        ("train-estimator", "Rebuild the offline cost estimator from stored quotes"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--db", default=settings.HISTORY_DB, help="History database path")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.command == "info":
+        print(json.dumps(store.counts()))
+        return
+
+    from .estimator import cost_estimator
+
+    if not cost_estimator.path:
+        parser.error("train-estimator needs RAJAONGKIR_COST_ESTIMATE_FILE to write the estimator to")
+    loaded = cost_estimator.load_statistics(store.estimator_statistics(settings.COST_ESTIMATE_HALF_LIFE_DAYS))
+    cost_estimator.save()
+    print(json.dumps({"groups": loaded, "file": cost_estimator.path}))
+
+
+if __name__ == "__main__":
+    main()
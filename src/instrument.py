@@ -0,0 +1,138 @@
+"""
+Tool Instrumentation Module
+===========================
+Wrapper applied to every MCP tool at registration.
+
+Tools never raise (they convert errors with _handle_error), so the
+outcome is read from the returned response: "success" or the error code.
+
+Each call is also the root span of a trace (when sampled), tagged with
+the arguments that explain latency: courier, weight bracket and route.
+When the profiler is enabled, the call is watched for slow-call profiles.
+
+The wrapper also owns the call's deadline: the tool runs inside a cancel
+scope that expires after TOOL_DEADLINE (or the tool's TOOL_DEADLINES
+entry), and an expired call returns a DEADLINE_EXCEEDED error.
+
+Responses served from the response cache are handed to FastMCP as their
+pre-built CallToolResult, so they are not encoded again.
+
+In multi-tenant mode the wrapper resolves the call's tenant first and
+runs the tool on its behalf (see tenants); a call without a known tenant
+returns an UNKNOWN_TENANT error without running the tool. Tools the
+quota policy sheds (see quota) return QUOTA_CONSERVATION the same way.
+
+Upstream requests of a call wait for a slot in its tool's priority class
+(see scheduler).
+"""
+
+import asyncio
+import functools
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import anyio
+
+from .client import get_client
+from .deadline import deadline_for, deadline_scope
+from .exceptions import DeadlineExceededError, QuotaError, TenantError
+from .metrics import TOOL_CALLS, TOOL_IN_FLIGHT, TOOL_LATENCY
+from .profiling import profiler
+from .response import EncodedResponse
+from .scheduler import priority_for, priority_scope
+from .tenants import tenant_registry, tenant_scope
+from .tracing import tracer
+from .validators import weight_bracket
+
+ToolFunction = Callable[..., Awaitable[dict[str, Any]]]
+
+
+def _outcome(result: Any) -> str:
+    """Metric outcome label for a tool response."""
+    if not isinstance(result, dict) or result.get("success", True):
+        return "success"
+    return str(result.get("error", {}).get("code", "UNKNOWN_ERROR"))
+
+
+def _span_attributes(name: str, kwargs: dict[str, Any]) -> dict[str, Any]:
+    """Trace attributes for a tool call, from its arguments."""
+    attributes: dict[str, Any] = {"tool": name}
+    for key in ("courier", "origin", "destination", "response_format"):
+        if kwargs.get(key) is not None:
+            attributes[key] = kwargs[key]
+    weight = kwargs.get("weight")
+    if isinstance(weight, int) and weight > 0:
+        attributes["weight_bracket"] = weight_bracket(weight)
+    return attributes
+
+
+def instrument_tool(fn: ToolFunction) -> ToolFunction:
+    """
+    Wrap a tool function to record call counts, latency and in-flight calls,
+    to enforce the tool's deadline, to run it on behalf of the caller's
+    tenant in its priority class, and to open the root trace span for the
+    call (and profile it, if the profiler is enabled).
+
+    functools.wraps keeps the signature and docstring, so FastMCP builds the
+    same tool schema as for the bare function.
+    """
+    name = fn.__name__
+    labels = (name,)
+    span_name = f"tool.{name}"
+    deadline = deadline_for(name)
+    request_class = priority_for(name, fn)
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> dict[str, Any]:
+        TOOL_IN_FLIGHT.inc(labels)
+        start = time.perf_counter()
+        outcome = "exception"
+        # Called here: the profiler uses this frame to attribute samples
+        profiled = profiler.begin(name, kwargs) if profiler.enabled else None
+        with tracer.span(span_name) as span:
+            if span.sampled:
+                span.set_attributes(_span_attributes(name, kwargs))
+            try:
+                try:
+                    tenant = tenant_registry.resolve()
+                    with tenant_scope(tenant):
+                        get_client().quota.admit(name)
+                except (TenantError, QuotaError) as e:
+                    outcome = e.code
+                    return e.to_dict()
+                if tenant is not None and span.sampled:
+                    span.set_attribute("tenant", tenant.name)
+                # Cancels in-flight upstream requests when the deadline passes
+                with (
+                    anyio.move_on_after(deadline) as scope,
+                    deadline_scope(deadline),
+                    tenant_scope(tenant),
+                    priority_scope(request_class),
+                ):
+                    result = await fn(*args, **kwargs)
+                if scope.cancelled_caught:
+                    result = DeadlineExceededError(
+                        message="Deadline exceeded",
+                        detail=f"{name} did not finish within {deadline:g}s.",
+                    ).to_dict()
+                outcome = _outcome(result)
+                if isinstance(result, EncodedResponse):
+                    # Sent as encoded when the response was cached
+                    return result.tool_result
+                return result
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                TOOL_LATENCY.observe(labels, time.perf_counter() - start)
+                TOOL_IN_FLIGHT.dec(labels)
+                TOOL_CALLS.inc((name, outcome))
+                if profiled is not None:
+                    profiler.end(profiled, outcome)
+                if span.sampled:
+                    span.set_attribute("outcome", outcome)
+                    if outcome != "success":
+                        span.status = "error"
+
+    return wrapper
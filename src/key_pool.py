@@ -0,0 +1,336 @@
+"""
+Key Pool Module
+===============
+Spreads upstream requests over several RajaOngkir API keys.
+
+Keys come from RAJAONGKIR_API_KEYS (comma-separated; `key=quota` sets a
+key's daily request quota, otherwise API_KEY_DAILY_QUOTA applies) plus
+RAJAONGKIR_API_KEY. Each request takes the usable key with the best score
+
+    share of the daily quota left × (1 - recent 429 rate)
+
+and fewer requests in flight, then fewer requests today, break ties, so
+load goes to the keys with the most headroom. Requests in flight count
+against the quota, and keys without a known quota count as full. The
+429 rate decays with a one-minute half-life.
+
+- A 429 rests the key for its Retry-After, or API_KEY_COOLDOWN, seconds.
+- A 401 or 403 disables the key for API_KEY_DISABLE_SECONDS. The last
+  enabled key is never disabled, so the pool cannot lock itself out and
+  callers keep seeing the upstream error.
+- Requests are counted per key and day (WIB, UTC+7). The counts are
+  kept in API_KEY_USAGE_FILE under a hash of each key, never the key.
+  Worker processes share the file: every state.SYNC_INTERVAL seconds a
+  background task adds each worker's new counts under a lock (see
+  state.update_state) and takes over the others', so a key is not
+  handed out after the workers together used up its quota. Requests
+  only count in memory.
+
+The client retries a 401/403/429 answer on another key, and when every
+key rests it waits for the first one back if that is before the call's
+deadline (see RajaOngkirClient._request).
+"""
+
+import asyncio
+import hashlib
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from .config import settings
+from .exceptions import APIError
+from .metrics import API_KEY_REMAINING, API_KEY_REQUESTS
+from .state import load_state, update_state, usage_sync
+
+STATE_VERSION = 1
+
+# Half-life of the recent 429 rate (seconds)
+RATE_HALF_LIFE = 60.0
+# Daily quotas reset at midnight WIB
+UTC_OFFSET = 7 * 3600
+# Statuses that say something about the key rather than the request
+KEY_STATUSES = (401, 403, 429)
+
+
+def quota_day(now: float) -> str:
+    """Quota day (WIB date) of a timestamp."""
+    return time.strftime("%Y-%m-%d", time.gmtime(now + UTC_OFFSET))
+
+
+def seconds_to_next_day(now: float) -> float:
+    return 86400 - (now + UTC_OFFSET) % 86400
+
+
+def _retry_after(value: str | None, default: float) -> float:
+    """Seconds from a Retry-After header (seconds form only)."""
+    try:
+        return max(float(value), 0.0) if value else default
+    except ValueError:
+        return default
+
+
+class ApiKey:
+    """One pooled key and its usage."""
+
+    def __init__(self, value: str, label: str, daily_quota: int = 0) -> None:
+        self.value = value
+        self.label = label
+        self.daily_quota = daily_quota
+        self.fingerprint = hashlib.sha256(value.encode()).hexdigest()[:16]
+        self.day = ""
+        self.used_today = 0
+        # Requests of this process not yet added to the usage file
+        self.unsaved = 0
+        self.in_flight = 0
+        self.last_status: int | None = None
+        self.rest_until = 0.0
+        self.disabled_until: float | None = None  # inf: until restart
+        self.disabled_reason: str | None = None
+        # Decayed request and 429 counts
+        self._requests = 0.0
+        self._throttled = 0.0
+        self._decayed_at = 0.0
+
+    def _roll(self, now: float) -> None:
+        """Start a new quota day and decay the 429 rate."""
+        day = quota_day(now)
+        if day != self.day:
+            self.day, self.used_today, self.unsaved = day, 0, 0
+        if now > self._decayed_at:
+            factor = 0.5 ** ((now - self._decayed_at) / RATE_HALF_LIFE)
+            self._requests *= factor
+            self._throttled *= factor
+            self._decayed_at = now
+        if self.disabled_until is not None and now >= self.disabled_until:
+            self.disabled_until = self.disabled_reason = None
+
+    def count(self, status: int, now: float) -> None:
+        """Add one answer to the recent 429 rate."""
+        self._roll(now)
+        self.last_status = status
+        self._requests += 1
+        if status == 429:
+            self._throttled += 1
+
+    def rate_429(self) -> float:
+        # One clean request as a prior, so the rate fades once the key gets no traffic
+        return self._throttled / (self._requests + 1)
+
+    def remaining(self) -> int | None:
+        """Requests left today, None without a known quota."""
+        return max(self.daily_quota - self.used_today, 0) if self.daily_quota else None
+
+    def wait(self, now: float) -> float:
+        """Seconds until the key is usable (0 if it is)."""
+        self._roll(now)
+        waits = [self.rest_until - now]
+        if self.disabled_until is not None:
+            waits.append(self.disabled_until - now)
+        if self.remaining() == 0:
+            waits.append(seconds_to_next_day(now))
+        return max(*waits, 0.0)
+
+    def score(self) -> float:
+        left = self.remaining()
+        share = 1.0 if left is None else max(left - self.in_flight, 0) / self.daily_quota
+        return share * (1.0 - self.rate_429())
+
+    def usage(self, now: float) -> dict[str, Any]:
+        self._roll(now)
+        return {
+            "key": self.label,
+            "hint": f"…{self.value[-4:]}",
+            "enabled": self.disabled_until is None,
+            "disabled_reason": self.disabled_reason,
+            "used_today": self.used_today,
+            "daily_quota": self.daily_quota or None,
+            "remaining_today": self.remaining(),
+            "rate_429": round(self.rate_429(), 4),
+            "resting_s": round(max(self.rest_until - now, 0.0), 1),
+            "in_flight": self.in_flight,
+            "last_status": self.last_status,
+        }
+
+
+class KeyPool:
+    """API keys and the choice of key per upstream request."""
+
+    def __init__(
+        self,
+        entries: Iterable[str],
+        default_quota: int = 0,
+        cooldown: float = 5.0,
+        disable_seconds: float = 3600.0,
+        path: str = "",
+        prefix: str = "",
+    ) -> None:
+        self.cooldown = cooldown
+        self.disable_seconds = disable_seconds
+        self.path = path
+        self.keys: list[ApiKey] = []
+        for entry in entries:
+            value, quota = entry, default_quota
+            head, _, tail = entry.rpartition("=")
+            if head and tail.strip().isdigit():
+                value, quota = head.strip(), int(tail)
+            if value and all(key.value != value for key in self.keys):
+                self.keys.append(ApiKey(value, f"{prefix}key{len(self.keys) + 1}", quota))
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def acquire(self, exclude: set[str] | None = None) -> ApiKey | None:
+        """
+        Take the best usable key for one request.
+
+        Args:
+            exclude: Fingerprints of keys not to use (already failed
+                for this call).
+
+        Returns:
+            The key (release() it after the request), or None if no key
+            is usable right now.
+        """
+        self._ensure_loaded()
+        now = time.time()
+        best: ApiKey | None = None
+        best_rank: tuple[float, int, int] = (0.0, 0, 0)
+        for key in self.keys:
+            if (exclude and key.fingerprint in exclude) or key.wait(now) > 0:
+                continue
+            rank = (key.score(), -key.in_flight, -key.used_today)
+            if best is None or rank > best_rank:
+                best, best_rank = key, rank
+        if best is not None:
+            best.in_flight += 1
+        return best
+
+    def release(self, key: ApiKey) -> None:
+        key.in_flight -= 1
+
+    def wait_time(self, exclude: set[str] | None = None) -> float | None:
+        """Seconds until a key not in `exclude` is usable, None if there is none."""
+        now = time.time()
+        waits = [key.wait(now) for key in self.keys if not (exclude and key.fingerprint in exclude)]
+        return min(waits) if waits else None
+
+    def record(self, key: ApiKey, status: int, retry_after: str | None = None) -> None:
+        """
+        Account an upstream answer to the key that sent the request.
+
+        Args:
+            key: The key used.
+            status: HTTP status code.
+            retry_after: The response's Retry-After header, if any.
+        """
+        now = time.time()
+        key.count(status, now)
+        API_KEY_REQUESTS.inc((key.label, str(status)))
+        if status == 429:
+            key.rest_until = now + _retry_after(retry_after, self.cooldown)
+        elif status in (401, 403):
+            enabled = [other for other in self.keys if other.disabled_until is None]
+            if key.disabled_until is None and len(enabled) > 1:
+                key.disabled_until = now + self.disable_seconds if self.disable_seconds else float("inf")
+                key.disabled_reason = f"HTTP {status}"
+        else:
+            key.used_today += 1
+            key.unsaved += 1
+            if key.daily_quota:
+                API_KEY_REMAINING.set((key.label,), key.remaining())
+
+    def unavailable_error(self) -> APIError:
+        """The error for a call that found no usable key."""
+        if all(key.disabled_until is not None for key in self.keys):
+            return APIError(
+                message="Unauthorized - all API keys are disabled",
+                status_code=401,
+                detail="Every pooled key was rejected (401/403). Check RAJAONGKIR_API_KEYS.",
+            )
+        wait = self.wait_time()
+        return APIError(
+            message="Rate limit exceeded",
+            status_code=429,
+            detail=f"All API keys are rate limited or out of daily quota; the next is usable in {wait or 0:.0f}s.",
+        )
+
+    def usage(self) -> list[dict[str, Any]]:
+        """Usage of every key (no key values, only their last 4 characters)."""
+        self._ensure_loaded()
+        now = time.time()
+        return [key.usage(now) for key in self.keys]
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        state = load_state(self.path, STATE_VERSION)
+        if state is None:
+            return
+        today = quota_day(time.time())
+        counts = state.get("keys", {})
+        for key in self.keys:
+            saved = counts.get(key.fingerprint)
+            if saved and saved.get("day") == today:
+                key.day, key.used_today = today, int(saved.get("used", 0))
+
+    @staticmethod
+    def _merge(state: dict[str, Any] | None, unsaved: dict[str, tuple[str, int]]) -> dict[str, Any]:
+        """The usage file with this process's unsaved requests added."""
+        counts = dict(state.get("keys", {})) if state is not None else {}
+        for fingerprint, (day, count) in unsaved.items():
+            saved = counts.get(fingerprint) or {}
+            saved_day = saved.get("day", "")
+            if saved_day > day:
+                continue  # the other workers are on a newer day already
+            used = int(saved.get("used", 0)) if saved_day == day else 0
+            counts[fingerprint] = {"day": day, "used": used + count}
+        return {"version": STATE_VERSION, "keys": counts}
+
+    def _exchange(self, unsaved: dict[str, tuple[str, int]]) -> dict[str, Any] | None:
+        """File part of sync(): add `unsaved` and return the file's state."""
+        if unsaved:
+            return update_state(self.path, STATE_VERSION, lambda current: self._merge(current, unsaved))
+        return load_state(self.path, STATE_VERSION)
+
+    async def sync(self) -> None:
+        """Add this process's new counts to the usage file and take over the other workers'."""
+        if not self.path:
+            return
+        self._ensure_loaded()
+        unsaved = {key.fingerprint: (key.day, key.unsaved) for key in self.keys if key.unsaved}
+        for key in self.keys:
+            key.unsaved = 0
+        state = await asyncio.to_thread(self._exchange, unsaved)
+        if state is None:
+            for key in self.keys:
+                day, count = unsaved.get(key.fingerprint, ("", 0))
+                if day == key.day:
+                    key.unsaved += count
+            return
+        now = time.time()
+        counts = state.get("keys", {})
+        for key in self.keys:
+            key._roll(now)
+            saved = counts.get(key.fingerprint)
+            if saved and saved.get("day") == key.day:
+                # Requests counted while the file was being updated are not in it yet
+                key.used_today = int(saved.get("used", 0)) + key.unsaved
+                if key.daily_quota:
+                    API_KEY_REMAINING.set((key.label,), key.remaining())
+
+
+# Global key pool instance
+key_pool = KeyPool(
+    settings.api_keys,
+    default_quota=settings.API_KEY_DAILY_QUOTA,
+    cooldown=settings.API_KEY_COOLDOWN,
+    disable_seconds=settings.API_KEY_DISABLE_SECONDS,
+    path=settings.API_KEY_USAGE_FILE,
+)
+usage_sync.add(key_pool.sync)
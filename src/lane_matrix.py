@@ -0,0 +1,208 @@
+"""
+Lane Matrix Module
+==================
+Learns which couriers serve each lane (origin region, destination region)
+from district cost responses, so couriers that never return a service on
+a lane can be left out of the upstream request.
+
+Per lane and courier two decayed counters are kept: how often the courier
+was asked for and how often it returned at least one service row. Counts
+halve every LANE_HALF_LIFE_DAYS, so a pruned courier is asked again once
+its evidence has faded, and a lane that changes is relearned.
+
+A courier is dead on a lane once it has been asked for at least
+LANE_MIN_OBSERVATIONS times (decayed) and served less than DEAD_SHARE of
+them. With LANE_PRUNE on, dead couriers are removed before calling
+upstream; a request is never pruned down to nothing.
+
+Counts are kept per tenant (see tenants): which couriers answer depends
+on the contract behind a tenant's API key, and one merchant's lanes are
+not visible to another.
+
+Regions default to the district IDs themselves. Deployments that can map
+districts to coarser regions (e.g. cities) can plug in a resolver with
+set_region_resolver() to learn faster.
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from .config import settings
+from .lifecycle import on_shutdown
+from .state import load_state, save_state
+from .tenants import tenant_namespace
+
+STATE_VERSION = 1
+
+# Served share below which a courier counts as dead on a lane
+DEAD_SHARE = 0.05
+# Save the state file after this many recorded responses
+SAVE_EVERY = 50
+# Decay is applied at most this often per lane (seconds)
+DECAY_INTERVAL = 60.0
+
+RegionResolver = Callable[[str], str]
+
+
+def district_region(district_id: str) -> str:
+    """Default resolver: every district is its own region."""
+    return district_id
+
+
+def served_couriers(rows: Any) -> set[str]:
+    """Courier codes that have at least one row in a cost response's data."""
+    if not isinstance(rows, list):
+        return set()
+    return {str(row.get("code", "")).lower() for row in rows if isinstance(row, dict)}
+
+
+class LaneMatrix:
+    """Decayed per-lane courier capability counts."""
+
+    def __init__(
+        self,
+        path: str = "",
+        half_life_days: float = 30.0,
+        min_observations: float = 3.0,
+        max_lanes: int = 50_000,
+        resolver: RegionResolver = district_region,
+    ) -> None:
+        self.path = path
+        self.half_life = half_life_days * 86400
+        self.min_observations = min_observations
+        self.max_lanes = max_lanes
+        self.resolver = resolver
+        # [tenant/]lane -> [last update (unix time), {courier: [served, asked]}], least recent first
+        self._lanes: OrderedDict[str, list[Any]] = OrderedDict()
+        self._unsaved = 0
+        self._loaded = False
+
+    def lane(self, origin: str, destination: str) -> str:
+        """Lane key for an origin and destination district."""
+        return f"{self.resolver(origin)}>{self.resolver(destination)}"
+
+    def _key(self, origin: str, destination: str) -> str:
+        """Key of a lane's counts for the current tenant."""
+        tenant = tenant_namespace()
+        lane = self.lane(origin, destination)
+        return f"{tenant}/{lane}" if tenant else lane
+
+    def _counts(self, lane: str, now: float) -> dict[str, list[float]] | None:
+        """Counts of a lane, decayed to `now`."""
+        self._ensure_loaded()
+        entry = self._lanes.get(lane)
+        if entry is None:
+            return None
+        updated, counts = entry
+        if now - updated >= DECAY_INTERVAL and self.half_life > 0:
+            factor = 0.5 ** ((now - updated) / self.half_life)
+            for pair in counts.values():
+                pair[0] *= factor
+                pair[1] *= factor
+            entry[0] = now
+        return counts
+
+    # ========================================================================
+    # Learning and pruning
+    # ========================================================================
+
+    def record(self, origin: str, destination: str, couriers: Iterable[str], rows: Any) -> None:
+        """
+        Record which of the requested couriers returned services.
+
+        Args:
+            origin: Origin district ID.
+            destination: Destination district ID.
+            couriers: Courier codes that were requested.
+            rows: The response's data rows.
+        """
+        now = time.time()
+        lane = self._key(origin, destination)
+        counts = self._counts(lane, now)
+        if counts is None:
+            counts = {}
+            self._lanes[lane] = [now, counts]
+            if len(self._lanes) > self.max_lanes:
+                self._lanes.popitem(last=False)
+        else:
+            self._lanes.move_to_end(lane)
+
+        served = served_couriers(rows)
+        for courier in couriers:
+            pair = counts.setdefault(courier, [0.0, 0.0])
+            pair[0] += courier in served
+            pair[1] += 1
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    def dead_couriers(self, origin: str, destination: str, couriers: Iterable[str]) -> list[str]:
+        """The given couriers that are known not to serve the lane."""
+        counts = self._counts(self._key(origin, destination), time.time())
+        if not counts:
+            return []
+        dead = []
+        for courier in couriers:
+            served, asked = counts.get(courier, (0.0, 0.0))
+            if asked >= self.min_observations and served < DEAD_SHARE * asked:
+                dead.append(courier)
+        return dead
+
+    def prune(self, origin: str, destination: str, couriers: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Split requested couriers into those to ask and those pruned.
+
+        Returns:
+            (couriers to request, pruned couriers). If every courier is
+            dead, all are requested and none pruned.
+        """
+        dead = self.dead_couriers(origin, destination, couriers)
+        if not dead or len(dead) == len(couriers):
+            return couriers, []
+        return [courier for courier in couriers if courier not in dead], dead
+
+    def lane_summary(self, origin: str, destination: str) -> dict[str, dict[str, float]]:
+        """Decayed counts of a lane, for inspection."""
+        counts = self._counts(self._key(origin, destination), time.time()) or {}
+        return {
+            courier: {"served": round(served, 2), "asked": round(asked, 2)}
+            for courier, (served, asked) in counts.items()
+        }
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        state = load_state(self.path, STATE_VERSION)
+        if state is None:
+            return
+        lanes = sorted(state.get("lanes", {}).items(), key=lambda item: item[1][0])
+        self._lanes = OrderedDict(lanes[-self.max_lanes:])
+
+    def save(self) -> None:
+        """Write the matrix atomically."""
+        if not self._unsaved:
+            return
+        if save_state(self.path, {"version": STATE_VERSION, "lanes": self._lanes}):
+            self._unsaved = 0
+
+
+def set_region_resolver(resolver: RegionResolver) -> None:
+    """Map district IDs to regions for lane keys (e.g. district -> city)."""
+    lane_matrix.resolver = resolver
+
+
+# Global matrix instance
+lane_matrix = LaneMatrix(
+    settings.LANE_MATRIX_FILE,
+    half_life_days=settings.LANE_HALF_LIFE_DAYS,
+    min_observations=settings.LANE_MIN_OBSERVATIONS,
+    max_lanes=settings.LANE_MATRIX_MAX_LANES,
+)
+on_shutdown(lane_matrix.save)
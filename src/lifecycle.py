@@ -0,0 +1,69 @@
+"""
+Lifecycle Module
+================
+Process-level startup and shutdown hooks.
+
+Components that own process-wide state (the shared HTTP connection pool,
+caches, stores) register hooks here. The server runs them once per
+process around every transport: around the stdio session, and inside the
+ASGI lifespan of each HTTP worker. Deployments can use the same hooks to
+attach shared backends before the first request is served.
+"""
+
+import inspect
+import sys
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+Hook = Callable[[], Awaitable[Any] | Any]
+
+_startup_hooks: list[Hook] = []
+_shutdown_hooks: list[Hook] = []
+
+
+def on_startup(hook: Hook) -> Hook:
+    """Register a hook to run before the server accepts requests."""
+    _startup_hooks.append(hook)
+    return hook
+
+
+def on_shutdown(hook: Hook) -> Hook:
+    """Register a hook to run after the server stops accepting requests."""
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+async def _call(hook: Hook) -> None:
+    result = hook()
+    if inspect.isawaitable(result):
+        await result
+
+
+async def run_startup() -> None:
+    """Run startup hooks in registration order."""
+    for hook in _startup_hooks:
+        await _call(hook)
+
+
+async def run_shutdown() -> None:
+    """
+    Run shutdown hooks in reverse registration order.
+
+    A failing hook is reported and does not prevent the others from running.
+    """
+    for hook in reversed(_shutdown_hooks):
+        try:
+            await _call(hook)
+        except Exception as e:
+            print(f"⚠️  Shutdown hook {getattr(hook, '__qualname__', hook)} failed: {e}", file=sys.stderr)
+
+
+@asynccontextmanager
+async def lifespan() -> AsyncIterator[None]:
+    """Run startup hooks on enter and shutdown hooks on exit."""
+    await run_startup()
+    try:
+        yield
+    finally:
+        await run_shutdown()
@@ -0,0 +1,306 @@
+"""
+Location Refresh Module
+=======================
+Incremental refresh of the location snapshot using the per-list content
+hashes stored in it.
+
+Re-crawling the hierarchy costs thousands of calls to catch a handful of
+administrative changes. A refresh instead walks top-down:
+
+1. The child lists of the first `always_levels` levels (provinces and the
+   city lists by default, 39 calls) are always fetched.
+2. Below that, a node's child list is fetched only if the node is new or
+   the list that contains it changed, since that is where renames,
+   splits and merges show up.
+3. A random `verify_fraction` of the remaining lists is fetched as well,
+   so changes deeper in otherwise unchanged subtrees are caught over a
+   few runs.
+
+A fetched list whose hash matches the snapshot is unchanged. Changed
+lists go into a delta (whole lists to set, plus the lists under removed
+nodes to drop), which is applied to the snapshot and published
+atomically, so running servers pick it up without a restart. Each run
+appends its report (added, removed, renamed and zip-changed locations,
+calls made) to the change log.
+
+Usage:
+    python -m src.location_refresh refresh [--snapshot PATH] [--dry-run]
+    python -m src.location_refresh apply DELTA [--snapshot PATH]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from .config import settings
+from .location_snapshot import LocationSnapshot, SnapshotError, write_snapshot
+from .location_tree import (
+    LEVELS,
+    LocationReader,
+    LocationTree,
+    child_list_key,
+    list_hash,
+)
+
+DELTA_VERSION = 1
+
+Fetch = Callable[[str, int | None], Awaitable[list[dict[str, Any]]]]
+
+
+@dataclass
+class ChangeReport:
+    """Counts of location changes found by a refresh."""
+
+    added: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LEVELS, 0))
+    removed: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LEVELS, 0))
+    renamed: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LEVELS, 0))
+    zip_changed: dict[str, int] = field(default_factory=lambda: dict.fromkeys(LEVELS, 0))
+    lists_fetched: int = 0
+    lists_changed: int = 0
+    lists_removed: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.lists_changed or self.lists_removed)
+
+
+@dataclass
+class Delta:
+    """Child lists to replace and to drop, relative to a base snapshot."""
+
+    base_created: float | None
+    set: list[tuple[str, int | None, list[dict[str, Any]]]] = field(default_factory=list)
+    remove: list[tuple[str, int | None]] = field(default_factory=list)
+    report: ChangeReport = field(default_factory=ChangeReport)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": DELTA_VERSION,
+            "created": time.time(),
+            "base_created": self.base_created,
+            "set": [{"level": level, "parent": parent, "records": records} for level, parent, records in self.set],
+            "remove": [{"level": level, "parent": parent} for level, parent in self.remove],
+            "report": asdict(self.report),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Delta":
+        if data.get("version") != DELTA_VERSION:
+            raise SnapshotError(f"Unsupported location delta version {data.get('version')!r}")
+        return cls(
+            base_created=data.get("base_created"),
+            set=[(item["level"], item["parent"], item["records"]) for item in data["set"]],
+            remove=[(item["level"], item["parent"]) for item in data["remove"]],
+            report=ChangeReport(**data.get("report", {})),
+        )
+
+
+def _diff(report: ChangeReport, level: str, old: list[dict[str, Any]], new: list[dict[str, Any]]) -> set[int]:
+    """Count changes between two versions of a child list; return removed IDs."""
+    old_by_id = {int(record["id"]): record for record in old}
+    new_by_id = {int(record["id"]): record for record in new}
+    for location_id, record in new_by_id.items():
+        previous = old_by_id.get(location_id)
+        if previous is None:
+            report.added[level] += 1
+        else:
+            report.renamed[level] += previous["name"] != record["name"]
+            report.zip_changed[level] += previous.get("zip_code") != record.get("zip_code")
+    removed = old_by_id.keys() - new_by_id.keys()
+    report.removed[level] += len(removed)
+    return removed
+
+
+def _subtree_lists(reader: LocationReader, level_index: int, node_id: int) -> list[tuple[str, int]]:
+    """(level, parent ID) of every child list stored under a node, at any depth."""
+    found = []
+    stack = [(level_index, node_id)]
+    while stack:
+        index, parent = stack.pop()
+        if index + 1 >= len(LEVELS):
+            continue
+        children = reader.children(LEVELS[index + 1], parent)
+        if children is None:
+            continue
+        found.append((LEVELS[index + 1], parent))
+        stack.extend((index + 1, child.id) for child in children)
+    return found
+
+
+async def compute_delta(
+    base: LocationReader | None,
+    fetch: Fetch,
+    always_levels: int = 2,
+    verify_fraction: float = 0.02,
+    concurrency: int = 8,
+) -> Delta:
+    """
+    Walk the hierarchy top-down and collect the lists that changed.
+
+    Args:
+        base: Current snapshot (None for a full crawl).
+        fetch: Coroutine returning the upstream child list of
+            (level, parent ID).
+        always_levels: Levels whose child lists are always fetched.
+        verify_fraction: Share of other unchanged lists fetched anyway.
+        concurrency: Child lists fetched at once.
+
+    Returns:
+        The delta with its change report.
+    """
+    delta = Delta(base_created=getattr(base, "created", None))
+    report = delta.report
+    limit = asyncio.Semaphore(concurrency)
+
+    async def fetch_list(level: str, parent: int | None) -> list[dict[str, Any]]:
+        async with limit:
+            records = await fetch(level, parent)
+        if not LocationTree.storable(records):
+            raise SnapshotError(f"Unexpected {level} list for parent {parent}")
+        return records
+
+    # (parent ID, whether the list that contains the parent changed or the parent is new)
+    frontier: list[tuple[int | None, bool]] = [(None, True)]
+    for index, level in enumerate(LEVELS):
+        selected = [
+            parent for parent, dirty in frontier
+            if index < always_levels or dirty or base is None
+            or base.child_span(child_list_key(level, parent)) is None
+            or random.random() < verify_fraction
+        ]
+        fetched = await asyncio.gather(*(fetch_list(level, parent) for parent in selected))
+        report.lists_fetched += len(selected)
+
+        next_frontier: list[tuple[int | None, bool]] = []
+        fetched_parents = set()
+        for parent, records in zip(selected, fetched):
+            fetched_parents.add(parent)
+            key = child_list_key(level, parent)
+            old_hash = base.list_hash(key) if base is not None else None
+            if old_hash == list_hash(records):
+                next_frontier.extend((int(record["id"]), False) for record in records)
+                continue
+
+            report.lists_changed += 1
+            delta.set.append((level, parent, records))
+            old = base.children_records(level, parent) if base is not None else None
+            for node_id in _diff(report, level, old or [], records):
+                # A removed node takes its stored subtree with it
+                for child_level, child_parent in _subtree_lists(base, index, node_id):
+                    delta.remove.append((child_level, child_parent))
+                    report.removed[child_level] += len(base.children(child_level, child_parent) or [])
+            # Walk into every child of a changed list
+            next_frontier.extend((int(record["id"]), True) for record in records)
+
+        # Unfetched parents keep their stored subtrees; carry their children down
+        for parent, _ in frontier:
+            if parent in fetched_parents or base is None:
+                continue
+            children = base.children(level, parent)
+            next_frontier.extend((child.id, False) for child in children or [])
+        frontier = next_frontier
+
+    report.lists_removed = len(delta.remove)
+    return delta
+
+
+def apply_delta(base: LocationReader | None, delta: Delta) -> LocationTree:
+    """A new tree with the delta's lists replaced and removed."""
+    skip = {child_list_key(level, parent) for level, parent, _ in delta.set}
+    skip.update(child_list_key(level, parent) for level, parent in delta.remove)
+    tree = LocationTree.from_reader(base, skip) if base is not None else LocationTree()
+    for level, parent, records in delta.set:
+        tree.set_children(level, parent, records)
+    return tree
+
+
+def _upstream_fetch() -> Fetch:
+    from .client import api_client
+    from .response import extract_api_data
+
+    fetchers = {
+        "province": lambda parent: api_client.get_provinces(),
+        "city": api_client.get_cities,
+        "district": api_client.get_districts,
+        "subdistrict": api_client.get_subdistricts,
+    }
+
+    async def fetch(level: str, parent: int | None) -> list[dict[str, Any]]:
+        return extract_api_data(await fetchers[level](None if parent is None else str(parent)))
+
+    return fetch
+
+
+def _open_base(path: str) -> LocationSnapshot | None:
+    if not os.path.exists(path):
+        return None
+    return LocationSnapshot(path)
+
+
+def _log_report(delta: Delta, snapshot_path: str, delta_path: str | None) -> None:
+    """Print the change report and append it to the change log."""
+    report = asdict(delta.report)
+    entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "snapshot": snapshot_path, "delta": delta_path, **report}
+    summary = ", ".join(
+        f"{kind} {sum(report[kind].values())}" for kind in ("added", "removed", "renamed", "zip_changed")
+    )
+    print(f"Location refresh: {summary}; {report['lists_fetched']} lists fetched, "
+          f"{report['lists_changed']} changed, {report['lists_removed']} removed", file=sys.stderr)
+    if settings.LOCATION_CHANGE_LOG:
+        os.makedirs(os.path.dirname(settings.LOCATION_CHANGE_LOG) or ".", exist_ok=True)
+        with open(settings.LOCATION_CHANGE_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Incrementally refresh the location snapshot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh = commands.add_parser("refresh", help="Fetch changed lists, write a delta and apply it")
+    refresh.add_argument("--snapshot", default=settings.LOCATION_SNAPSHOT, help="Snapshot path")
+    refresh.add_argument("--always-levels", type=int, default=2, help="Levels whose lists are always fetched")
+    refresh.add_argument("--verify-fraction", type=float, default=0.02, help="Share of unchanged lists re-checked")
+    refresh.add_argument("--concurrency", type=int, default=8, help="Child lists fetched at once")
+    refresh.add_argument("--dry-run", action="store_true", help="Write the delta but do not apply it")
+    apply = commands.add_parser("apply", help="Apply a delta file to the snapshot")
+    apply.add_argument("delta", help="Delta file written by refresh")
+    apply.add_argument("--snapshot", default=settings.LOCATION_SNAPSHOT, help="Snapshot path")
+    args = parser.parse_args()
+
+    base = _open_base(args.snapshot)
+    if args.command == "apply":
+        with open(args.delta, encoding="utf-8") as f:
+            delta = Delta.from_dict(json.load(f))
+        if base is not None and delta.base_created not in (None, base.created):
+            print("⚠️  WARNING: delta was computed against another snapshot version", file=sys.stderr)
+        print(write_snapshot(apply_delta(base, delta), args.snapshot))
+        return
+
+    from . import lifecycle
+
+    async def run() -> Delta:
+        async with lifecycle.lifespan():
+            return await compute_delta(
+                base, _upstream_fetch(), args.always_levels, args.verify_fraction, args.concurrency
+            )
+
+    delta = asyncio.run(run())
+    delta_path = None
+    if delta.report.changed:
+        delta_path = os.path.join(settings.DATA_DIR, "location_deltas", f"{time.strftime('%Y%m%dT%H%M%S')}.json")
+        os.makedirs(os.path.dirname(delta_path), exist_ok=True)
+        with open(delta_path, "w", encoding="utf-8") as f:
+            json.dump(delta.to_dict(), f)
+        if not args.dry_run:
+            write_snapshot(apply_delta(base, delta), args.snapshot)
+    _log_report(delta, args.snapshot, delta_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Location Snapshot Module
+========================
+Versioned binary snapshot of the location hierarchy, memory-mapped by
+every worker process.
+
+The file holds the LocationTree columns as fixed-width little-endian
+arrays behind a small header, each section aligned to 8 bytes:
+
+    header      magic, format version, row/string/list counts, created
+    ids         int32[rows]     parents int32[rows]    levels int8[rows]
+    names       int32[rows]     zips    int32[rows]
+    list_keys   int64[lists]    (sorted child_list_key() values)
+    list_firsts int32[lists]    list_counts int32[lists]
+    list_flags  int8[lists]     (1 if upstream IDs were strings)
+    list_hashes uint64[lists]   (content hash per child list, see list_hash())
+    index_keys  int64[rows]     (sorted location_key() values)
+    index_rows  int32[rows]
+    offsets     uint32[strings + 1] into the UTF-8 string blob
+    blob        bytes
+
+Opening a snapshot maps the file read-only and casts memoryviews over the
+sections, so it takes milliseconds and parses nothing; processes mapping
+the same file share one page-cache copy. Publishing writes a temporary
+file and os.replace()s it over the old one; SnapshotStore notices the new
+file and maps it, while views of the old one stay valid until dropped.
+
+Usage:
+    python -m src.location_snapshot build [--output PATH] [--concurrency 8]
+    python -m src.location_snapshot info [PATH]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator
+from typing import Any
+
+from .config import settings
+from .lifecycle import on_startup
+from .location_tree import (
+    LEVELS,
+    LocationReader,
+    LocationTree,
+    child_list_key,
+    location_key,
+)
+
+MAGIC = b"ROLS"
+FORMAT_VERSION = 2
+
+# magic, format version, rows, strings, child lists, blob bytes, created (unix time)
+_HEADER = struct.Struct("<4sIIIIQd")
+HEADER_SIZE = 64
+
+# (section, array typecode, count field)
+_SECTIONS = (
+    ("ids", "i", "rows"),
+    ("parents", "i", "rows"),
+    ("levels", "b", "rows"),
+    ("names", "i", "rows"),
+    ("zips", "i", "rows"),
+    ("list_keys", "q", "lists"),
+    ("list_firsts", "i", "lists"),
+    ("list_counts", "i", "lists"),
+    ("list_flags", "b", "lists"),
+    ("list_hashes", "Q", "lists"),
+    ("index_keys", "q", "rows"),
+    ("index_rows", "i", "rows"),
+    ("offsets", "I", "offsets"),
+    ("blob", "B", "blob"),
+)
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or of another version."""
+
+
+def _layout(counts: dict[str, int]) -> tuple[list[tuple[str, str, int, int]], int]:
+    """Section (name, typecode, offset, count) list and total file size."""
+    sections = []
+    offset = HEADER_SIZE
+    for name, typecode, count_field in _SECTIONS:
+        count = counts[count_field]
+        sections.append((name, typecode, offset, count))
+        offset += count * array(typecode).itemsize
+        offset = (offset + 7) & ~7
+    return sections, offset
+
+
+# ============================================================================
+# Writing
+# ============================================================================
+
+def write_snapshot(reader: LocationReader, path: str) -> dict[str, Any]:
+    """
+    Write the live rows of a tree (or snapshot) to `path` atomically.
+
+    Args:
+        reader: Source hierarchy.
+        path: Destination file; replaced in one step.
+
+    Returns:
+        Row, string and list counts and the file size.
+    """
+    columns = {name: array(typecode) for name, typecode, _ in _SECTIONS}
+    strings: dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    for key, first, count in sorted(reader.child_lists()):
+        columns["list_keys"].append(key)
+        columns["list_firsts"].append(len(columns["ids"]))
+        columns["list_counts"].append(count)
+        columns["list_flags"].append(1 if count and reader.has_string_ids(first) else 0)
+        columns["list_hashes"].append(reader.list_hash(key) or 0)
+        for row in range(first, first + count):
+            columns["ids"].append(reader.ids[row])
+            columns["parents"].append(reader.parents[row])
+            columns["levels"].append(reader.levels[row])
+            columns["names"].append(intern(reader.string(reader.names[row])))
+            zip_index = reader.zips[row]
+            columns["zips"].append(-1 if zip_index < 0 else intern(reader.string(zip_index)))
+
+    rows = len(columns["ids"])
+    keyed = sorted((location_key(columns["levels"][row], columns["ids"][row]), row) for row in range(rows))
+    columns["index_keys"].extend(key for key, _ in keyed)
+    columns["index_rows"].extend(row for _, row in keyed)
+
+    blob = bytearray()
+    columns["offsets"].append(0)
+    for value in strings:  # insertion order == index order
+        blob += value.encode("utf-8")
+        columns["offsets"].append(len(blob))
+    columns["blob"].frombytes(bytes(blob))
+
+    counts = {"rows": rows, "lists": len(columns["list_keys"]), "offsets": len(strings) + 1, "blob": len(blob)}
+    sections, size = _layout(counts)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, rows, len(strings), counts["lists"], len(blob), time.time())
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # A unique temporary file: several workers may refresh at the same time
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            for name, typecode, offset, _ in sections:
+                f.seek(offset)
+                column = columns[name]
+                if sys.byteorder != "little" and column.itemsize > 1:
+                    column.byteswap()
+                f.write(column.tobytes())
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+    return {"rows": rows, "strings": len(strings), "child_lists": counts["lists"], "bytes": size}
+
+
+# ============================================================================
+# Reading
+# ============================================================================
+
+class LocationSnapshot(LocationReader):
+    """Read-only location hierarchy backed by a memory-mapped snapshot file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot open location snapshot {path}: {e}") from e
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        if len(self._map) < HEADER_SIZE:
+            raise SnapshotError(f"Location snapshot {path} is truncated")
+        magic, version, rows, strings, lists, blob, created = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} location snapshot")
+        if sys.byteorder != "little":
+            raise SnapshotError("Location snapshots can only be mapped on little-endian machines")
+
+        sections, size = _layout({"rows": rows, "lists": lists, "offsets": strings + 1, "blob": blob})
+        if len(self._map) < size:
+            raise SnapshotError(f"Location snapshot {path} is truncated")
+
+        self.created = created
+        self.rows = rows
+        self.string_count = strings
+        view = memoryview(self._map)
+        for name, typecode, offset, count in sections:
+            section = view[offset:offset + count * array(typecode).itemsize]
+            setattr(self, name, section if typecode == "B" else section.cast(typecode))
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def string(self, index: int) -> str:
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def _list_position(self, key: int) -> int | None:
+        position = bisect_left(self.list_keys, key)
+        if position < len(self.list_keys) and self.list_keys[position] == key:
+            return position
+        return None
+
+    def has_string_ids(self, row: int) -> bool:
+        position = self._list_position(location_key(self.levels[row], self.parents[row] + 1))
+        return position is not None and self.list_flags[position] == 1
+
+    def child_span(self, key: int) -> tuple[int, int] | None:
+        position = self._list_position(key)
+        if position is None:
+            return None
+        return self.list_firsts[position], self.list_counts[position]
+
+    def child_lists(self) -> Iterator[tuple[int, int, int]]:
+        for position in range(len(self.list_keys)):
+            yield self.list_keys[position], self.list_firsts[position], self.list_counts[position]
+
+    def list_hash(self, key: int) -> int | None:
+        position = self._list_position(key)
+        return None if position is None else self.list_hashes[position]
+
+    def find_row(self, key: int) -> int | None:
+        position = bisect_left(self.index_keys, key)
+        if position < len(self.index_keys) and self.index_keys[position] == key:
+            return self.index_rows[position]
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **super().stats(),
+            "strings": self.string_count,
+            "bytes": len(self._map),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.created)),
+        }
+
+
+class SnapshotStore:
+    """The current snapshot at a path, remapped when a new file is published."""
+
+    def __init__(self, path: str, check_interval: float = 5.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot: LocationSnapshot | None = None
+        self._checked = float("-inf")
+
+    def current(self) -> LocationSnapshot | None:
+        """The mapped snapshot, or None if there is none."""
+        if not self.path:
+            return None
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            self._refresh()
+        return self._snapshot
+
+    def _refresh(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return  # keep serving the mapped file until a new one appears
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._snapshot is not None and self._snapshot.identity == identity:
+            return
+        try:
+            self._snapshot = LocationSnapshot(self.path)
+        except SnapshotError as e:
+            print(f"⚠️  WARNING: {e}", file=sys.stderr)
+
+
+# Global snapshot store
+location_snapshot = SnapshotStore(settings.LOCATION_SNAPSHOT, settings.LOCATION_SNAPSHOT_CHECK_INTERVAL)
+on_startup(location_snapshot.current)
+
+
+# ============================================================================
+# Building
+# ============================================================================
+
+async def crawl(concurrency: int = 8) -> LocationTree:
+    """
+    Fetch the whole hierarchy from upstream into a new tree.
+
+    Args:
+        concurrency: Child lists fetched at once.
+
+    Returns:
+        The filled tree.
+    """
+    from .client import api_client
+    from .response import extract_api_data
+
+    fetchers = {
+        "province": lambda parent: api_client.get_provinces(),
+        "city": api_client.get_cities,
+        "district": api_client.get_districts,
+        "subdistrict": api_client.get_subdistricts,
+    }
+    tree = LocationTree()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def fetch(level: str, parent: int | None) -> list[int]:
+        async with limit:
+            data = extract_api_data(await fetchers[level](None if parent is None else str(parent)))
+        if not LocationTree.storable(data):
+            raise SnapshotError(f"Unexpected {level} list for parent {parent}")
+        tree.set_children(level, parent, data)
+        return [int(record["id"]) for record in data]
+
+    parents: list[int | None] = [None]
+    for level in LEVELS:
+        children = await asyncio.gather(*(fetch(level, parent) for parent in parents))
+        parents = [child for ids in children for child in ids]
+        print(f"{level}: {len(parents)}", file=sys.stderr)
+    return tree
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or inspect location snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Crawl the API and publish a snapshot")
+    build.add_argument("--output", default=settings.LOCATION_SNAPSHOT, help="Snapshot path")
+    build.add_argument("--concurrency", type=int, default=8, help="Child lists fetched at once")
+    info = commands.add_parser("info", help="Print snapshot statistics")
+    info.add_argument("path", nargs="?", default=settings.LOCATION_SNAPSHOT)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from . import lifecycle
+
+        async def run() -> LocationTree:
+            async with lifecycle.lifespan():
+                return await crawl(args.concurrency)
+
+        summary = write_snapshot(asyncio.run(run()), args.output)
+        print(f"Wrote {args.output}: {summary}")
+    else:
+        start = time.perf_counter()
+        snapshot = LocationSnapshot(args.path)
+        opened_ms = (time.perf_counter() - start) * 1000
+        print({**snapshot.stats(), "open_ms": round(opened_ms, 3)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Location Tree Module
+====================
+Compact in-memory store of the province → city → district → subdistrict
+hierarchy, filled from the get_* tools' upstream responses.
+
+Kept as plain dicts, the full hierarchy (tens of thousands of districts
+and subdistricts) costs hundreds of bytes per record in every worker.
+Here every location is one row in `array` columns:
+
+- `ids`: the location ID
+- `parents`: the parent's ID (-1 for provinces)
+- `levels`: index into LEVELS
+- `names` / `zips`: indexes into an interned string table (-1 if absent)
+
+A child list is stored as one contiguous run of rows, so listing the
+children of a node is a slice, and looking up a row by ID is a binary
+search in a sorted key index that is rebuilt lazily after changes.
+Single records are exposed as `Location` views with __slots__ that read
+the columns on access. Rows of a replaced or removed child list are left
+in place; once they make up more than COMPACT_DEAD_SHARE of the rows,
+the next change runs compact() to drop them.
+
+LocationReader holds the lookups shared with the read-only, memory-mapped
+snapshot in location_snapshot.py.
+"""
+
+import hashlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+LEVELS = ("province", "city", "district", "subdistrict")
+
+# Record keys the tree can store; lists with other keys are not cached
+RECORD_KEYS = frozenset({"id", "name", "zip_code"})
+# IDs are kept in signed 32-bit columns
+MAX_ID = 2**31 - 1
+# Compact once this share of the rows is dead (and at least COMPACT_MIN_DEAD_ROWS)
+COMPACT_DEAD_SHARE = 0.5
+COMPACT_MIN_DEAD_ROWS = 1000
+
+
+def location_key(level: int, location_id: int) -> int:
+    """Sort key of a location: level in the high bits, ID in the low bits."""
+    return (level << 40) | location_id
+
+
+def child_list_key(level: str, parent_id: int | str | None) -> int:
+    """Key of the child list of `level` items under a parent (None for provinces)."""
+    parent = -1 if parent_id is None else int(parent_id)
+    return location_key(LEVELS.index(level), parent + 1)
+
+
+def split_child_list_key(key: int) -> tuple[str, int | None]:
+    """(level, parent ID or None) of a child list key."""
+    parent = (key & ((1 << 40) - 1)) - 1
+    return LEVELS[key >> 40], None if parent < 0 else parent
+
+
+def list_hash(records: list[dict[str, Any]]) -> int:
+    """64-bit content hash of a child list (IDs, names, zip codes, order)."""
+    digest = hashlib.blake2b(digest_size=8)
+    for record in records:
+        digest.update(f"{record['id']!r}\x1f{record['name']}\x1f{record.get('zip_code', '')}\x1e".encode())
+    return int.from_bytes(digest.digest(), "little")
+
+
+class Location:
+    """View of one row of a LocationTree or snapshot."""
+
+    __slots__ = ("tree", "row")
+
+    def __init__(self, tree: "LocationReader", row: int) -> None:
+        self.tree = tree
+        self.row = row
+
+    @property
+    def id(self) -> int:
+        return self.tree.ids[self.row]
+
+    @property
+    def level(self) -> str:
+        return LEVELS[self.tree.levels[self.row]]
+
+    @property
+    def name(self) -> str:
+        return self.tree.string(self.tree.names[self.row])
+
+    @property
+    def zip_code(self) -> str | None:
+        index = self.tree.zips[self.row]
+        return None if index < 0 else self.tree.string(index)
+
+    @property
+    def parent_id(self) -> int | None:
+        parent = self.tree.parents[self.row]
+        return None if parent < 0 else parent
+
+    def to_dict(self) -> dict[str, Any]:
+        """The record in the upstream response shape."""
+        record: dict[str, Any] = {
+            "id": str(self.id) if self.tree.has_string_ids(self.row) else self.id,
+            "name": self.name,
+        }
+        zip_code = self.zip_code
+        if zip_code is not None:
+            record["zip_code"] = zip_code
+        return record
+
+    def __repr__(self) -> str:
+        return f"Location({self.level}, {self.id}, {self.name!r})"
+
+
+class LocationReader(ABC):
+    """
+    Lookups over location columns.
+
+    Subclasses provide the columns (`ids`, `parents`, `levels`, `names`,
+    `zips`), string access and the child list and key index lookups.
+    """
+
+    ids: Sequence[int]
+    parents: Sequence[int]
+    levels: Sequence[int]
+    names: Sequence[int]
+    zips: Sequence[int]
+
+    @abstractmethod
+    def string(self, index: int) -> str:
+        """String table entry."""
+
+    @abstractmethod
+    def has_string_ids(self, row: int) -> bool:
+        """Whether the upstream IDs of a row's child list were strings."""
+
+    @abstractmethod
+    def child_span(self, key: int) -> tuple[int, int] | None:
+        """(first row, row count) of a child list, None if not stored."""
+
+    @abstractmethod
+    def find_row(self, key: int) -> int | None:
+        """Row of a location_key(), None if unknown."""
+
+    @abstractmethod
+    def child_lists(self) -> Iterator[tuple[int, int, int]]:
+        """(key, first row, row count) of every stored child list."""
+
+    def children(self, level: str, parent_id: int | str | None) -> list[Location] | None:
+        """
+        Child list of a node.
+
+        Returns:
+            The children (empty if the node has none), or None if the list
+            has not been stored.
+        """
+        span = self.child_span(child_list_key(level, parent_id))
+        if span is None:
+            return None
+        first, count = span
+        return [Location(self, row) for row in range(first, first + count)]
+
+    def children_records(self, level: str, parent_id: int | str | None) -> list[dict[str, Any]] | None:
+        """Child list as upstream-shaped dicts, or None if not stored."""
+        children = self.children(level, parent_id)
+        return None if children is None else [child.to_dict() for child in children]
+
+    def list_hash(self, key: int) -> int | None:
+        """Content hash of a stored child list, None if not stored."""
+        span = self.child_span(key)
+        if span is None:
+            return None
+        first, count = span
+        return list_hash([Location(self, row).to_dict() for row in range(first, first + count)])
+
+    def get(self, level: str, location_id: int | str) -> Location | None:
+        """Location by level and ID, None if unknown."""
+        row = self.find_row(location_key(LEVELS.index(level), int(location_id)))
+        return None if row is None else Location(self, row)
+
+    def ancestors(self, level: str, location_id: int | str) -> list[Location]:
+        """
+        Known ancestors of a location, province first.
+
+        The chain stops at the first ancestor that has not been stored.
+        """
+        chain: list[Location] = []
+        node = self.get(level, location_id)
+        while node is not None and node.parent_id is not None:
+            node = self.get(LEVELS[LEVELS.index(node.level) - 1], node.parent_id)
+            if node is not None:
+                chain.append(node)
+        chain.reverse()
+        return chain
+
+    def stats(self) -> dict[str, int]:
+        """Row counts per level and child list count."""
+        counts = {level: 0 for level in LEVELS}
+        lists = 0
+        for key, _, count in self.child_lists():
+            counts[split_child_list_key(key)[0]] += count
+            lists += 1
+        return {**counts, "child_lists": lists}
+
+
+class LocationTree(LocationReader):
+    """Array-backed, growable location hierarchy."""
+
+    def __init__(self) -> None:
+        self.ids = array("i")
+        self.parents = array("i")
+        self.levels = array("b")
+        self.names = array("i")
+        self.zips = array("i")
+        self._strings: list[str] = []
+        self._string_index: dict[str, int] = {}
+        # child_list_key() -> (first row, row count)
+        self._children: dict[int, tuple[int, int]] = {}
+        # Child lists whose upstream IDs were strings, rendered back as strings
+        self._string_ids: set[int] = set()
+        self._index_keys = array("q")
+        self._index_rows = array("i")
+        self._index_stale = False
+        self._dead_rows = 0
+        # Bumped by compact(), which renumbers rows (see list_version())
+        self._generation = 0
+
+    def __len__(self) -> int:
+        """Number of live locations."""
+        return len(self.ids) - self._dead_rows
+
+    # ========================================================================
+    # Strings
+    # ========================================================================
+
+    def string(self, index: int) -> str:
+        return self._strings[index]
+
+    def _intern(self, value: str) -> int:
+        index = self._string_index.get(value)
+        if index is None:
+            index = self._string_index[value] = len(self._strings)
+            self._strings.append(value)
+        return index
+
+    def has_string_ids(self, row: int) -> bool:
+        return location_key(self.levels[row], self.parents[row] + 1) in self._string_ids
+
+    # ========================================================================
+    # Filling
+    # ========================================================================
+
+    @staticmethod
+    def storable(records: Any) -> bool:
+        """Whether an upstream list can be stored without losing data."""
+        if not isinstance(records, list):
+            return False
+        for record in records:
+            if not isinstance(record, dict) or not RECORD_KEYS.issuperset(record):
+                return False
+            location_id = record.get("id")
+            if isinstance(location_id, bool) or not isinstance(location_id, (int, str)):
+                return False
+            if not str(location_id).isdigit() or int(location_id) >= MAX_ID:
+                return False
+            if not isinstance(record.get("name"), str) or not isinstance(record.get("zip_code", ""), str):
+                return False
+        return True
+
+    def set_children(self, level: str, parent_id: int | str | None, records: list[dict[str, Any]]) -> None:
+        """
+        Store the child list of a node, replacing any earlier list.
+
+        Args:
+            level: Level of the children ('province' for the root list).
+            parent_id: ID of the parent, None for provinces.
+            records: Upstream records (check storable() first).
+        """
+        level_index = LEVELS.index(level)
+        parent = -1 if parent_id is None else int(parent_id)
+        key = child_list_key(level, parent_id)
+        previous = self._children.get(key)
+        if previous is not None:
+            self._dead_rows += previous[1]
+
+        first = len(self.ids)
+        for record in records:
+            self.ids.append(int(record["id"]))
+            self.parents.append(parent)
+            self.levels.append(level_index)
+            self.names.append(self._intern(record["name"]))
+            zip_code = record.get("zip_code")
+            self.zips.append(-1 if zip_code is None else self._intern(zip_code))
+        self._children[key] = (first, len(records))
+        if records and isinstance(records[0]["id"], str):
+            self._string_ids.add(key)
+        else:
+            self._string_ids.discard(key)
+        self._index_stale = True
+        self._maybe_compact()
+
+    def remove_children(self, level: str, parent_id: int | str | None) -> None:
+        """Forget the child list of a node."""
+        key = child_list_key(level, parent_id)
+        span = self._children.pop(key, None)
+        if span is not None:
+            self._dead_rows += span[1]
+            self._string_ids.discard(key)
+            self._index_stale = True
+            self._maybe_compact()
+
+    @classmethod
+    def from_reader(cls, reader: LocationReader, skip: set[int] | frozenset[int] = frozenset()) -> "LocationTree":
+        """A growable copy of a tree or snapshot, without the child lists in `skip`."""
+        tree = cls()
+        for key, first, count in reader.child_lists():
+            if key not in skip:
+                level, parent = split_child_list_key(key)
+                tree.set_children(level, parent, [Location(reader, row).to_dict() for row in range(first, first + count)])
+        return tree
+
+    def compact(self) -> None:
+        """Drop rows of replaced child lists and unused strings."""
+        if not self._dead_rows:
+            return
+        generation = self._generation
+        self.__dict__.update(LocationTree.from_reader(self).__dict__)
+        self._generation = generation + 1
+
+    def _maybe_compact(self) -> None:
+        """Compact once dead rows pass COMPACT_DEAD_SHARE of all rows."""
+        if self._dead_rows >= COMPACT_MIN_DEAD_ROWS and self._dead_rows > COMPACT_DEAD_SHARE * len(self.ids):
+            self.compact()
+
+    # ========================================================================
+    # Lookup
+    # ========================================================================
+
+    def child_span(self, key: int) -> tuple[int, int] | None:
+        return self._children.get(key)
+
+    def list_version(self, key: int) -> tuple[int, int] | None:
+        """
+        Identity of the stored version of a child list, None if not stored.
+
+        Replacing a list appends new rows, so its first row changes with
+        every version until compact() renumbers rows and bumps the generation.
+        """
+        span = self._children.get(key)
+        return None if span is None else (self._generation, span[0])
+
+    def child_lists(self) -> Iterator[tuple[int, int, int]]:
+        for key, (first, count) in self._children.items():
+            yield key, first, count
+
+    def find_row(self, key: int) -> int | None:
+        if self._index_stale:
+            self._rebuild_index()
+        position = bisect_left(self._index_keys, key)
+        if position < len(self._index_keys) and self._index_keys[position] == key:
+            return self._index_rows[position]
+        return None
+
+    def _rebuild_index(self) -> None:
+        """Sort live rows by (level, ID) for binary search."""
+        keyed = sorted(
+            (location_key(self.levels[row], self.ids[row]), row)
+            for first, count in self._children.values()
+            for row in range(first, first + count)
+        )
+        self._index_keys = array("q", (key for key, _ in keyed))
+        self._index_rows = array("i", (row for _, row in keyed))
+        self._index_stale = False
+
+    # ========================================================================
+    # Introspection
+    # ========================================================================
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by columns, indexes and strings."""
+        columns = (self.ids, self.parents, self.levels, self.names, self.zips, self._index_keys, self._index_rows)
+        total = sum(column.itemsize * len(column) for column in columns)
+        return total + sum(len(value) + 49 for value in self._strings)
+
+    def stats(self) -> dict[str, int]:
+        """Row counts per level and table sizes."""
+        return {**super().stats(), "strings": len(self._strings), "dead_rows": self._dead_rows}
+
+
+# Global tree instance
+location_tree = LocationTree()
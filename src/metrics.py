@@ -0,0 +1,364 @@
+"""
+Metrics Module
+==============
+Low-overhead in-process metrics: counters, gauges and histograms with
+Prometheus text exposition.
+
+All updates happen on the event loop thread, so metrics are plain dicts
+keyed by label tuples with no locking. Rendering copies each dict before
+iterating, which is safe under the GIL.
+"""
+
+import asyncio
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any
+
+# Latency buckets in seconds, from cache hits to slow upstream calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric(ABC):
+    """Base class for a named metric with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+
+    def render(self) -> list[str]:
+        """Prometheus text lines for this metric."""
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def snapshot(self) -> Any:
+        """JSON-friendly view of the current values."""
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1.0) -> None:
+        """Increase the counter for a label set."""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, labels: tuple[str, ...] = ()) -> float:
+        """Current value for a label set."""
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, value in dict(self._values).items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [
+            {**dict(zip(self.labelnames, labels)), "value": value}
+            for labels, value in dict(self._values).items()
+        ]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, labels: tuple[str, ...] = (), amount: float = 1.0) -> None:
+        """Decrease the gauge for a label set."""
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, labels: tuple[str, ...], value: float) -> None:
+        """Set the gauge for a label set."""
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Bucketed distribution per label set (cumulative on render).
+
+    Latency histograms observe seconds and report milliseconds in
+    snapshot(); histograms of other quantities (unit=None) report raw values.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        unit: str | None = "seconds",
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.unit = unit
+        # labels -> [count per bucket..., count above last bucket, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        """Record one observation."""
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _cumulative(self, series: list[float]) -> list[tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, math.inf), series[:-1]):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, series in dict(self._values).items():
+            series = list(series)
+            cumulative = self._cumulative(series)
+            for bound, count in cumulative:
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {count}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative[-1][1]}")
+        return lines
+
+    def quantile(self, labels: tuple[str, ...], q: float) -> float | None:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        series = self._values.get(labels)
+        if not series:
+            return None
+        cumulative = self._cumulative(list(series))
+        total = cumulative[-1][1]
+        if total == 0:
+            return None
+        rank = q * total
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in cumulative:
+            if count >= rank:
+                if bound == math.inf:
+                    return lower_bound
+                share = (rank - lower_count) / max(count - lower_count, 1)
+                return lower_bound + (bound - lower_bound) * share
+            lower_bound, lower_count = bound, count
+        return lower_bound
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        result = []
+        scale, suffix = (_ms, "_ms") if self.unit == "seconds" else (_round, "")
+        for labels, series in dict(self._values).items():
+            count = sum(series[:-1])
+            result.append({
+                **dict(zip(self.labelnames, labels)),
+                "count": count,
+                f"mean{suffix}": scale(series[-1] / count) if count else None,
+                f"p50{suffix}": scale(self.quantile(labels, 0.50)),
+                f"p95{suffix}": scale(self.quantile(labels, 0.95)),
+                f"p99{suffix}": scale(self.quantile(labels, 0.99)),
+            })
+        return result
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 2)
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        """Add a metric and return it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        unit: str | None = "seconds",
+    ) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets, unit))
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in Prometheus text exposition format 0.0.4."""
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, Any]:
+        """JSON-friendly view of all metrics."""
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+
+# ============================================================================
+# Global registry and server metrics
+# ============================================================================
+
+registry = MetricsRegistry()
+
+TOOL_CALLS = registry.counter(
+    "rajaongkir_tool_calls_total", "MCP tool calls by outcome (success or error code).", ("tool", "outcome")
+)
+TOOL_LATENCY = registry.histogram(
+    "rajaongkir_tool_latency_seconds", "MCP tool call latency.", ("tool",)
+)
+TOOL_IN_FLIGHT = registry.gauge(
+    "rajaongkir_tool_in_flight", "MCP tool calls currently running.", ("tool",)
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "rajaongkir_upstream_requests_total", "Upstream API requests by HTTP status.", ("endpoint", "status")
+)
+UPSTREAM_LATENCY = registry.histogram(
+    "rajaongkir_upstream_latency_seconds", "Upstream API request latency.", ("endpoint",)
+)
+UPSTREAM_TIMEOUTS = registry.counter(
+    "rajaongkir_upstream_timeouts_total", "Upstream API requests that timed out.", ("endpoint",)
+)
+UPSTREAM_IN_FLIGHT = registry.gauge(
+    "rajaongkir_upstream_in_flight", "Upstream API requests currently running."
+)
+API_KEY_REQUESTS = registry.counter(
+    "rajaongkir_api_key_requests_total", "Upstream API requests per pooled API key by HTTP status.", ("key", "status")
+)
+API_KEY_REMAINING = registry.gauge(
+    "rajaongkir_api_key_remaining", "Requests left today per pooled API key with a known daily quota.", ("key",)
+)
+TENANT_REQUESTS = registry.counter(
+    "rajaongkir_tenant_requests_total", "Upstream API requests per tenant.", ("tenant",)
+)
+TENANT_THROTTLED = registry.counter(
+    "rajaongkir_tenant_throttled_total", "Upstream API requests refused by a tenant's limits.", ("tenant", "reason")
+)
+QUOTA_REMAINING = registry.gauge(
+    "rajaongkir_quota_remaining", "Upstream calls left in today's budget, per key pool.", ("pool",)
+)
+QUOTA_LEVEL = registry.gauge(
+    "rajaongkir_quota_level", "Quota policy per key pool: 0 normal, 1 conserve, 2 stale, 3 shed.", ("pool",)
+)
+QUOTA_REFUSED = registry.counter(
+    "rajaongkir_quota_refused_total", "Tool calls refused to save the daily quota.", ("tool",)
+)
+SCHEDULER_QUEUE_TIME = registry.histogram(
+    "rajaongkir_scheduler_queue_seconds", "Time upstream requests waited for a slot, per priority class.", ("class",)
+)
+SCHEDULER_QUEUED = registry.gauge(
+    "rajaongkir_scheduler_queued", "Upstream requests waiting for a slot, per priority class.", ("class",)
+)
+SCHEDULER_AGED = registry.counter(
+    "rajaongkir_scheduler_aged_total", "Requests served ahead of their class's turn after waiting SCHEDULER_MAX_WAIT_MS.",
+    ("class",),
+)
+COST_BATCH_SIZE = registry.histogram(
+    "rajaongkir_cost_batch_size", "District cost calls merged into one upstream request.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+    unit=None,
+)
+COURIERS_PRUNED = registry.counter(
+    "rajaongkir_couriers_pruned_total", "Couriers left out of cost requests as dead on the lane.", ("courier",)
+)
+CACHE_REQUESTS = registry.counter(
+    "rajaongkir_cache_requests_total", "Cache lookups by result (hit or miss).", ("cache", "result")
+)
+HISTORY_ROWS = registry.counter(
+    "rajaongkir_history_rows_total", "History store rows by table and result (written or dropped).",
+    ("table", "result"),
+)
+OFFLOAD_CALLS = registry.counter(
+    "rajaongkir_offload_calls_total",
+    "CPU-heavy tasks by result (process, retried after a broken pool, or failed).",
+    ("task", "result"),
+)
+LOOP_LAG = registry.histogram(
+    "rajaongkir_event_loop_lag_seconds", "How late the event loop ran a scheduled timer.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_LAG_OVER_BUDGET = registry.counter(
+    "rajaongkir_event_loop_lag_over_budget_total", "Event loop lag samples above LOOP_LAG_BUDGET_MS."
+)
+
+
+def cache_hit_ratios() -> dict[str, float | None]:
+    """Hit ratio per cache name."""
+    totals: dict[str, list[float]] = {}
+    for item in CACHE_REQUESTS.snapshot():
+        hits_misses = totals.setdefault(item["cache"], [0.0, 0.0])
+        hits_misses[0 if item["result"] == "hit" else 1] += item["value"]
+    return {
+        cache: round(hits / (hits + misses), 4) if hits + misses else None
+        for cache, (hits, misses) in totals.items()
+    }
+
+
+# ============================================================================
+# Local Prometheus endpoint (for stdio mode, where there is no HTTP app)
+# ============================================================================
+
+async def _handle_scrape(reader: Any, writer: Any) -> None:
+    """Answer any HTTP request with the Prometheus text exposition."""
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = registry.render_prometheus().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host: str, port: int) -> asyncio.AbstractServer:
+    """Start a minimal HTTP server on the event loop that serves /metrics."""
+    return await asyncio.start_server(_handle_scrape, host, port)
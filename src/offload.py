@@ -0,0 +1,275 @@
+"""
+Offload Module
+==============
+CPU-heavy response post-processing in worker processes, and a monitor of
+event loop lag.
+
+All sessions share one event loop, so building and encoding a response
+of thousands of rows holds up every other call's I/O. Whole lists of at
+least OFFLOAD_MIN_ITEMS records are shaped (projection, compact format)
+and JSON-encoded in a process pool instead:
+
+- records are sent as one column header plus value tuples, not as dicts
+- the response comes back with its MCP text already encoded (see
+  EncodedResponse), so FastMCP does not encode it again on the loop
+
+Workers are spawned rather than forked, so they do not inherit the
+server's threads and sockets. They start with the first large response,
+so processes that never build one (e.g. the snapshot CLIs) spawn none.
+If the pool breaks, it is replaced and the work is retried once in the
+new pool; it never falls back to the event loop.
+
+The lag monitor sleeps LOOP_LAG_INTERVAL_MS at a time and records how
+late it wakes up in rajaongkir_event_loop_lag_seconds. Wake-ups later
+than LOOP_LAG_BUDGET_MS are counted as over budget.
+"""
+
+import asyncio
+import multiprocessing
+import sys
+from collections.abc import Callable, Hashable
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any
+
+from .config import settings
+from .exceptions import WorkerError
+from .lifecycle import on_shutdown, on_startup
+from .metrics import LOOP_LAG, LOOP_LAG_OVER_BUDGET, OFFLOAD_CALLS
+from .response import encode_response, list_response, response_text
+from .tracing import current_span
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# ============================================================================
+# Compact record transport
+# ============================================================================
+
+def pack_records(items: list[Any]) -> tuple[list[str], list[Any]] | None:
+    """
+    Records as a column header plus one value tuple per record.
+
+    Returns:
+        (columns, rows), or None unless every item is a dict with the
+        same keys in the same order.
+    """
+    if not items or not isinstance(items[0], dict) or not items[0]:
+        return None
+    first = items[0].keys()
+    try:
+        # dict.keys raises TypeError for anything that is not a dict
+        if not all(map(first.__eq__, map(dict.keys, items))):
+            return None
+    except TypeError:
+        return None
+    columns = list(first)
+    return columns, list(map(itemgetter(*columns), items))
+
+
+def unpack_records(columns: list[str], rows: list[Any]) -> list[dict[str, Any]]:
+    """Inverse of pack_records()."""
+    if len(columns) == 1:
+        # itemgetter with one key returns the value itself
+        return [{columns[0]: value} for value in rows]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _encode_list(
+    columns: list[str],
+    rows: list[Any],
+    item_name: str,
+    fields: list[str] | None,
+    response_format: str,
+) -> tuple[dict[str, Any], str]:
+    """Worker side: rebuild the records, then build and encode the whole-list response."""
+    response = list_response(unpack_records(columns, rows), item_name, fields, response_format, page_size=0)
+    return response, response_text(response)
+
+
+# ============================================================================
+# Worker pool
+# ============================================================================
+
+class WorkerPool:
+    """Process pool for CPU-bound post-processing."""
+
+    def __init__(self, workers: int = 2, min_items: int = 1000) -> None:
+        self.workers = workers
+        self.min_items = min_items
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> "ProcessPoolExecutor":
+        if self._executor is None:
+            # Imported here: the process pool machinery is only loaded once a worker is needed
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def start(self) -> None:
+        """Spawn all workers now instead of on first use."""
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(int)
+
+    async def _submit(self, task: str, function: Callable[..., Any], *args: Any) -> Any:
+        """Run function(*args) in the pool; a broken pool is dropped before re-raising."""
+        from concurrent.futures.process import BrokenProcessPool
+
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        except BrokenProcessPool as e:
+            print(f"⚠️  WARNING: offload worker pool broke while running {task}: {e}", file=sys.stderr)
+            if self._executor is executor:
+                self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    async def run(self, task: str, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run function(*args) in a worker process.
+
+        If the pool is broken (e.g. a worker was killed), it is replaced
+        and the function runs once more in the new pool; the work is never
+        moved onto the event loop.
+
+        Args:
+            task: Task name for the offload metrics.
+            function: A module-level function (it is pickled by name).
+            *args: Picklable arguments.
+
+        Returns:
+            The function's result.
+
+        Raises:
+            WorkerError: If the new pool breaks as well.
+        """
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            result = await self._submit(task, function, *args)
+        except BrokenProcessPool:
+            OFFLOAD_CALLS.inc((task, "retried"))
+            try:
+                result = await self._submit(task, function, *args)
+            except BrokenProcessPool as e:
+                OFFLOAD_CALLS.inc((task, "failed"))
+                raise WorkerError(
+                    message="Worker process failed",
+                    detail=f"The worker pool broke twice while running {task}; please try again.",
+                ) from e
+        OFFLOAD_CALLS.inc((task, "process"))
+        return result
+
+    async def stop(self) -> None:
+        """Shut the workers down; queued work is cancelled."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+
+# Global worker pool instance
+worker_pool = WorkerPool(settings.OFFLOAD_WORKERS, settings.OFFLOAD_MIN_ITEMS)
+on_shutdown(worker_pool.stop)
+
+
+async def offload_list_response(
+    items: list[Any],
+    item_name: str = "items",
+    fields: list[str] | None = None,
+    response_format: str = "json",
+    page_size: int | None = None,
+    key: Hashable | None = None,
+) -> dict[str, Any]:
+    """
+    list_response() for the event loop, built in a worker process when large.
+
+    A response holding the whole list of at least OFFLOAD_MIN_ITEMS
+    uniform records is built and encoded by the worker pool and returned
+    as an EncodedResponse. Paged and smaller lists are built inline.
+
+    Args:
+        items: List of items.
+        item_name: Name of the items for the message.
+        fields: Optional keys to keep in each item.
+        response_format: 'json' (default) or 'compact' (columns + rows).
+        page_size: Max items per response. Defaults to LIST_PAGE_SIZE,
+            0 disables paging.
+        key: Identity of the data version of `items`, if known (see
+            list_response).
+
+    Returns:
+        Formatted list response with count metadata.
+    """
+    if page_size is None:
+        page_size = settings.LIST_PAGE_SIZE
+    whole = page_size <= 0 or len(items) <= page_size
+    packed = None
+    if whole and worker_pool.enabled and len(items) >= worker_pool.min_items:
+        packed = pack_records(items)
+    if packed is None:
+        return list_response(items, item_name, fields, response_format, page_size, key)
+
+    current_span().set_attributes({"offload": "process"})
+    response, text = await worker_pool.run("list_response", _encode_list, *packed, item_name, fields, response_format)
+    return encode_response(response, text)
+
+
+# ============================================================================
+# Event loop lag
+# ============================================================================
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a periodic timer."""
+
+    def __init__(self, interval_ms: float = 100.0, budget_ms: float = 50.0) -> None:
+        self.interval = interval_ms / 1000
+        self.budget = budget_ms / 1000
+        self.max_lag = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def observe(self, lag: float) -> None:
+        """Record one lag sample in seconds."""
+        LOOP_LAG.observe((), lag)
+        if lag > self.budget:
+            LOOP_LAG_OVER_BUDGET.inc()
+        self.max_lag = max(self.max_lag, lag)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.observe(max(loop.time() - start - self.interval, 0.0))
+
+    async def start(self) -> None:
+        """Start sampling on the running loop."""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# Global loop lag monitor instance
+loop_lag_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_MS, settings.LOOP_LAG_BUDGET_MS)
+on_startup(loop_lag_monitor.start)
+on_shutdown(loop_lag_monitor.stop)
@@ -0,0 +1,199 @@
+"""
+Profiling Module
+================
+On-demand sampling profiler for slow tool calls.
+
+When enabled, a background thread samples the event loop thread's stack
+every PROFILE_INTERVAL_MS while watched tool calls are in flight. Each
+sample is attributed to the tool call whose frame is on the stack, so
+concurrent calls get separate profiles. A call only appears on the
+stack while it is running Python code, not while it awaits the network,
+so the profile shows where CPU time went (list parsing, projection,
+response building).
+
+A call is written out if it was sampled (PROFILE_SAMPLE_RATE) or took
+longer than PROFILE_THRESHOLD_MS. Profiles are JSON files with the tool
+name, arguments, duration and folded stacks ("a;b;c": samples, the
+input format of flamegraph.pl and speedscope). Only the PROFILE_KEEP
+slowest profiles are kept in PROFILE_DIR.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any
+
+from .config import settings
+from .lifecycle import on_shutdown
+
+# Stack depth limit per sample, to bound the cost of deep recursion
+MAX_DEPTH = 128
+
+
+class ProfiledCall:
+    """Samples collected for one watched tool call."""
+
+    __slots__ = ("tool", "arguments", "sampled", "started_at", "start", "stacks", "samples")
+
+    def __init__(self, tool: str, arguments: dict[str, Any], sampled: bool) -> None:
+        self.tool = tool
+        self.arguments = arguments
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.stacks: dict[str, int] = {}
+        self.samples = 0
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    # co_qualname (Class.method) is only available from Python 3.11
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """Samples the event loop thread and writes profiles of slow calls."""
+
+    def __init__(
+        self,
+        sample_rate: float,
+        threshold_ms: float,
+        directory: str,
+        keep: int,
+        interval_ms: float,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval_ms / 1000
+        # Frame of the watched call's wrapper -> its samples
+        self._active: dict[FrameType, ProfiledCall] = {}
+        self._loop_thread: int | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.threshold > 0
+
+    def begin(self, tool: str, arguments: dict[str, Any]) -> ProfiledCall | None:
+        """
+        Start watching the calling frame's tool call.
+
+        Must be called from the tool wrapper itself: its frame is the
+        marker that attributes stack samples to this call.
+
+        Returns:
+            The call record, or None if the call is not watched.
+        """
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and self.threshold <= 0:
+            return None
+
+        call = ProfiledCall(tool, arguments, sampled)
+        self._active[sys._getframe(1)] = call
+        self._loop_thread = threading.get_ident()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rajaongkir-profiler", daemon=True)
+            self._thread.start()
+        return call
+
+    def end(self, call: ProfiledCall, outcome: str) -> None:
+        """Stop watching a call and write its profile if it qualifies."""
+        for frame, active in list(self._active.items()):
+            if active is call:
+                del self._active[frame]
+                break
+
+        duration = time.perf_counter() - call.start
+        if call.sampled or duration >= self.threshold:
+            try:
+                self._write(call, duration, outcome)
+            except OSError as e:
+                print(f"⚠️  WARNING: could not write profile: {e}", file=sys.stderr)
+
+    def stop(self) -> None:
+        """Stop the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._stop.clear()
+
+    # ========================================================================
+    # Sampler thread
+    # ========================================================================
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._active and self._loop_thread is not None:
+                self._sample()
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        active = dict(self._active)
+        labels = []
+        depth = 0
+        while frame is not None and depth < MAX_DEPTH:
+            call = active.get(frame)
+            if call is not None:
+                stack = ";".join(reversed(labels))
+                call.stacks[stack] = call.stacks.get(stack, 0) + 1
+                call.samples += 1
+                return
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+            depth += 1
+
+    # ========================================================================
+    # Rolling profile directory
+    # ========================================================================
+
+    def _existing(self) -> list[tuple[int, str]]:
+        """(duration_ms, filename) of the profiles on disk, slowest first."""
+        profiles = []
+        for filename in os.listdir(self.directory):
+            duration_text = filename.split("ms_", 1)[0]
+            if filename.endswith(".json") and duration_text.isdigit():
+                profiles.append((int(duration_text), filename))
+        return sorted(profiles, reverse=True)
+
+    def _write(self, call: ProfiledCall, duration: float, outcome: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        duration_ms = int(duration * 1000)
+        existing = self._existing()
+        if len(existing) >= self.keep and duration_ms <= existing[self.keep - 1][0]:
+            return
+
+        filename = f"{duration_ms:09d}ms_{call.tool}_{int(call.started_at * 1000)}.json"
+        profile = {
+            "tool": call.tool,
+            "arguments": call.arguments,
+            "outcome": outcome,
+            "started_at": call.started_at,
+            "duration_ms": round(duration * 1000, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": call.samples,
+            "stacks": dict(sorted(call.stacks.items(), key=lambda item: -item[1])),
+        }
+        with open(os.path.join(self.directory, filename), "w", encoding="utf-8") as f:
+            json.dump(profile, f, indent=2, default=str)
+
+        for _, old in self._existing()[self.keep:]:
+            os.remove(os.path.join(self.directory, old))
+
+
+# Global profiler instance
+profiler = SamplingProfiler(
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    threshold_ms=settings.PROFILE_THRESHOLD_MS,
+    directory=settings.PROFILE_DIR,
+    keep=settings.PROFILE_KEEP,
+    interval_ms=settings.PROFILE_INTERVAL_MS,
+)
+on_shutdown(profiler.stop)
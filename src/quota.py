@@ -0,0 +1,306 @@
+"""
+Quota Module
+============
+Daily upstream call budget: accounting, projection and cache-first
+degradation.
+
+RajaOngkir plans limit calls per day. The tracker counts the upstream
+calls that use up the plan (every answer but 401, 403 and 429) per
+endpoint and day (WIB), and keeps a recent call rate that decays with a
+QUOTA_RATE_HALF_LIFE half-life. Against the daily limit (QUOTA_DAILY_LIMIT,
+or the sum of the pool's key quotas when every key has one) it projects
+the day's total and the time the budget runs out, and picks a policy:
+
+    level     budget left       effect
+    normal    >= QUOTA_CONSERVE_AT  answers cached for UPSTREAM_CACHE_TTL (0: never reused)
+    conserve  <  QUOTA_CONSERVE_AT  cached answers reused for QUOTA_CONSERVE_TTL
+    stale     <  QUOTA_STALE_AT     cached answers reused up to QUOTA_STALE_MAX_AGE
+    shed      <  QUOTA_SHED_AT      as stale, and the QUOTA_SHED_TOOLS are refused
+
+When the current rate would use up the budget before midnight, the
+policy is one level stricter than the budget left alone calls for, so
+degradation starts before the limit is hit. Without a known limit the
+calls are counted and the policy stays normal.
+
+Answers reused from the upstream cache are returned as CachedPayload, so
+tools can label them and skip recording them again.
+
+Worker processes share one budget: every state.SYNC_INTERVAL seconds
+each adds its new counts to QUOTA_USAGE_FILE under a lock (see
+state.update_state) from a background task, and takes over the others'
+counts, which also enter its recent rate. Counting a call only touches
+memory.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from .config import settings
+from .exceptions import QuotaError
+from .key_pool import KEY_STATUSES, KeyPool, key_pool, quota_day, seconds_to_next_day
+from .metrics import CACHE_REQUESTS, QUOTA_LEVEL, QUOTA_REFUSED, QUOTA_REMAINING
+from .state import load_state, update_state, usage_sync
+
+STATE_VERSION = 1
+
+LEVELS = ("normal", "conserve", "stale", "shed")
+
+
+# ============================================================================
+# Upstream answer cache
+# ============================================================================
+
+class CachedPayload(dict):
+    """An upstream answer reused from the cache; `age` is in seconds."""
+
+    age: float = 0.0
+
+
+class UpstreamCache:
+    """LRU of recent upstream answers, reused as the quota policy allows."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[dict[str, Any], float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, max_age: float) -> CachedPayload | None:
+        """
+        Look up an answer no older than `max_age` seconds.
+
+        Returns:
+            The cached answer, or None if there is none young enough
+            (always None when `max_age` is 0).
+        """
+        if max_age <= 0:
+            return None
+        entry = self._entries.get(key)
+        age = time.time() - entry[1] if entry is not None else 0.0
+        hit = entry is not None and age <= max_age
+        CACHE_REQUESTS.inc(("upstream", "hit" if hit else "miss"))
+        if not hit:
+            return None
+        self._entries.move_to_end(key)
+        payload = CachedPayload(entry[0])
+        payload.age = age
+        return payload
+
+    def put(self, key: Hashable, payload: dict[str, Any]) -> None:
+        """Keep a fresh answer for later reuse."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (payload, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# ============================================================================
+# Quota tracker
+# ============================================================================
+
+class QuotaTracker:
+    """Daily call counts of one key pool, their projection and the policy."""
+
+    def __init__(
+        self,
+        name: str,
+        pool: KeyPool,
+        daily_limit: int = 0,
+        path: str = "",
+    ) -> None:
+        self.name = name
+        self.pool = pool
+        self.daily_limit = daily_limit
+        self.path = path
+        self.day = ""
+        self.endpoints: dict[str, int] = {}
+        self.used = 0
+        self.refused = 0
+        # Decayed call count for the recent rate
+        self._recent = 0.0
+        self._decayed_at = time.time()
+        # Calls of this process not yet added to the usage file
+        self._unsaved: dict[str, int] = {}
+        self._loaded = False
+
+    @property
+    def limit(self) -> int:
+        """Daily call limit, 0 if unknown."""
+        if self.daily_limit:
+            return self.daily_limit
+        quotas = [key.daily_quota for key in self.pool.keys]
+        return sum(quotas) if quotas and all(quotas) else 0
+
+    def _roll(self, now: float) -> None:
+        self._ensure_loaded()
+        day = quota_day(now)
+        if day != self.day:
+            # Unsynced calls of the previous day no longer count against a budget
+            self.day, self.used, self.endpoints, self._unsaved = day, 0, {}, {}
+        if now > self._decayed_at:
+            self._recent *= 0.5 ** ((now - self._decayed_at) / settings.QUOTA_RATE_HALF_LIFE)
+            self._decayed_at = now
+
+    def record(self, endpoint: str, status: int) -> None:
+        """Count one upstream answer against the budget."""
+        if status in KEY_STATUSES:
+            return
+        now = time.time()
+        self._roll(now)
+        self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+        self._unsaved[endpoint] = self._unsaved.get(endpoint, 0) + 1
+        self.used += 1
+        self._recent += 1
+        limit = self.limit
+        if limit:
+            QUOTA_REMAINING.set((self.name,), max(limit - self.used, 0))
+
+    def rate(self) -> float:
+        """Recent calls per second."""
+        self._roll(time.time())
+        # A decayed sum of a steady rate r settles at r * half_life / ln 2
+        return self._recent * math.log(2) / settings.QUOTA_RATE_HALF_LIFE
+
+    def level(self) -> int:
+        """Index of the current policy in LEVELS."""
+        limit = self.limit
+        if not limit:
+            return 0
+        now = time.time()
+        self._roll(now)
+        left = max(limit - self.used, 0)
+        share = left / limit
+        level = 0
+        for index, threshold in enumerate(
+            (settings.QUOTA_CONSERVE_AT, settings.QUOTA_STALE_AT, settings.QUOTA_SHED_AT), start=1
+        ):
+            if share < threshold:
+                level = index
+        rate = self.rate()
+        if rate > 0 and left / rate < seconds_to_next_day(now):
+            level = min(level + 1, len(LEVELS) - 1)
+        QUOTA_LEVEL.set((self.name,), level)
+        return level
+
+    def cache_ttl(self) -> float:
+        """Maximum age of a cached answer that may be reused now."""
+        level = self.level()
+        if level >= LEVELS.index("stale"):
+            return max(settings.QUOTA_STALE_MAX_AGE, settings.UPSTREAM_CACHE_TTL)
+        if level == LEVELS.index("conserve"):
+            return max(settings.QUOTA_CONSERVE_TTL, settings.UPSTREAM_CACHE_TTL)
+        return settings.UPSTREAM_CACHE_TTL
+
+    def admit(self, tool: str) -> None:
+        """
+        Check that a tool may run under the current policy.
+
+        Raises:
+            QuotaError: If the tool is shed to save the rest of the budget.
+        """
+        if tool not in settings.QUOTA_SHED_TOOLS or self.level() < LEVELS.index("shed"):
+            return
+        self.refused += 1
+        QUOTA_REFUSED.inc((tool,))
+        raise QuotaError(
+            message="Refused to save the daily API quota",
+            detail=f"{tool} is paused while little of today's upstream budget is left; "
+            "it resets at midnight WIB.",
+        )
+
+    def status(self) -> dict[str, Any]:
+        """Current and projected usage, and the policy in force."""
+        now = time.time()
+        level = self.level()
+        limit = self.limit
+        rate = self.rate()
+        to_reset = seconds_to_next_day(now)
+        left = max(limit - self.used, 0) if limit else None
+        runs_out_in = left / rate if left is not None and rate > 0 else None
+        return {
+            "day": self.day,
+            "used_today": self.used,
+            "daily_limit": limit or None,
+            "remaining_today": left,
+            "rate_per_minute": round(rate * 60, 2),
+            "projected_today": round(self.used + rate * to_reset),
+            "runs_out_in_s": round(runs_out_in) if runs_out_in is not None and runs_out_in < to_reset else None,
+            "resets_in_s": round(to_reset),
+            "policy": LEVELS[level],
+            "cache_ttl_s": self.cache_ttl(),
+            "refused_calls": self.refused,
+            "endpoints": dict(sorted(self.endpoints.items(), key=lambda item: -item[1])),
+        }
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        state = load_state(self.path, STATE_VERSION)
+        if state is None or state.get("day") != quota_day(time.time()):
+            return
+        self.day = state["day"]
+        self.endpoints = {str(k): int(v) for k, v in state.get("endpoints", {}).items()}
+        self.used = sum(self.endpoints.values())
+
+    @staticmethod
+    def _merge(state: dict[str, Any] | None, day: str, unsaved: dict[str, int]) -> dict[str, Any]:
+        """The usage file with this process's unsaved calls of `day` added."""
+        saved_day = state.get("day", "") if state is not None else ""
+        if saved_day > day:
+            # The other workers are on a newer day already
+            return state  # type: ignore[return-value]
+        endpoints = {str(k): int(v) for k, v in state.get("endpoints", {}).items()} if saved_day == day else {}
+        for endpoint, count in unsaved.items():
+            endpoints[endpoint] = endpoints.get(endpoint, 0) + count
+        return {"version": STATE_VERSION, "day": day, "endpoints": endpoints}
+
+    def _exchange(self, day: str, unsaved: dict[str, int]) -> dict[str, Any] | None:
+        """File part of sync(): add `unsaved` and return the file's state."""
+        if unsaved:
+            return update_state(self.path, STATE_VERSION, lambda current: self._merge(current, day, unsaved))
+        return load_state(self.path, STATE_VERSION)
+
+    async def sync(self) -> None:
+        """Add this process's new counts to the usage file and take over the other workers'."""
+        if not self.path:
+            return
+        self._ensure_loaded()
+        day, unsaved = self.day, self._unsaved
+        self._unsaved = {}
+        state = await asyncio.to_thread(self._exchange, day, unsaved)
+        if state is None:
+            if unsaved and day == self.day:
+                for endpoint, count in unsaved.items():
+                    self._unsaved[endpoint] = self._unsaved.get(endpoint, 0) + count
+            return
+        if state.get("day") != self.day:
+            return
+        endpoints = {str(k): int(v) for k, v in state.get("endpoints", {}).items()}
+        # Calls counted while the file was being updated are not in it yet
+        for endpoint, count in self._unsaved.items():
+            endpoints[endpoint] = endpoints.get(endpoint, 0) + count
+        self.endpoints = endpoints
+        used = sum(endpoints.values())
+        # The other workers' calls count towards the recent rate too
+        self._recent += max(used - self.used, 0)
+        self.used = used
+
+
+# Global quota tracker of the deployment's key pool
+quota_tracker = QuotaTracker("default", key_pool, settings.QUOTA_DAILY_LIMIT, settings.QUOTA_USAGE_FILE)
+usage_sync.add(quota_tracker.sync)
@@ -1,16 +1,148 @@
 """
 Response Helper Module
 ======================
-Standardized response formatting for all tools.
+Standardized response formatting for all tools, and a cache of responses
+that are already encoded for MCP.
 """
 
+from collections import OrderedDict
+from collections.abc import Hashable
+from operator import itemgetter
 from typing import Any
 
+import pydantic_core
+from mcp.types import CallToolResult, TextContent
+
+from .config import settings
+from .result_store import StoredResult, make_cursor, result_store
+
+# Supported response encodings for tool results
+RESPONSE_FORMATS = ["json", "compact"]
+
+
+def _get_path(item: dict[str, Any], path: list[str]) -> Any:
+    """Resolve a split key path (e.g. ['summary', 'status']) inside a dict."""
+    value: Any = item
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def project_fields(data: Any, fields: list[str] | None) -> Any:
+    """
+    Keep only the selected fields of a record or list of records.
+
+    Args:
+        data: A dict, a list of dicts, or any other value.
+        fields: Keys to keep, dotted paths reach into nested dicts.
+
+    Returns:
+        Projected data. Non-dict values are returned unchanged.
+    """
+    if not fields:
+        return data
+
+    if isinstance(data, dict):
+        return project_fields([data], fields)[0]
+
+    if not isinstance(data, list):
+        return data
+
+    if not any("." in field for field in fields):
+        # Flat keys: skip path resolution entirely (the common case for lists)
+        return [
+            {field: item.get(field) for field in fields} if isinstance(item, dict) else item
+            for item in data
+        ]
+
+    paths = [(field, field.split(".")) for field in fields]
+    return [
+        {field: _get_path(item, path) for field, path in paths}
+        if isinstance(item, dict) else item
+        for item in data
+    ]
+
+
+def to_compact(items: list[Any]) -> dict[str, Any] | list[Any]:
+    """
+    Encode a list of records as a column header plus row arrays.
+
+    Args:
+        items: List of dicts sharing (mostly) the same keys.
+
+    Returns:
+        {"columns": [...], "rows": [[...], ...]}, or the list unchanged
+        when it does not contain dicts.
+    """
+    if not items or not all(isinstance(item, dict) for item in items):
+        return items
+
+    # Union of keys in first-seen order, so sparse records still line up
+    columns: dict[str, None] = {}
+    uniform = True
+    first_keys = items[0].keys()
+    for item in items:
+        keys = item.keys()
+        if keys != first_keys:
+            uniform = False
+        for key in keys:
+            columns.setdefault(key, None)
+
+    header = list(columns)
+    if uniform and len(header) > 1:
+        # Every record has the same keys: let itemgetter build the rows in C
+        rows: list[Any] = list(map(itemgetter(*header), items))
+    else:
+        rows = [[item.get(key) for key in header] for item in items]
+
+    return {"columns": header, "rows": rows}
+
+
+def shape_data(
+    data: Any,
+    fields: list[str] | None = None,
+    response_format: str = "json",
+) -> Any:
+    """
+    Apply field projection and the requested encoding to response data.
+
+    In compact format a list of records becomes a table. For a single
+    record, any top-level list of records (e.g. a tracking manifest) is
+    encoded as a table instead.
+
+    Args:
+        data: The response data.
+        fields: Optional keys to keep.
+        response_format: One of RESPONSE_FORMATS.
+
+    Returns:
+        Shaped data.
+    """
+    data = project_fields(data, fields)
+
+    if response_format != "compact":
+        return data
+
+    if isinstance(data, list):
+        return to_compact(data)
+
+    if isinstance(data, dict):
+        return {
+            key: to_compact(value) if isinstance(value, list) else value
+            for key, value in data.items()
+        }
+
+    return data
+
 
 def success_response(
     data: Any,
     message: str | None = None,
     meta: dict[str, Any] | None = None,
+    fields: list[str] | None = None,
+    response_format: str = "json",
 ) -> dict[str, Any]:
     """
     Create a standardized success response.
@@ -19,15 +151,21 @@ def success_response(
         data: The response data.
         message: Optional success message.
         meta: Optional metadata (count, pagination, etc).
+        fields: Optional keys to keep in each record.
+        response_format: 'json' (default) or 'compact' (columns + rows).
 
     Returns:
         Formatted success response dictionary.
     """
     response: dict[str, Any] = {
         "success": True,
-        "data": data,
+        "data": shape_data(data, fields, response_format),
     }
 
+    if response_format != "json":
+        # Tell the caller how to read "data"
+        meta = {**(meta or {}), "format": response_format}
+
     if message:
         response["message"] = message
 
@@ -70,22 +208,78 @@ def error_response(
 def list_response(
     items: list[Any],
     item_name: str = "items",
+    fields: list[str] | None = None,
+    response_format: str = "json",
+    page_size: int | None = None,
+    key: Hashable | None = None,
 ) -> dict[str, Any]:
     """
     Create a standardized list response with count.
 
+    Lists longer than the page size are split: the first page is returned
+    with a `next_cursor` in meta and the full list is kept in the result
+    store, so get_next_page() can serve the rest from memory.
+
     Args:
         items: List of items.
         item_name: Name of the items for the message.
+        fields: Optional keys to keep in each item.
+        response_format: 'json' (default) or 'compact' (columns + rows).
+        page_size: Max items per response. Defaults to LIST_PAGE_SIZE,
+            0 disables paging.
+        key: Identity of the data version of `items`, if known; repeated
+            calls with the same key share one stored result.
 
     Returns:
         Formatted list response with count metadata.
     """
+    if page_size is None:
+        page_size = settings.LIST_PAGE_SIZE
+
     count = len(items)
+    if page_size <= 0 or count <= page_size:
+        return success_response(
+            data=items,
+            message=f"Found {count} {item_name}",
+            meta={"count": count},
+            fields=fields,
+            response_format=response_format,
+        )
+
+    token, stored = result_store.put(items, item_name, fields, response_format, page_size, key)
+    return page_response(token, stored, offset=0)
+
+
+def page_response(
+    token: str,
+    stored: StoredResult,
+    offset: int,
+) -> dict[str, Any]:
+    """
+    Create a list response for one page of a stored result.
+
+    Args:
+        token: Result store token of the full list.
+        stored: The stored result.
+        offset: Index of the first item of the page.
+
+    Returns:
+        Formatted list response with paging metadata.
+    """
+    total = len(stored.items)
+    page = stored.items[offset:offset + stored.page_size]
+    end = offset + len(page)
+
+    meta: dict[str, Any] = {"count": len(page), "total": total, "offset": offset}
+    if end < total:
+        meta["next_cursor"] = make_cursor(token, end)
+
     return success_response(
-        data=items,
-        message=f"Found {count} {item_name}",
-        meta={"count": count},
+        data=page,
+        message=f"Found {total} {stored.item_name}, showing {offset + 1}-{end}",
+        meta=meta,
+        fields=stored.fields,
+        response_format=stored.response_format,
     )
 
 
@@ -113,3 +307,124 @@ def extract_api_data(
 
     # If no known key found, return the whole response
     return api_response
+
+
+# ============================================================================
+# Pre-encoded responses
+# ============================================================================
+
+class FrozenDict(dict):
+    """A dict that raises TypeError on any change."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+class EncodedResponse(FrozenDict):
+    """
+    A response dict with its MCP tool result built once.
+
+    For Python callers it is the response dict, read-only along with its
+    meta: it is shared by every caller the response cache serves, and a
+    change would not reach the encoded text anyway. The MCP registration
+    wrapper (instrument_tool) passes `tool_result` to FastMCP, which sends
+    a CallToolResult as is: the indented JSON text, the structured content
+    dump and the output schema check are all skipped.
+    """
+
+    __slots__ = ("tool_result", "size")
+
+    tool_result: CallToolResult
+    size: int
+
+
+def response_text(response: dict[str, Any]) -> str:
+    """The text content FastMCP sends for a tool returning this dict."""
+    return pydantic_core.to_json(response, fallback=str, indent=2).decode()
+
+
+def encode_response(response: dict[str, Any], text: str | None = None) -> EncodedResponse:
+    """
+    Encode a response the way FastMCP would for a tool returning a dict.
+
+    The text content is byte-for-byte what FastMCP produces, and the
+    structured content is the response itself.
+
+    Args:
+        response: The response dict.
+        text: Its response_text(), if already encoded elsewhere.
+    """
+    if text is None:
+        text = response_text(response)
+    meta = response.get("meta")
+    encoded = EncodedResponse(response if meta is None else {**response, "meta": FrozenDict(meta)})
+    encoded.tool_result = CallToolResult(
+        content=[TextContent(type="text", text=text)],
+        structuredContent=response,
+    )
+    encoded.size = len(text)
+    return encoded
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded responses.
+
+    Keys must identify the version of the cached data as well as the
+    projection and format options (fields, response_format), so a key is
+    never served stale: new data gets a new key, and old entries age out.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 2**20) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, EncodedResponse] = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> EncodedResponse | None:
+        """Cached response for a key, None on a miss."""
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+        return encoded
+
+    def put(self, key: Hashable, response: dict[str, Any]) -> EncodedResponse:
+        """
+        Encode and cache a response (kept as is if already encoded).
+
+        Returns:
+            The encoded response (also when too large to keep).
+        """
+        encoded = response if isinstance(response, EncodedResponse) else encode_response(response)
+        if not self.enabled or encoded.size > self.max_bytes:
+            return encoded
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._entries[key] = encoded
+        self._bytes += encoded.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+        return encoded
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Entry count and encoded bytes held."""
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+# Global response cache instance
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
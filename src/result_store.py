@@ -0,0 +1,175 @@
+"""
+Result Store Module
+===================
+Short-lived in-memory store for oversized list results.
+
+When a list is larger than the configured page size, the first page is
+returned to the caller and the full list is kept here under an opaque
+cursor. Later pages are served from memory instead of refetching and
+re-parsing the upstream response.
+
+Results of a known data version (e.g. a location list served from the
+location tree) are stored under that version and the paging options, so
+repeated listings share one entry and one set of cursors instead of
+storing another copy each time.
+
+In multi-tenant mode a stored result belongs to the tenant that listed
+it; other tenants' cursors for it are treated as unknown.
+"""
+
+import secrets
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any
+
+from .config import settings
+from .metrics import CACHE_REQUESTS
+from .tenants import tenant_namespace
+from .tracing import current_span
+
+
+@dataclass
+class StoredResult:
+    """A list result kept for paging."""
+
+    items: list[Any]
+    item_name: str
+    fields: list[str] | None
+    response_format: str
+    page_size: int
+    expires_at: float
+    tenant: str = ""
+    key: Hashable | None = None
+
+
+class ResultStore:
+    """
+    TTL + LRU bounded store of list results, keyed by random tokens.
+
+    Cursors have the form '<token>.<offset>'. They are opaque to callers;
+    the offset only selects a page within the stored result. Results put
+    with a key are also indexed by it, with the tenant and the options.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        """Initialize an empty store."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, StoredResult] = OrderedDict()
+        self._tokens: dict[Hashable, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, token: str) -> None:
+        entry = self._entries.pop(token)
+        if entry.key is not None:
+            self._tokens.pop(entry.key, None)
+
+    def _purge_expired(self, now: float) -> None:
+        """Drop expired entries (oldest first, stops at the first live one)."""
+        while self._entries:
+            token, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            self._drop(token)
+
+    def put(
+        self,
+        items: list[Any],
+        item_name: str,
+        fields: list[str] | None,
+        response_format: str,
+        page_size: int,
+        key: Hashable | None = None,
+    ) -> tuple[str, StoredResult]:
+        """
+        Store a list result.
+
+        Args:
+            key: Identity of the data version of `items`, if known. A live
+                entry of the same key, tenant and options is reused (and
+                its lifetime extended) instead of storing a copy.
+
+        Returns:
+            Tuple of (token identifying the stored result, the stored result).
+        """
+        now = time.monotonic()
+        self._purge_expired(now)
+
+        tenant = tenant_namespace()
+        if key is not None:
+            key = (tenant, key, tuple(fields or ()), response_format, page_size)
+            token = self._tokens.get(key)
+            if token is not None:
+                entry = self._entries[token]
+                entry.expires_at = now + self.ttl
+                self._entries.move_to_end(token)
+                return token, entry
+
+        while self._entries and len(self._entries) >= self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+        token = secrets.token_urlsafe(12)
+        entry = self._entries[token] = StoredResult(
+            items=items,
+            item_name=item_name,
+            fields=fields,
+            response_format=response_format,
+            page_size=page_size,
+            expires_at=now + self.ttl,
+            tenant=tenant,
+            key=key,
+        )
+        if key is not None:
+            self._tokens[key] = token
+        return token, entry
+
+    def get(self, token: str) -> StoredResult | None:
+        """
+        Look up a stored result of the current tenant and extend its lifetime.
+
+        Returns:
+            The stored result, or None if unknown, expired or another
+            tenant's.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(token)
+        if entry is not None and entry.expires_at <= now:
+            self._drop(token)
+            entry = None
+        if entry is not None and entry.tenant != tenant_namespace():
+            entry = None
+
+        result = "miss" if entry is None else "hit"
+        CACHE_REQUESTS.inc(("result_store", result))
+        current_span().set_attribute("cache", result)
+        if entry is None:
+            return None
+
+        # Entries are ordered by expiry, so a refreshed entry moves to the end
+        entry.expires_at = now + self.ttl
+        self._entries.move_to_end(token)
+        return entry
+
+
+def make_cursor(token: str, offset: int) -> str:
+    """Build an opaque cursor for the page starting at `offset`."""
+    return f"{token}.{offset}"
+
+
+def parse_cursor(cursor: str) -> tuple[str, int] | None:
+    """Split a cursor into (token, offset), or None if malformed."""
+    token, _, offset = cursor.strip().rpartition(".")
+    if not token or not offset.isdigit():
+        return None
+    return token, int(offset)
+
+
+# Global result store instance
+result_store = ResultStore(
+    ttl=settings.RESULT_STORE_TTL,
+    max_entries=settings.RESULT_STORE_MAX_ENTRIES,
+)
@@ -0,0 +1,187 @@
+"""
+Scheduler Module
+================
+Priority classes for upstream requests and the weighted fair queue in
+front of the upstream concurrency limit.
+
+Every upstream request belongs to a class:
+
+- quote: interactive cost quotes (a customer waiting at checkout)
+- lookup: interactive searches, location lists and tracking
+- bulk: exports, crawls and other background work
+
+Tools declare their class with @priority; instrument_tool runs each call
+in its tool's class (TOOL_PRIORITIES overrides it per tool). Requests
+made outside a tool call, such as the location refresh crawl, are bulk.
+
+When all MAX_CONCURRENT_REQUESTS slots are busy, requests queue per
+class and freed slots are handed out by stride scheduling: each class
+advances its own virtual clock by 1/weight per slot (SCHEDULER_WEIGHTS,
+default quote=8, lookup=4, bulk=1), and the class with the earliest
+clock goes next. Under contention the classes share slots in
+proportion to their weights, and a class that was idle cannot bank
+credit. A request waiting longer than SCHEDULER_MAX_WAIT_MS goes next
+regardless of class, so bulk work always progresses.
+
+Queue times per class are in rajaongkir_scheduler_queue_seconds.
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+from .config import settings
+from .metrics import SCHEDULER_AGED, SCHEDULER_QUEUE_TIME, SCHEDULER_QUEUED
+
+CLASSES = ("quote", "lookup", "bulk")
+DEFAULT_WEIGHTS = {"quote": 8.0, "lookup": 4.0, "bulk": 1.0}
+
+# Class of a tool that does not declare one
+TOOL_DEFAULT_CLASS = "lookup"
+# Class of requests made outside tool calls
+BACKGROUND_CLASS = "bulk"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_current: ContextVar[str] = ContextVar("rajaongkir_priority", default=BACKGROUND_CLASS)
+
+
+def priority(request_class: str) -> Callable[[F], F]:
+    """
+    Declare the priority class of a tool's upstream requests.
+
+    Example:
+        >>> @priority("quote")
+        ... async def calculate_domestic_cost(...): ...
+    """
+    if request_class not in CLASSES:
+        raise ValueError(f"Unknown priority class {request_class!r}, expected one of {CLASSES}")
+
+    def decorate(fn: F) -> F:
+        fn.priority_class = request_class  # type: ignore[attr-defined]
+        return fn
+
+    return decorate
+
+
+def priority_for(tool: str, fn: Callable[..., Any]) -> str:
+    """Class of a tool: its TOOL_PRIORITIES entry, its @priority or lookup."""
+    request_class = settings.TOOL_PRIORITIES.get(tool) or getattr(fn, "priority_class", TOOL_DEFAULT_CLASS)
+    return request_class if request_class in CLASSES else TOOL_DEFAULT_CLASS
+
+
+@contextmanager
+def priority_scope(request_class: str) -> Iterator[None]:
+    """Run a block's upstream requests in a priority class."""
+    token = _current.set(request_class)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_priority() -> str:
+    """Priority class of the current upstream request."""
+    return _current.get()
+
+
+class FairScheduler:
+    """
+    Concurrency limit with one weighted fair queue per priority class.
+
+    acquire() takes a slot (waiting in its class's queue if none is free)
+    and release() returns it. A cancelled acquire() leaves the queue, or
+    gives back the slot it was just granted.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        weights: dict[str, float] | None = None,
+        max_wait_ms: float = 2000.0,
+    ) -> None:
+        self.capacity = capacity
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.strides = {cls: 1.0 / max(weights[cls], 1e-3) for cls in CLASSES}
+        self.max_wait = max_wait_ms / 1000
+        self.in_use = 0
+        self._queues: dict[str, deque[tuple[asyncio.Future[None], float]]] = {cls: deque() for cls in CLASSES}
+        self._pass = dict.fromkeys(CLASSES, 0.0)
+        self._vtime = 0.0
+
+    def queued(self) -> dict[str, int]:
+        return {cls: len(queue) for cls, queue in self._queues.items()}
+
+    async def acquire(self, request_class: str = BACKGROUND_CLASS) -> None:
+        """Take one slot for a request of `request_class`."""
+        start = time.monotonic()
+        if self.in_use < self.capacity and not any(self._queues.values()):
+            self.in_use += 1
+            SCHEDULER_QUEUE_TIME.observe((request_class,), 0.0)
+            return
+
+        queue = self._queues[request_class]
+        if not queue:
+            # A class that was idle starts at the current virtual time
+            self._pass[request_class] = max(self._pass[request_class], self._vtime)
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (waiter, start)
+        queue.append(entry)
+        SCHEDULER_QUEUED.inc((request_class,))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted and cancelled in the same step: hand the slot on
+                self.release()
+            elif entry in queue:
+                # Otherwise _dispatch() may already have dropped the cancelled waiter
+                queue.remove(entry)
+                SCHEDULER_QUEUED.dec((request_class,))
+            raise
+        SCHEDULER_QUEUE_TIME.observe((request_class,), time.monotonic() - start)
+
+    def release(self) -> None:
+        """Return a slot and grant it to the next waiter, if any."""
+        self.in_use -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiters in fair order."""
+        while self.in_use < self.capacity:
+            request_class = self._next_class()
+            if request_class is None:
+                return
+            waiter, _ = self._queues[request_class].popleft()
+            SCHEDULER_QUEUED.dec((request_class,))
+            if waiter.cancelled():
+                continue
+            self._vtime = self._pass[request_class]
+            self._pass[request_class] += self.strides[request_class]
+            self.in_use += 1
+            waiter.set_result(None)
+
+    def _next_class(self) -> str | None:
+        """The class whose head waiter goes next: an overdue one, else the earliest clock."""
+        now = time.monotonic()
+        overdue: str | None = None
+        overdue_since = now
+        best: str | None = None
+        for cls in CLASSES:
+            queue = self._queues[cls]
+            if not queue:
+                continue
+            enqueued = queue[0][1]
+            if self.max_wait and now - enqueued >= self.max_wait and enqueued < overdue_since:
+                overdue, overdue_since = cls, enqueued
+            if best is None or self._pass[cls] < self._pass[best]:
+                best = cls
+        if overdue is not None and overdue != best:
+            SCHEDULER_AGED.inc((overdue,))
+            return overdue
+        return best
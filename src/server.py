@@ -2,11 +2,27 @@
 MCP Server Module
 =================
 FastMCP server initialization and tool registration.
+
+Transports:
+    stdio            One process per MCP client (default).
+    streamable-http  One deployment serving many sessions, optionally with
+    sse              several worker processes (RAJAONGKIR_WORKERS).
 """
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import anyio
 from mcp.server.fastmcp import FastMCP
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
+from . import lifecycle
 from .config import settings
+from .exceptions import ConfigurationError
+from .instrument import instrument_tool
+from .metrics import registry, serve_metrics
 from .tools import (
     # Search Method
     calculate_domestic_cost,
@@ -21,34 +37,159 @@ from .tools import (
     calculate_district_cost,
     # Tracking
     track_package,
+    # Paging
+    get_next_page,
+    # History
+    query_history,
+    # Export
+    export_quotes,
+    # Observability
+    get_api_key_usage,
+    get_quota_status,
+    get_server_metrics,
 )
 
+TRANSPORTS = ["stdio", "streamable-http", "sse"]
+
 # Initialize FastMCP server
-mcp = FastMCP(settings.SERVER_NAME)
+mcp = FastMCP(
+    settings.SERVER_NAME,
+    host=settings.HOST,
+    port=settings.PORT,
+    # MCP sessions cannot follow a client across worker processes; nothing
+    # else a call leaves behind may either (list paging is off, see config)
+    stateless_http=settings.WORKERS > 1,
+)
 
 # ============================================================================
 # Register Search Method Tools
 # ============================================================================
-mcp.tool()(search_domestic_destination)
-mcp.tool()(search_international_destination)
-mcp.tool()(calculate_domestic_cost)
-mcp.tool()(calculate_international_cost)
+mcp.tool()(instrument_tool(search_domestic_destination))
+mcp.tool()(instrument_tool(search_international_destination))
+mcp.tool()(instrument_tool(calculate_domestic_cost))
+mcp.tool()(instrument_tool(calculate_international_cost))
 
 # ============================================================================
 # Register Step-by-Step Method Tools (Hierarchical Location)
 # ============================================================================
-mcp.tool()(get_provinces)
-mcp.tool()(get_cities)
-mcp.tool()(get_districts)
-mcp.tool()(get_subdistricts)
-mcp.tool()(calculate_district_cost)
+mcp.tool()(instrument_tool(get_provinces))
+mcp.tool()(instrument_tool(get_cities))
+mcp.tool()(instrument_tool(get_districts))
+mcp.tool()(instrument_tool(get_subdistricts))
+mcp.tool()(instrument_tool(calculate_district_cost))
 
 # ============================================================================
 # Register Tracking Tool
 # ============================================================================
-mcp.tool()(track_package)
+mcp.tool()(instrument_tool(track_package))
+
+# ============================================================================
+# Register Paging Tool
+# ============================================================================
+mcp.tool()(instrument_tool(get_next_page))
+
+# ============================================================================
+# Register History Tool
+# ============================================================================
+mcp.tool()(instrument_tool(query_history))
+
+# ============================================================================
+# Register Export Tool
+# ============================================================================
+mcp.tool()(instrument_tool(export_quotes))
+
+# ============================================================================
+# Register Observability Tools and Resource
+# ============================================================================
+mcp.tool()(instrument_tool(get_server_metrics))
+mcp.tool()(instrument_tool(get_api_key_usage))
+mcp.tool()(instrument_tool(get_quota_status))
+
+
+@mcp.resource("metrics://prometheus", mime_type="text/plain")
+def prometheus_metrics() -> str:
+    """Server metrics in Prometheus text exposition format."""
+    return registry.render_prometheus()
+
+
+# ============================================================================
+# HTTP Endpoints
+# ============================================================================
+
+@mcp.custom_route("/healthz", methods=["GET"])
+async def healthz(request: Request) -> JSONResponse:
+    """Liveness probe for load balancers and orchestrators."""
+    return JSONResponse({"status": "ok"})
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(
+        registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def create_http_app() -> Starlette:
+    """
+    Create the ASGI app for the configured HTTP transport.
+
+    Used as a uvicorn factory, so every worker process builds its own app
+    and runs the lifecycle hooks inside its ASGI lifespan.
+    """
+    app = mcp.sse_app() if settings.TRANSPORT == "sse" else mcp.streamable_http_app()
+    transport_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def app_lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with lifecycle.lifespan():
+            async with transport_lifespan(app):
+                yield
+
+    app.router.lifespan_context = app_lifespan
+    return app
+
+
+async def _run_stdio() -> None:
+    """Serve one MCP session over stdio."""
+    async with lifecycle.lifespan():
+        metrics_server = None
+        if settings.METRICS_PORT:
+            # No HTTP app in stdio mode: expose /metrics on a local port
+            metrics_server = await serve_metrics(settings.METRICS_HOST, settings.METRICS_PORT)
+        try:
+            await mcp.run_stdio_async()
+        finally:
+            if metrics_server is not None:
+                metrics_server.close()
+
+
+def _run_http() -> None:
+    """Serve MCP over HTTP with uvicorn, one app per worker process."""
+    import uvicorn
+
+    uvicorn.run(
+        "src.server:create_http_app",
+        factory=True,
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=max(settings.WORKERS, 1),
+        # On SIGTERM/SIGINT stop accepting, then let in-flight calls finish
+        timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT,
+        lifespan="on",
+    )
 
 
 def run_server() -> None:
-    """Run the MCP server."""
-    mcp.run()
+    """Run the MCP server with the configured transport."""
+    if settings.TRANSPORT not in TRANSPORTS:
+        raise ConfigurationError(
+            message=f"Unknown transport: {settings.TRANSPORT}",
+            detail=f"Set RAJAONGKIR_TRANSPORT to one of: {', '.join(TRANSPORTS)}",
+        )
+
+    if settings.TRANSPORT == "stdio":
+        anyio.run(_run_stdio)
+    else:
+        _run_http()
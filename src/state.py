@@ -0,0 +1,192 @@
+"""
+State Module
+============
+Loading and atomic saving of the small JSON state files kept in DATA_DIR
+(learned courier detection, the courier-lane matrix).
+
+A state file carries a `version`; files of another version are ignored so
+a format change starts from scratch instead of failing. Saves go to a
+uniquely named temporary file that replaces the old one, so a crash never
+leaves a half-written file behind and concurrent writers never share one.
+
+Counters that several worker processes add to (daily API usage) are
+saved with update_state(), which reads, merges and writes the file under
+an exclusive lock on `<path>.lock`, so no worker's counts are lost.
+Taking that lock can block, so request handlers only count in memory:
+usage_sync exchanges the counts with the file every SYNC_INTERVAL
+seconds from a background task, doing the file work on a thread, and
+once more at shutdown.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any
+
+from .lifecycle import on_shutdown, on_startup
+
+try:
+    import fcntl
+except ImportError:  # Windows: one worker process only
+    fcntl = None  # type: ignore[assignment]
+
+# Seconds between exchanges of usage counts with the other workers
+SYNC_INTERVAL = 10.0
+
+SyncFunction = Callable[[], Awaitable[None]]
+
+
+def load_state(path: str, version: int) -> dict[str, Any] | None:
+    """
+    Read a JSON state file.
+
+    Args:
+        path: File path; empty means persistence is disabled.
+        version: Expected `version` value.
+
+    Returns:
+        The state, or None if the file is missing, unreadable or of
+        another version.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  WARNING: ignoring state file {path}: {e}", file=sys.stderr)
+        return None
+    if not isinstance(state, dict) or state.get("version") != version:
+        return None
+    return state
+
+
+def save_state(path: str, state: dict[str, Any]) -> bool:
+    """
+    Write a JSON state file atomically.
+
+    Args:
+        path: File path; empty means persistence is disabled.
+        state: JSON-serializable state including its `version`.
+
+    Returns:
+        True if the file was written.
+    """
+    if not path:
+        return False
+    try:
+        _write(path, state)
+        return True
+    except OSError as e:
+        print(f"⚠️  WARNING: could not save state file {path}: {e}", file=sys.stderr)
+        return False
+
+
+def update_state(
+    path: str,
+    version: int,
+    merge: Callable[[dict[str, Any] | None], dict[str, Any]],
+) -> dict[str, Any] | None:
+    """
+    Read, merge and write a JSON state file under an exclusive lock.
+
+    Args:
+        path: File path; empty means persistence is disabled.
+        version: Expected `version` value of the current file.
+        merge: Builds the new state (including its `version`) from the
+            current one, None if there is none.
+
+    Returns:
+        The state written, or None if it could not be written.
+    """
+    if not path:
+        return None
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _locked(path):
+            state = merge(load_state(path, version))
+            _write(path, state)
+        return state
+    except OSError as e:
+        print(f"⚠️  WARNING: could not save state file {path}: {e}", file=sys.stderr)
+        return None
+
+
+@contextlib.contextmanager
+def _locked(path: str) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _write(path: str, state: dict[str, Any]) -> None:
+    """Write `state` to a unique temporary file and move it over `path`."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+class PeriodicSync:
+    """Background task running sync coroutines every `interval` seconds."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._syncs: list[SyncFunction] = []
+        self._task: asyncio.Task[None] | None = None
+
+    def add(self, sync: SyncFunction) -> None:
+        """Run `sync` on every round (and at shutdown)."""
+        self._syncs.append(sync)
+
+    async def run_once(self) -> None:
+        """Run every sync once; a failing one is reported and skipped."""
+        for sync in list(self._syncs):
+            try:
+                await sync()
+            except Exception as e:
+                print(f"⚠️  WARNING: {getattr(sync, '__qualname__', sync)} failed: {e}", file=sys.stderr)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    async def start(self) -> None:
+        """Start the background task on the running loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the task and sync one last time."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.run_once()
+
+
+# Usage counters shared by the worker processes (key pool, quota, tenants)
+usage_sync = PeriodicSync(SYNC_INTERVAL)
+on_startup(usage_sync.start)
+on_shutdown(usage_sync.stop)
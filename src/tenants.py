@@ -0,0 +1,394 @@
+"""
+Tenants Module
+==============
+Serves several merchants from one deployment, each with its own keys and
+limits.
+
+Tenants are defined in RAJAONGKIR_TENANTS_FILE:
+
+    {
+      "tenants": {
+        "toko-a": {
+          "tokens": ["<secret sent by toko-a's MCP client>"],
+          "api_keys": ["<rajaongkir key>=1000"],
+          "rate_per_minute": 120,
+          "daily_quota": 5000,
+          "max_concurrent": 10
+        }
+      }
+    }
+
+Over HTTP a call belongs to the tenant whose token it sends as
+`Authorization: Bearer <token>` (or `X-Tenant-Token`); calls without a
+known token are refused with UNKNOWN_TENANT. A stdio session belongs to
+RAJAONGKIR_TENANT, or to the only tenant of the file. Without a tenants
+file there is a single anonymous tenant and nothing changes.
+
+Each tenant gets its own client (see client.get_client):
+
+- its own key pool when it lists `api_keys`; otherwise it shares the
+  deployment's RAJAONGKIR_API_KEY(S) pool
+- `rate_per_minute` upstream requests, with bursts of up to ten
+  seconds' worth; a request waits for its turn if that is before the
+  call's deadline and is refused with 429 otherwise
+- `daily_quota` upstream requests per day (WIB), counted in memory and
+  exchanged with the other worker processes through TENANT_USAGE_FILE
+  every state.SYNC_INTERVAL seconds (see state.usage_sync)
+- at most `max_concurrent` upstream requests in flight, so a busy tenant
+  cannot hold every slot of MAX_CONCURRENT_REQUESTS
+
+Limits a tenant does not set default to the TENANT_* settings. Tenants
+share the HTTP connection pool and public location data (hierarchy
+cache, snapshot, response cache); stored list pages and export files are
+kept per tenant.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from mcp.server.lowlevel.server import request_ctx
+
+from .config import settings
+from .deadline import remaining
+from .exceptions import APIError, ConfigurationError, TenantError
+from .key_pool import quota_day
+from .metrics import TENANT_REQUESTS, TENANT_THROTTLED
+from .state import load_state, update_state, usage_sync
+
+STATE_VERSION = 1
+
+# Rate limit bursts: this many seconds' worth of requests
+BURST_SECONDS = 10.0
+
+TENANT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A tenant and its limits (0 = unlimited)."""
+
+    name: str
+    api_keys: tuple[str, ...] = ()
+    rate_per_minute: float = 0.0
+    daily_quota: int = 0
+    max_concurrent: int = 0
+
+
+def _fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TenantLimiter:
+    """Request rate and daily quota of one tenant."""
+
+    def __init__(self, tenant: Tenant) -> None:
+        self.tenant = tenant
+        self.refill = tenant.rate_per_minute / 60
+        self.capacity = max(self.refill * BURST_SECONDS, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.day = ""
+        self.used_today = 0
+        self.throttled = 0
+        # Requests of this process not yet added to the usage file
+        self.unsaved = 0
+
+    def _roll(self, now: float) -> None:
+        day = quota_day(now)
+        if day != self.day:
+            self.day, self.used_today, self.unsaved = day, 0, 0
+
+    def _refuse(self, reason: str, message: str, detail: str) -> APIError:
+        self.throttled += 1
+        TENANT_THROTTLED.inc((self.tenant.name, reason))
+        return APIError(message=message, status_code=429, detail=detail)
+
+    async def acquire(self) -> None:
+        """
+        Admit one upstream request, waiting for the rate limit if needed.
+
+        Raises:
+            APIError: 429 if the daily quota is used up, or the rate limit
+                would make the call wait past its deadline.
+        """
+        tenant = self.tenant
+        self._roll(time.time())
+        if tenant.daily_quota and self.used_today >= tenant.daily_quota:
+            raise self._refuse(
+                "quota",
+                "Tenant daily quota exhausted",
+                f"Tenant '{tenant.name}' has used its {tenant.daily_quota} upstream requests for today; "
+                "the quota resets at midnight WIB.",
+            )
+
+        wait = 0.0
+        if self.refill:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill)
+            self.updated = now
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.refill
+                left = remaining()
+                if wait >= (settings.REQUEST_TIMEOUT if left is None else left):
+                    raise self._refuse(
+                        "rate",
+                        "Tenant rate limit exceeded",
+                        f"Tenant '{tenant.name}' is limited to {tenant.rate_per_minute:g} upstream requests "
+                        f"per minute; retry in {wait:.1f}s.",
+                    )
+            # Reserve the token now, so waiting requests go in turn
+            self.tokens -= 1
+
+        self.used_today += 1
+        self.unsaved += 1
+        TENANT_REQUESTS.inc((tenant.name,))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def usage(self) -> dict[str, Any]:
+        self._roll(time.time())
+        tenant = self.tenant
+        return {
+            "tenant": tenant.name,
+            "used_today": self.used_today,
+            "daily_quota": tenant.daily_quota or None,
+            "remaining_today": max(tenant.daily_quota - self.used_today, 0) if tenant.daily_quota else None,
+            "rate_per_minute": tenant.rate_per_minute or None,
+            "max_concurrent": tenant.max_concurrent,
+            "throttled": self.throttled,
+            "own_api_keys": bool(tenant.api_keys),
+        }
+
+
+class TenantRegistry:
+    """Tenants of the deployment, and which one a call belongs to."""
+
+    def __init__(
+        self,
+        path: str = "",
+        stdio_tenant: str | None = None,
+        usage_path: str = "",
+    ) -> None:
+        self.path = path
+        self.stdio_tenant = stdio_tenant
+        self.usage_path = usage_path
+        self.tenants: dict[str, Tenant] = {}
+        self._tokens: dict[str, str] = {}
+        self._limiters: dict[str, TenantLimiter] = {}
+        self._saved: dict[str, Any] = {}
+        self._loaded_usage = False
+        if path:
+            self.load(path)
+
+    @property
+    def enabled(self) -> bool:
+        """True in multi-tenant mode."""
+        return bool(self.tenants)
+
+    def load(self, path: str) -> None:
+        """
+        Read the tenants file.
+
+        Raises:
+            ConfigurationError: If the file is missing or invalid. A
+                broken tenants file must not fall back to serving everyone
+                with the deployment's keys.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f).get("tenants")
+        except (OSError, ValueError, AttributeError) as e:
+            raise ConfigurationError(message="Cannot read tenants file", detail=f"{path}: {e}")
+        if not isinstance(entries, dict) or not entries:
+            raise ConfigurationError(
+                message="Invalid tenants file",
+                detail=f"{path}: expected a non-empty 'tenants' object.",
+            )
+
+        for name, entry in entries.items():
+            if not TENANT_NAME.match(name) or not isinstance(entry, dict):
+                raise ConfigurationError(
+                    message="Invalid tenants file",
+                    detail=f"{path}: tenant '{name}' needs a name of letters, digits, '.', '_' or '-' and an object.",
+                )
+            try:
+                tenant = Tenant(
+                    name=name,
+                    api_keys=tuple(str(key).strip() for key in entry.get("api_keys", ()) if str(key).strip()),
+                    rate_per_minute=max(0.0, float(entry.get("rate_per_minute", settings.TENANT_RATE_PER_MINUTE))),
+                    daily_quota=max(0, int(entry.get("daily_quota", settings.TENANT_DAILY_QUOTA))),
+                    max_concurrent=max(1, int(entry.get("max_concurrent", settings.TENANT_MAX_CONCURRENT))),
+                )
+            except (TypeError, ValueError) as e:
+                raise ConfigurationError(message="Invalid tenants file", detail=f"{path}: tenant '{name}': {e}")
+            self.tenants[name] = tenant
+            for token in entry.get("tokens", ()):
+                fingerprint = _fingerprint(str(token))
+                if fingerprint in self._tokens:
+                    raise ConfigurationError(
+                        message="Invalid tenants file",
+                        detail=f"{path}: a token of tenant '{name}' is also used by '{self._tokens[fingerprint]}'.",
+                    )
+                self._tokens[fingerprint] = name
+
+        if self.stdio_tenant is not None and self.stdio_tenant not in self.tenants:
+            raise ConfigurationError(
+                message=f"Unknown tenant: {self.stdio_tenant}",
+                detail=f"RAJAONGKIR_TENANT must name a tenant of {path}.",
+            )
+
+    def resolve(self) -> Tenant | None:
+        """
+        Tenant of the MCP request being handled.
+
+        Returns:
+            The tenant, or None in single-tenant mode.
+
+        Raises:
+            TenantError: If the request does not identify a tenant.
+        """
+        if not self.tenants:
+            return None
+        try:
+            request = request_ctx.get().request
+        except LookupError:
+            request = None
+        headers = getattr(request, "headers", None)
+
+        if headers is None:
+            # stdio: the session is the operator's own
+            name = self.stdio_tenant or (next(iter(self.tenants)) if len(self.tenants) == 1 else None)
+            if name is None:
+                raise TenantError(
+                    message="No tenant for this session",
+                    detail="Set RAJAONGKIR_TENANT to serve a stdio session in multi-tenant mode.",
+                )
+            return self.tenants[name]
+
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        token = credentials.strip() if scheme.lower() == "bearer" else headers.get("x-tenant-token", "").strip()
+        name = self._tokens.get(_fingerprint(token)) if token else None
+        if name is None:
+            raise TenantError(
+                message="Unknown tenant",
+                detail="Send your tenant token as 'Authorization: Bearer <token>' or 'X-Tenant-Token'.",
+            )
+        return self.tenants[name]
+
+    def limiter(self, tenant: Tenant) -> TenantLimiter:
+        """The rate and quota limiter of a tenant."""
+        self._ensure_loaded()
+        limiter = self._limiters.get(tenant.name)
+        if limiter is None:
+            limiter = self._limiters[tenant.name] = TenantLimiter(tenant)
+            saved = self._saved.get(tenant.name)
+            if saved and saved.get("day") == quota_day(time.time()):
+                limiter.day, limiter.used_today = saved["day"], int(saved.get("used", 0))
+        return limiter
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded_usage:
+            return
+        self._loaded_usage = True
+        state = load_state(self.usage_path, STATE_VERSION)
+        if state is not None:
+            self._saved = state.get("tenants", {})
+
+    @staticmethod
+    def _merge(state: dict[str, Any] | None, unsaved: dict[str, tuple[str, int]]) -> dict[str, Any]:
+        """The usage file with this process's unsaved requests added."""
+        counts = dict(state.get("tenants", {})) if state is not None else {}
+        for name, (day, count) in unsaved.items():
+            saved = counts.get(name) or {}
+            saved_day = saved.get("day", "")
+            if saved_day > day:
+                continue  # the other workers are on a newer day already
+            used = int(saved.get("used", 0)) if saved_day == day else 0
+            counts[name] = {"day": day, "used": used + count}
+        return {"version": STATE_VERSION, "tenants": counts}
+
+    def _exchange(self, unsaved: dict[str, tuple[str, int]]) -> dict[str, Any] | None:
+        """File part of sync(): add `unsaved` and return the file's state."""
+        if unsaved:
+            return update_state(self.usage_path, STATE_VERSION, lambda current: self._merge(current, unsaved))
+        return load_state(self.usage_path, STATE_VERSION)
+
+    async def sync(self) -> None:
+        """Add this process's new counts to the usage file and take over the other workers'."""
+        if not self.usage_path:
+            return
+        limiters = list(self._limiters.items())
+        unsaved = {name: (limiter.day, limiter.unsaved) for name, limiter in limiters if limiter.unsaved}
+        for _, limiter in limiters:
+            limiter.unsaved = 0
+        state = await asyncio.to_thread(self._exchange, unsaved)
+        if state is None:
+            for name, limiter in limiters:
+                day, count = unsaved.get(name, ("", 0))
+                if day == limiter.day:
+                    limiter.unsaved += count
+            return
+        self._saved = state.get("tenants", {})
+        now = time.time()
+        for name, limiter in self._limiters.items():
+            limiter._roll(now)
+            saved = self._saved.get(name)
+            if saved and saved.get("day") == limiter.day:
+                # Requests counted while the file was being updated are not in it yet
+                limiter.used_today = int(saved.get("used", 0)) + limiter.unsaved
+
+
+# Global tenant registry instance
+tenant_registry = TenantRegistry(
+    settings.TENANTS_FILE,
+    stdio_tenant=settings.TENANT,
+    usage_path=settings.TENANT_USAGE_FILE,
+)
+usage_sync.add(tenant_registry.sync)
+
+
+# ============================================================================
+# Current tenant
+# ============================================================================
+
+_current: ContextVar[Tenant | None] = ContextVar("rajaongkir_tenant", default=None)
+
+
+@contextmanager
+def tenant_scope(tenant: Tenant | None) -> Iterator[None]:
+    """Run a block on behalf of a tenant (None: single-tenant mode)."""
+    token = _current.set(tenant)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_tenant() -> Tenant | None:
+    """Tenant of the current tool call, None in single-tenant mode."""
+    return _current.get()
+
+
+def tenant_namespace() -> str:
+    """Name of the current tenant, '' in single-tenant mode."""
+    tenant = _current.get()
+    return tenant.name if tenant is not None else ""
+
+
+def tenant_dir(directory: str) -> str:
+    """A tenant's own subdirectory of `directory` (the directory itself in single-tenant mode)."""
+    namespace = tenant_namespace()
+    return os.path.join(directory, namespace) if namespace else directory
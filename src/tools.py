@@ -3,22 +3,76 @@ MCP Tools Module
 ================
 MCP tool definitions for RajaOngkir Komerce API V2.
 
-Tools are organized into 3 categories:
+Tools are organized into 7 categories:
 1. Search Method - Quick search for locations
 2. Step-by-Step Method - Hierarchical location selection
 3. Tracking - Package tracking
+4. Paging - Next pages of large list results
+5. History - Aggregates over recorded quotes and tracking results
+6. Export - Quote tables as CSV or Parquet files
+7. Observability - Server metrics, API key usage and quota status
 """
 
+import asyncio
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import CancelledError
 from typing import Any
 
-from .client import api_client
-from .exceptions import RajaOngkirError
-from .response import error_response, extract_api_data, list_response, success_response
+from .client import get_client
+from .config import settings
+from .courier_detect import courier_detector
+from .estimator import cost_estimator
+from .exceptions import (
+    APIError,
+    DataNotFoundError,
+    DeadlineExceededError,
+    NetworkError,
+    QuotaError,
+    RajaOngkirError,
+    TenantError,
+    ValidationError,
+)
+from .export import (
+    EXPORT_FORMATS,
+    EXPORT_LAYOUTS,
+    Layout,
+    open_sink,
+    parse_columns,
+    quoted_at,
+    write_rows,
+)
+from .history import BUCKETS, history_store
+from .lane_matrix import lane_matrix
+from .location_snapshot import location_snapshot
+from .location_tree import child_list_key, location_tree
+from .metrics import CACHE_REQUESTS, COURIERS_PRUNED, cache_hit_ratios, registry
+from .offload import offload_list_response
+from .quota import CachedPayload
+from .response import (
+    error_response,
+    extract_api_data,
+    list_response,
+    page_response,
+    response_cache,
+    success_response,
+)
+from .result_store import result_store
+from .scheduler import priority
+from .tenants import tenant_dir
+from .tracing import current_span
 from .validators import (
     validate_awb,
+    validate_choice,
     validate_courier,
+    validate_cursor,
+    validate_days,
+    validate_fields,
     validate_id,
     validate_query,
+    validate_response_format,
     validate_weight,
 )
 
@@ -34,16 +88,122 @@ def _handle_error(e: Exception) -> dict[str, Any]:
     )
 
 
+def _label_cached(response: dict[str, Any], api_response: Any) -> dict[str, Any]:
+    """
+    Mark a response built from an answer reused from the upstream cache.
+
+    meta.cached is set with the answer's age; meta.stale is true when it
+    is older than UPSTREAM_CACHE_TTL (reused because the quota is low).
+    """
+    if isinstance(api_response, CachedPayload):
+        # A new dict: responses may be shared (see EncodedResponse)
+        response = {**response, "meta": {
+            **response.get("meta", {}),
+            "cached": True,
+            "cache_age_s": round(api_response.age, 1),
+            "stale": api_response.age > settings.UPSTREAM_CACHE_TTL,
+        }}
+    return response
+
+
+async def _location_list(
+    level: str,
+    parent_id: str | None,
+    fetch: Callable[[], Awaitable[dict[str, Any]]],
+) -> Any:
+    """
+    A child list of the location hierarchy, served locally when possible.
+
+    The published snapshot is read first, then the in-memory location
+    tree. On a miss the list is fetched from upstream and, if it fits the
+    tree, stored for later calls.
+    """
+    snapshot = location_snapshot.current()
+    records = snapshot.children_records(level, parent_id) if snapshot is not None else None
+    source = "snapshot"
+    if records is None and settings.LOCATION_TREE:
+        records = location_tree.children_records(level, parent_id)
+        source = "tree"
+    if snapshot is None and not settings.LOCATION_TREE:
+        return extract_api_data(await fetch())
+
+    result = "miss" if records is None else "hit"
+    CACHE_REQUESTS.inc(("location_tree", result))
+    current_span().set_attributes({"cache": result, "source": source if records is not None else "upstream"})
+    if records is not None:
+        return records
+
+    data = extract_api_data(await fetch())
+    if settings.LOCATION_TREE and data and location_tree.storable(data):
+        location_tree.set_children(level, parent_id, data)
+    return data
+
+
+def _location_version(level: str, parent_id: str | None) -> tuple[Any, ...] | None:
+    """Identity of the locally stored version of a child list, None if not stored."""
+    key = child_list_key(level, parent_id)
+    snapshot = location_snapshot.current()
+    if snapshot is not None and snapshot.child_span(key) is not None:
+        return ("snapshot", snapshot.identity)
+    version = location_tree.list_version(key) if settings.LOCATION_TREE else None
+    return None if version is None else ("tree", *version)
+
+
+async def _location_response(
+    level: str,
+    parent_id: str | None,
+    fetch: Callable[[], Awaitable[dict[str, Any]]],
+    item_name: str,
+    fields: list[str] | None,
+    response_format: str,
+) -> dict[str, Any]:
+    """
+    The list response of a child list, pre-encoded when served locally.
+
+    Responses built from a stored list are kept in the response cache,
+    keyed by the list's version and the projection and format options, so
+    repeated calls skip building and encoding the response. Large whole
+    lists are built and encoded in a worker process (see offload).
+    """
+    version = _location_version(level, parent_id) if response_cache.enabled else None
+    key = (level, parent_id, version, tuple(fields or ()), response_format)
+    if version is not None:
+        cached = response_cache.get(key)
+        CACHE_REQUESTS.inc(("response", "miss" if cached is None else "hit"))
+        if cached is not None:
+            current_span().set_attributes({"cache": "hit", "source": "response"})
+            return cached
+
+    data = await _location_list(level, parent_id, fetch)
+    if not isinstance(data, list):
+        return success_response(data, fields=fields, response_format=response_format)
+    # A stored list is paged from one shared result store entry per version
+    stored = _location_version(level, parent_id)
+    list_key = None if stored is None else ("location", level, parent_id, stored)
+    response = await offload_list_response(data, item_name, fields, response_format, key=list_key)
+    # Paged responses carry a cursor into the short-lived result store
+    if version is not None and "next_cursor" not in response.get("meta", {}):
+        if _location_version(level, parent_id) == version:
+            return response_cache.put(key, response)
+    return response
+
+
 # ============================================================================
 # SEARCH METHOD TOOLS
 # ============================================================================
 
-async def search_domestic_destination(query: str) -> dict[str, Any]:
+async def search_domestic_destination(
+    query: str,
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Search for domestic destinations (cities/districts) in Indonesia.
 
     Args:
         query: Location name to search (minimum 1 character).
+        fields: Optional comma-separated keys to keep (e.g. 'id,name').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         List of matching locations with id, name, province, and postal code.
@@ -53,10 +213,12 @@ async def search_domestic_destination(query: str) -> dict[str, Any]:
     """
     try:
         # Validate input
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_query = validate_query(query, min_length=1)
 
         # Make API request
-        api_response = await api_client.search_domestic_destination(
+        api_response = await get_client().search_domestic_destination(
             query=validated_query,
             limit=20,
             offset=0,
@@ -65,19 +227,27 @@ async def search_domestic_destination(query: str) -> dict[str, Any]:
         # Extract and format response
         data = extract_api_data(api_response)
         if isinstance(data, list):
-            return list_response(data, "domestic destinations")
-        return success_response(data)
+            response = list_response(data, "domestic destinations", validated_fields, validated_format)
+        else:
+            response = success_response(data, fields=validated_fields, response_format=validated_format)
+        return _label_cached(response, api_response)
 
     except Exception as e:
         return _handle_error(e)
 
 
-async def search_international_destination(query: str) -> dict[str, Any]:
+async def search_international_destination(
+    query: str,
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Search for international destinations (countries).
 
     Args:
         query: Country name to search (minimum 1 character).
+        fields: Optional comma-separated keys to keep (e.g. 'id,name').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         List of matching countries with id and country name.
@@ -87,10 +257,12 @@ async def search_international_destination(query: str) -> dict[str, Any]:
     """
     try:
         # Validate input
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_query = validate_query(query, min_length=1)
 
         # Make API request
-        api_response = await api_client.search_international_destination(
+        api_response = await get_client().search_international_destination(
             query=validated_query,
             limit=20,
             offset=0,
@@ -99,8 +271,12 @@ async def search_international_destination(query: str) -> dict[str, Any]:
         # Extract and format response
         data = extract_api_data(api_response)
         if isinstance(data, list):
-            return list_response(data, "international destinations")
-        return success_response(data)
+            response = list_response(
+                data, "international destinations", validated_fields, validated_format
+            )
+        else:
+            response = success_response(data, fields=validated_fields, response_format=validated_format)
+        return _label_cached(response, api_response)
 
     except Exception as e:
         return _handle_error(e)
@@ -111,13 +287,20 @@ async def search_international_destination(query: str) -> dict[str, Any]:
 # Flow: Province → City → District → Subdistrict → Calculate Cost
 # ============================================================================
 
-async def get_provinces() -> dict[str, Any]:
+async def get_provinces(
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Get all Indonesian provinces.
 
     This is Step 1 in the hierarchical location selection.
     Use the province_id from results to call get_cities().
 
+    Args:
+        fields: Optional comma-separated keys to keep (e.g. 'id,name').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
+
     Returns:
         List of all provinces with province_id and province name.
 
@@ -127,17 +310,22 @@ async def get_provinces() -> dict[str, Any]:
         >>> cities = await get_cities("6")  # DKI Jakarta
     """
     try:
-        api_response = await api_client.get_provinces()
-        data = extract_api_data(api_response)
-        if isinstance(data, list):
-            return list_response(data, "provinces")
-        return success_response(data)
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
+
+        return await _location_response(
+            "province", None, get_client().get_provinces, "provinces", validated_fields, validated_format
+        )
 
     except Exception as e:
         return _handle_error(e)
 
 
-async def get_cities(province_id: str) -> dict[str, Any]:
+async def get_cities(
+    province_id: str,
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Get all cities/regencies within a province.
 
@@ -147,6 +335,8 @@ async def get_cities(province_id: str) -> dict[str, Any]:
 
     Args:
         province_id: Province ID from get_provinces().
+        fields: Optional comma-separated keys to keep (e.g. 'id,name').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         List of cities within the province.
@@ -158,19 +348,24 @@ async def get_cities(province_id: str) -> dict[str, Any]:
     """
     try:
         # Validate input
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_id = validate_id(province_id, "Province ID")
 
-        api_response = await api_client.get_cities(validated_id)
-        data = extract_api_data(api_response)
-        if isinstance(data, list):
-            return list_response(data, "cities")
-        return success_response(data)
+        return await _location_response(
+            "city", validated_id, lambda: get_client().get_cities(validated_id), "cities",
+            validated_fields, validated_format,
+        )
 
     except Exception as e:
         return _handle_error(e)
 
 
-async def get_districts(city_id: str) -> dict[str, Any]:
+async def get_districts(
+    city_id: str,
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Get all districts within a city.
 
@@ -182,6 +377,8 @@ async def get_districts(city_id: str) -> dict[str, Any]:
 
     Args:
         city_id: City ID from get_cities().
+        fields: Optional comma-separated keys to keep (e.g. 'id,name').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         List of districts within the city.
@@ -195,19 +392,24 @@ async def get_districts(city_id: str) -> dict[str, Any]:
     """
     try:
         # Validate input
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_id = validate_id(city_id, "City ID")
 
-        api_response = await api_client.get_districts(validated_id)
-        data = extract_api_data(api_response)
-        if isinstance(data, list):
-            return list_response(data, "districts")
-        return success_response(data)
+        return await _location_response(
+            "district", validated_id, lambda: get_client().get_districts(validated_id), "districts",
+            validated_fields, validated_format,
+        )
 
     except Exception as e:
         return _handle_error(e)
 
 
-async def get_subdistricts(district_id: str) -> dict[str, Any]:
+async def get_subdistricts(
+    district_id: str,
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Get all subdistricts (kelurahan) within a district.
 
@@ -217,6 +419,8 @@ async def get_subdistricts(district_id: str) -> dict[str, Any]:
 
     Args:
         district_id: District ID from get_districts().
+        fields: Optional comma-separated keys to keep (e.g. 'id,name').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         List of subdistricts within the district.
@@ -226,13 +430,14 @@ async def get_subdistricts(district_id: str) -> dict[str, Any]:
     """
     try:
         # Validate input
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_id = validate_id(district_id, "District ID")
 
-        api_response = await api_client.get_subdistricts(validated_id)
-        data = extract_api_data(api_response)
-        if isinstance(data, list):
-            return list_response(data, "subdistricts")
-        return success_response(data)
+        return await _location_response(
+            "subdistrict", validated_id, lambda: get_client().get_subdistricts(validated_id), "subdistricts",
+            validated_fields, validated_format,
+        )
 
     except Exception as e:
         return _handle_error(e)
@@ -242,11 +447,62 @@ async def get_subdistricts(district_id: str) -> dict[str, Any]:
 # COST CALCULATION TOOLS
 # ============================================================================
 
+ESTIMATE_MESSAGE = "Estimated shipping cost from past quotes (not a live quote)"
+
+
+def _estimate_fallback_reason(e: Exception) -> str | None:
+    """Error code to answer with an estimate for, None to report the error."""
+    if not settings.COST_ESTIMATE_FALLBACK:
+        return None
+    if isinstance(e, (NetworkError, DeadlineExceededError)):
+        return e.code
+    if isinstance(e, APIError) and e.status_code is not None and (e.status_code == 429 or e.status_code >= 500):
+        return e.code
+    return None
+
+
+def _estimated_cost(
+    kind: str,
+    origin: str,
+    destination: str,
+    weight: int,
+    couriers: list[str],
+    reason: str,
+    fields: list[str] | None,
+    response_format: str,
+    meta: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Cost response built from the offline estimator.
+
+    Raises:
+        DataNotFoundError: If no quotes were seen for the route and couriers.
+    """
+    rows = cost_estimator.estimate(kind, origin, destination, weight, couriers)
+    if not rows:
+        raise DataNotFoundError(
+            message="No cost history to estimate from",
+            detail=f"No past quotes for {':'.join(couriers)} on {origin} -> {destination}.",
+        )
+    current_span().set_attribute("cost.estimate", reason)
+    return success_response(
+        rows,
+        message=ESTIMATE_MESSAGE,
+        meta={**(meta or {}), "estimate": True, "estimate_reason": reason},
+        fields=fields,
+        response_format=response_format,
+    )
+
+
+@priority("quote")
 async def calculate_domestic_cost(
     origin: str,
     destination: str,
     weight: int,
     courier: str,
+    fields: str | None = None,
+    response_format: str = "json",
+    estimate: bool = False,
 ) -> dict[str, Any]:
     """
     Calculate domestic shipping cost (Search Method).
@@ -258,6 +514,11 @@ async def calculate_domestic_cost(
         destination: Destination location ID (from search_domestic_destination).
         weight: Package weight in grams (1-500000).
         courier: Courier code: jne, sicepat, jnt, pos, tiki, anteraja, etc.
+        fields: Optional comma-separated keys to keep (e.g. 'code,service,cost,etd').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
+        estimate: Answer from past quotes without calling the API. Estimated
+            rows carry an 'estimate' object (low/high 95% range, samples,
+            confidence) and meta.estimate is true.
 
     Returns:
         Shipping cost options from the specified courier.
@@ -271,43 +532,78 @@ async def calculate_domestic_cost(
     """
     try:
         # Validate all inputs
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_origin = validate_id(origin, "Origin ID")
         validated_dest = validate_id(destination, "Destination ID")
         validated_weight = validate_weight(weight)
         validated_courier = validate_courier(courier, "domestic")
-
-        api_response = await api_client.calculate_domestic_cost(
-            origin=validated_origin,
-            destination=validated_dest,
-            weight=validated_weight,
-            courier=validated_courier,
-            price="lowest",
-        )
+        couriers = validated_courier.split(":")
+        if estimate:
+            return _estimated_cost(
+                "domestic", validated_origin, validated_dest, validated_weight, couriers,
+                "requested", validated_fields, validated_format,
+            )
+
+        try:
+            api_response = await get_client().calculate_domestic_cost(
+                origin=validated_origin,
+                destination=validated_dest,
+                weight=validated_weight,
+                courier=validated_courier,
+                price="lowest",
+            )
+        except RajaOngkirError as e:
+            reason = _estimate_fallback_reason(e)
+            if reason is None:
+                raise
+            return _estimated_cost(
+                "domestic", validated_origin, validated_dest, validated_weight, couriers,
+                reason, validated_fields, validated_format,
+            )
 
         data = extract_api_data(api_response)
-        return success_response(data, message="Shipping cost calculated successfully")
+        if not isinstance(api_response, CachedPayload):
+            cost_estimator.record("domestic", validated_origin, validated_dest, validated_weight, data)
+            history_store.record_quotes("domestic", validated_origin, validated_dest, validated_weight, data)
+        return _label_cached(success_response(
+            data,
+            message="Shipping cost calculated successfully",
+            fields=validated_fields,
+            response_format=validated_format,
+        ), api_response)
 
     except Exception as e:
         return _handle_error(e)
 
 
+@priority("quote")
 async def calculate_district_cost(
     origin: str,
     destination: str,
     weight: int,
     courier: str,
+    fields: str | None = None,
+    response_format: str = "json",
+    estimate: bool = False,
 ) -> dict[str, Any]:
     """
     Calculate domestic shipping cost using District IDs (Step-by-Step Method).
 
     Use this with district_id from get_districts().
-    Supports multiple couriers separated by colon (:).
+    Supports multiple couriers separated by colon (:). With LANE_PRUNE on,
+    couriers known not to serve the route are skipped and listed in
+    meta.pruned_couriers.
 
     Args:
         origin: Origin district ID (from get_districts).
         destination: Destination district ID (from get_districts).
         weight: Package weight in grams (1-500000).
         courier: Courier code(s). Single: 'jne'. Multiple: 'jne:sicepat:jnt'.
+        fields: Optional comma-separated keys to keep (e.g. 'code,service,cost,etd').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
+        estimate: Answer from past quotes without calling the API (see
+            calculate_domestic_cost).
 
     Returns:
         Shipping cost options from all specified couriers.
@@ -327,31 +623,69 @@ async def calculate_district_cost(
     """
     try:
         # Validate all inputs
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_origin = validate_id(origin, "Origin District ID")
         validated_dest = validate_id(destination, "Destination District ID")
         validated_weight = validate_weight(weight)
         validated_courier = validate_courier(courier, "domestic")
 
-        api_response = await api_client.calculate_district_domestic_cost(
-            origin=validated_origin,
-            destination=validated_dest,
-            weight=validated_weight,
-            courier=validated_courier,
-            price="lowest",
-        )
+        couriers = validated_courier.split(":")
+        pruned: list[str] = []
+        if settings.LANE_PRUNE:
+            couriers, pruned = lane_matrix.prune(validated_origin, validated_dest, couriers)
+            for code in pruned:
+                COURIERS_PRUNED.inc((code,))
+
+        meta = {"pruned_couriers": pruned} if pruned else None
+        if estimate:
+            return _estimated_cost(
+                "district", validated_origin, validated_dest, validated_weight, couriers,
+                "requested", validated_fields, validated_format, meta,
+            )
+
+        try:
+            api_response = await get_client().calculate_district_domestic_cost(
+                origin=validated_origin,
+                destination=validated_dest,
+                weight=validated_weight,
+                courier=":".join(couriers),
+                price="lowest",
+            )
+        except RajaOngkirError as e:
+            reason = _estimate_fallback_reason(e)
+            if reason is None:
+                raise
+            return _estimated_cost(
+                "district", validated_origin, validated_dest, validated_weight, couriers,
+                reason, validated_fields, validated_format, meta,
+            )
 
         data = extract_api_data(api_response)
-        return success_response(data, message="District shipping cost calculated successfully")
+        if not isinstance(api_response, CachedPayload):
+            lane_matrix.record(validated_origin, validated_dest, couriers, data)
+            cost_estimator.record("district", validated_origin, validated_dest, validated_weight, data)
+            history_store.record_quotes("district", validated_origin, validated_dest, validated_weight, data)
+        return _label_cached(success_response(
+            data,
+            message="District shipping cost calculated successfully",
+            meta=meta,
+            fields=validated_fields,
+            response_format=validated_format,
+        ), api_response)
 
     except Exception as e:
         return _handle_error(e)
 
 
+@priority("quote")
 async def calculate_international_cost(
     origin: str,
     destination: str,
     weight: int,
     courier: str,
+    fields: str | None = None,
+    response_format: str = "json",
 ) -> dict[str, Any]:
     """
     Calculate international shipping cost.
@@ -361,6 +695,8 @@ async def calculate_international_cost(
         destination: Destination country ID (from search_international_destination).
         weight: Package weight in grams (1-500000).
         courier: Courier code: pos, jne, tiki, pcp, ems.
+        fields: Optional comma-separated keys to keep (e.g. 'code,service,cost,etd').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         International shipping cost options.
@@ -374,12 +710,14 @@ async def calculate_international_cost(
     """
     try:
         # Validate all inputs
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_origin = validate_id(origin, "Origin ID")
         validated_dest = validate_id(destination, "Destination Country ID")
         validated_weight = validate_weight(weight)
         validated_courier = validate_courier(courier, "international")
 
-        api_response = await api_client.calculate_international_cost(
+        api_response = await get_client().calculate_international_cost(
             origin=validated_origin,
             destination=validated_dest,
             weight=validated_weight,
@@ -388,7 +726,12 @@ async def calculate_international_cost(
         )
 
         data = extract_api_data(api_response)
-        return success_response(data, message="International shipping cost calculated successfully")
+        return _label_cached(success_response(
+            data,
+            message="International shipping cost calculated successfully",
+            fields=validated_fields,
+            response_format=validated_format,
+        ), api_response)
 
     except Exception as e:
         return _handle_error(e)
@@ -398,32 +741,580 @@ async def calculate_international_cost(
 # TRACKING TOOL
 # ============================================================================
 
-async def track_package(awb: str, courier: str) -> dict[str, Any]:
+# Upstream statuses that mean "no such waybill for this courier"
+_TRACK_MISS_STATUSES = (400, 404, 422)
+# Failures that would fail every other candidate too
+_TRACK_STOP_ERRORS = (QuotaError, DeadlineExceededError, TenantError)
+
+
+def _has_manifest(data: Any) -> bool:
+    """Whether tracking data describes an actual shipment."""
+    return isinstance(data, dict) and bool(data.get("manifest") or data.get("summary"))
+
+
+async def _track_one(awb: str, courier: str) -> dict[str, Any] | None:
+    """Tracking answer of one candidate courier, None if it does not know the AWB."""
+    try:
+        api_response = await get_client().track_waybill(awb=awb, courier=courier)
+    except APIError as e:
+        if e.status_code in _TRACK_MISS_STATUSES:
+            return None
+        raise
+    data = extract_api_data(api_response, keys=["result", "data", "results"])
+    return api_response if _has_manifest(data) else None
+
+
+async def _track_detected(awb: str) -> tuple[dict[str, Any], str, int]:
+    """
+    Track an AWB without a courier by trying ranked candidates.
+
+    Candidates are queried TRACK_DETECT_PARALLEL at a time; the first one
+    returning a manifest wins and the rest of its group is cancelled. Only
+    a candidate answering "not found" (or rejecting the courier) is a miss.
+    A failing candidate (a 5xx, a network error) does not stop the others,
+    but is reported if none matches; a rate limit, a quota refusal or the
+    deadline stops the detection at once.
+
+    Returns:
+        Tracking answer, the matching courier and the number of couriers tried.
+
+    Raises:
+        RajaOngkirError: A rate limit, quota or deadline error as soon as it
+            happens, else the last candidate failure if no candidate matched.
+        DataNotFoundError: If no candidate knows the AWB.
+    """
+    candidates = courier_detector.rank(awb, settings.TRACK_DETECT_MAX_ATTEMPTS)
+    attempts = 0
+    error: RajaOngkirError | None = None
+    for start in range(0, len(candidates), settings.TRACK_DETECT_PARALLEL):
+        group = candidates[start:start + settings.TRACK_DETECT_PARALLEL]
+        tasks = {asyncio.ensure_future(_track_one(awb, courier)): courier for courier in group}
+        attempts += len(group)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        api_response = task.result()
+                    except RajaOngkirError as e:
+                        if isinstance(e, _TRACK_STOP_ERRORS) or (
+                            isinstance(e, APIError) and e.status_code == 429
+                        ):
+                            raise
+                        error = e
+                        continue
+                    if api_response is not None:
+                        return api_response, tasks[task], attempts
+        finally:
+            # Cancelling aborts the upstream requests and frees their slots
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if error is not None:
+        raise error
+    raise DataNotFoundError(
+        message="Could not detect the courier for this AWB",
+        detail=f"Tried {', '.join(candidates)}. Pass the courier code explicitly.",
+    )
+
+
+async def track_package(
+    awb: str,
+    courier: str | None = None,
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
     """
     Track a package by AWB (Air Waybill) / tracking number.
 
+    Without a courier, likely couriers are detected from the AWB's format
+    and tried a few at a time until one returns the shipment; the courier
+    found is reported in meta.
+
     Args:
         awb: Tracking/waybill number (5-50 characters).
         courier: Courier code: jne, sicepat, jnt, pos, tiki, anteraja, etc.
+            Optional; omit it to detect the courier.
+        fields: Optional comma-separated keys to keep (e.g. 'summary.status,manifest').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
 
     Returns:
         Tracking status and shipment history.
 
     Example:
         >>> result = await track_package("JNE1234567890", "jne")
+        >>> result = await track_package("JP1234567890")  # courier detected
     """
     try:
         # Validate inputs
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
         validated_awb = validate_awb(awb)
-        validated_courier = validate_courier(courier, "domestic")
 
-        api_response = await api_client.track_waybill(
-            awb=validated_awb,
-            courier=validated_courier,
+        meta = None
+        if courier is None or not courier.strip():
+            api_response, detected, attempts = await _track_detected(validated_awb)
+            data = extract_api_data(api_response, keys=["result", "data", "results"])
+            if not isinstance(api_response, CachedPayload):
+                courier_detector.learn(validated_awb, detected)
+                history_store.record_tracking(validated_awb, detected, data)
+            meta = {"courier": detected, "courier_detected": True, "attempts": attempts}
+        else:
+            validated_courier = validate_courier(courier, "domestic")
+            api_response = await get_client().track_waybill(
+                awb=validated_awb,
+                courier=validated_courier,
+            )
+            data = extract_api_data(api_response, keys=["result", "data", "results"])
+            fresh = not isinstance(api_response, CachedPayload)
+            if fresh and ":" not in validated_courier and _has_manifest(data):
+                courier_detector.learn(validated_awb, validated_courier)
+                history_store.record_tracking(validated_awb, validated_courier, data)
+
+        return _label_cached(success_response(
+            data,
+            message="Package tracking retrieved successfully",
+            meta=meta,
+            fields=validated_fields,
+            response_format=validated_format,
+        ), api_response)
+
+    except Exception as e:
+        return _handle_error(e)
+
+
+# ============================================================================
+# PAGING TOOL
+# ============================================================================
+
+async def get_next_page(cursor: str) -> dict[str, Any]:
+    """
+    Get the next page of a large list result.
+
+    List tools return at most one page of items. When more are available,
+    the response meta contains `next_cursor`; pass it here to continue.
+    Pages are served from memory for a few minutes after the first call.
+
+    Args:
+        cursor: The `next_cursor` value from a previous list response.
+
+    Returns:
+        The next page of items, with a new `next_cursor` if more remain.
+
+    Example:
+        >>> page = await get_subdistricts("2096")
+        >>> more = await get_next_page(page["meta"]["next_cursor"])
+    """
+    try:
+        token, offset = validate_cursor(cursor)
+        stored = result_store.get(token)
+        if stored is None or offset >= len(stored.items):
+            raise DataNotFoundError(
+                message="Cursor expired or unknown",
+                detail="Call the original list tool again to get a fresh cursor.",
+            )
+
+        return page_response(token, stored, offset)
+
+    except Exception as e:
+        return _handle_error(e)
+
+
+# ============================================================================
+# HISTORY TOOL
+# ============================================================================
+
+HISTORY_METRICS = ["cost", "transit"]
+
+
+async def query_history(
+    metric: str = "cost",
+    courier: str | None = None,
+    origin: str | None = None,
+    destination: str | None = None,
+    weight: int | None = None,
+    days: int = 30,
+    bucket: str = "week",
+    fields: str | None = None,
+    response_format: str = "json",
+) -> dict[str, Any]:
+    """
+    Aggregate recorded quotes or tracking results.
+
+    Every live cost response and tracking result is kept in the local
+    history store. This tool summarizes it per courier and period:
+
+    - metric='cost': quoted price per courier service (samples, mean,
+      median, min, max), optionally on one lane and weight bracket.
+    - metric='transit': days from ship date to delivery of delivered
+      shipments per courier.
+
+    Args:
+        metric: 'cost' (default) or 'transit'.
+        courier: Only this courier code (e.g. 'jne').
+        origin: Cost: origin ID as passed to the cost tools. Transit: origin
+            city name as shown in tracking summaries.
+        destination: Destination ID (cost) or city name (transit).
+        weight: Cost only: compare quotes in this weight's bracket (grams).
+        days: Look-back window in days (1-3650, default 30).
+        bucket: Period per row: 'day', 'week' (default), 'month' or 'all'.
+        fields: Optional comma-separated keys to keep (e.g. 'period,courier,median').
+        response_format: 'json' (default) or 'compact' (columns + rows table).
+
+    Returns:
+        One row per period and courier (and service for cost).
+
+    Example:
+        >>> # Median JNE price per month on one district lane
+        >>> stats = await query_history("cost", courier="jne", origin="1391",
+        ...                             destination="1376", weight=1000, bucket="month")
+    """
+    try:
+        validated_fields = validate_fields(fields)
+        validated_format = validate_response_format(response_format)
+        validated_metric = validate_choice(metric, HISTORY_METRICS, "metric", "cost")
+        validated_bucket = validate_choice(bucket, list(BUCKETS), "bucket", "week")
+        validated_days = validate_days(days)
+        validated_courier = validate_courier(courier, "domestic") if courier else None
+
+        if validated_metric == "cost":
+            rows = await asyncio.to_thread(
+                history_store.cost_stats,
+                courier=validated_courier,
+                origin=validate_id(origin, "Origin ID") if origin else None,
+                destination=validate_id(destination, "Destination ID") if destination else None,
+                weight=validate_weight(weight) if weight is not None else None,
+                days=validated_days,
+                bucket=validated_bucket,
+            )
+        else:
+            rows = await asyncio.to_thread(
+                history_store.transit_stats,
+                courier=validated_courier,
+                origin=origin.strip() if origin else None,
+                destination=destination.strip() if destination else None,
+                days=validated_days,
+                bucket=validated_bucket,
+            )
+
+        return success_response(
+            rows,
+            message=f"History {validated_metric} statistics retrieved successfully",
+            meta={"count": len(rows), "metric": validated_metric, "days": validated_days, "bucket": validated_bucket},
+            fields=validated_fields,
+            response_format=validated_format,
         )
 
-        data = extract_api_data(api_response, keys=["result", "data", "results"])
-        return success_response(data, message="Package tracking retrieved successfully")
+    except Exception as e:
+        return _handle_error(e)
+
+
+# ============================================================================
+# EXPORT TOOL
+# ============================================================================
+
+EXPORT_SOURCES = ["history", "live"]
+
+
+def _parse_lanes(lanes: str | None) -> list[tuple[str, str]]:
+    """Validate 'origin>destination' pairs separated by commas."""
+    pairs = [lane.strip() for lane in (lanes or "").split(",") if lane.strip()]
+    if not pairs or len(pairs) > settings.EXPORT_MAX_LANES or any(lane.count(">") != 1 for lane in pairs):
+        raise ValidationError(
+            message="Invalid lanes",
+            detail=f"Pass 1-{settings.EXPORT_MAX_LANES} district pairs like '1391>1376,1391>1400'.",
+        )
+    return [
+        (validate_id(origin, "Origin District ID"), validate_id(destination, "Destination District ID"))
+        for origin, destination in (lane.split(">") for lane in pairs)
+    ]
+
+
+async def _live_quotes(
+    lanes: list[tuple[str, str]], weight: int, courier: str, failures: list[str]
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """
+    Quote lanes EXPORT_CONCURRENCY at a time, yielding each window's rows.
+
+    Failed lanes are skipped and their error codes appended to `failures`.
+    """
+    couriers = courier.split(":")
+    for start in range(0, len(lanes), settings.EXPORT_CONCURRENCY):
+        window = lanes[start:start + settings.EXPORT_CONCURRENCY]
+        responses = await asyncio.gather(
+            *(
+                get_client().calculate_district_domestic_cost(
+                    origin=origin, destination=destination, weight=weight, courier=courier, price="lowest"
+                )
+                for origin, destination in window
+            ),
+            return_exceptions=True,
+        )
+        rows: list[dict[str, Any]] = []
+        for (origin, destination), response in zip(window, responses):
+            if isinstance(response, BaseException):
+                if not isinstance(response, RajaOngkirError):
+                    raise response
+                failures.append(response.code)
+                continue
+            data = extract_api_data(response)
+            if not isinstance(response, CachedPayload):
+                lane_matrix.record(origin, destination, couriers, data)
+                cost_estimator.record("district", origin, destination, weight, data)
+                history_store.record_quotes("district", origin, destination, weight, data)
+            if not isinstance(data, list):
+                continue
+            now = quoted_at(time.time())
+            rows.extend(
+                {
+                    "quoted_at": now, "kind": "district", "origin": origin, "destination": destination,
+                    "weight": weight, "courier": str(row.get("code", "")).lower(),
+                    "service": str(row.get("service", "")), "cost": row.get("cost"), "etd": row.get("etd"),
+                }
+                for row in data if isinstance(row, dict)
+            )
+        yield rows
+
+
+@priority("bulk")
+async def export_quotes(
+    source: str = "history",
+    file_format: str = "csv",
+    layout: str = "long",
+    columns: str | None = None,
+    separator: str = ".",
+    courier: str | None = None,
+    origin: str | None = None,
+    destination: str | None = None,
+    weight: int | None = None,
+    days: int = 30,
+    lanes: str | None = None,
+) -> dict[str, Any]:
+    """
+    Export cost quotes to a CSV or Parquet file for spreadsheet analysis.
+
+    Rows are streamed to the file, so exports of any size use little
+    memory. The file is written on the server, under the export directory.
+
+    Args:
+        source: 'history' (default) exports recorded quotes, filtered by
+            courier, origin, destination, weight bracket and days.
+            'live' quotes each of `lanes` now (district IDs, requires
+            courier and weight).
+        file_format: 'csv' (default) or 'parquet' (needs pyarrow).
+        layout: 'long' (default): one row per courier service.
+            'wide': one row per quote request, with a column per courier,
+            service and value (e.g. 'jne.REG.cost').
+        columns: Comma-separated columns in order, from quoted_at, kind,
+            origin, destination, weight, courier, service, cost, etd.
+            In the wide layout, cost and etd pick the per-service values.
+        separator: Joins courier, service and value in wide column names.
+        courier: Courier code(s); for 'live', colon-separated list to quote.
+        origin: History only: origin ID.
+        destination: History only: destination ID.
+        weight: Weight in grams (history: bracket filter; live: quoted weight).
+        days: History only: look-back window in days (default 30).
+        lanes: Live only: 'origin>destination' district pairs, comma-separated.
+
+    Returns:
+        The file path, row count, format and header.
+
+    Example:
+        >>> await export_quotes("history", "csv", layout="wide", courier="jne", days=90)
+        >>> await export_quotes("live", "parquet", courier="jne:sicepat", weight=1000,
+        ...                     lanes="1391>1376,1391>1400")
+    """
+    path = None
+    done = False
+    try:
+        validated_source = validate_choice(source, EXPORT_SOURCES, "source", "history")
+        validated_format = validate_choice(file_format, EXPORT_FORMATS, "file format", "csv")
+        validated_layout = validate_choice(layout, EXPORT_LAYOUTS, "layout", "long")
+        validated_columns = parse_columns(columns)
+        if not isinstance(separator, str) or not 1 <= len(separator) <= 3:
+            raise ValidationError(message="Invalid separator", detail="Use 1-3 characters, e.g. '.' or '_'.")
+        validated_courier = validate_courier(courier, "domestic") if courier else None
+        failures: list[str] = []
+
+        if validated_source == "history":
+            filters = {
+                "courier": validated_courier,
+                "origin": validate_id(origin, "Origin ID") if origin else None,
+                "destination": validate_id(destination, "Destination ID") if destination else None,
+                "weight": validate_weight(weight) if weight is not None else None,
+                "days": validate_days(days),
+            }
+            await history_store.flush()
+            services = None
+            if validated_layout == "wide":
+                services = await asyncio.to_thread(history_store.quote_services, **filters)
+            shape = Layout(validated_layout, validated_columns, services, separator)
+
+            # The thread outlives a cancelled await: it checks this flag and
+            # removes its own file, as `path` is not known out here yet
+            stop = threading.Event()
+
+            def run() -> tuple[str, int]:
+                quotes = (
+                    {**quote, "quoted_at": quoted_at(quote["ts"])} for quote in history_store.iter_quotes(**filters)
+                )
+                file_path, sink = open_sink(
+                    tenant_dir(settings.EXPORT_DIR), "quotes-history", validated_format, shape, settings.EXPORT_PARQUET_BATCH_ROWS
+                )
+                try:
+                    try:
+                        count = write_rows(sink, shape.rows(quotes), stop)
+                    finally:
+                        sink.close()
+                    if stop.is_set():
+                        raise CancelledError("export stopped")
+                except BaseException:
+                    os.remove(file_path)
+                    raise
+                return file_path, count
+
+            try:
+                path, count = await asyncio.to_thread(run)
+            except asyncio.CancelledError:
+                stop.set()
+                raise
+        else:
+            if validated_courier is None or weight is None:
+                raise ValidationError(
+                    message="Live export needs courier and weight",
+                    detail="Pass courier (e.g. 'jne:sicepat') and weight in grams.",
+                )
+            windows = _live_quotes(_parse_lanes(lanes), validate_weight(weight), validated_courier, failures)
+            first = await anext(windows, [])
+            services = [(row["courier"], row["service"]) for row in first]
+            shape = Layout(validated_layout, validated_columns, services, separator)
+            path, sink = open_sink(
+                tenant_dir(settings.EXPORT_DIR), "quotes-live", validated_format, shape, settings.EXPORT_PARQUET_BATCH_ROWS
+            )
+            try:
+                count = write_rows(sink, shape.rows(first))
+                async for rows in windows:
+                    count += write_rows(sink, shape.rows(rows))
+            finally:
+                sink.close()
+
+        meta: dict[str, Any] = {"source": validated_source, "layout": validated_layout}
+        if shape.unmapped:
+            meta["unmapped_quotes"] = shape.unmapped
+        if failures:
+            meta["failed_lanes"] = len(failures)
+            meta["failure_codes"] = sorted(set(failures))
+        done = True
+        return success_response(
+            {"path": path, "rows": count, "format": validated_format, "columns": shape.header},
+            message="Quotes exported successfully",
+            meta=meta,
+        )
+
+    except Exception as e:
+        return _handle_error(e)
+
+    finally:
+        # No partial files after errors or a passed deadline
+        if not done and path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+# ============================================================================
+# OBSERVABILITY TOOL
+# ============================================================================
+
+async def get_server_metrics() -> dict[str, Any]:
+    """
+    Get server performance metrics.
+
+    Includes per-tool and per-endpoint latency (count, mean, p50/p95/p99),
+    upstream status codes and timeouts, in-flight calls, cache hit ratios
+    and event loop lag.
+    The same data is available as Prometheus text from the
+    `metrics://prometheus` resource.
+
+    Returns:
+        Current metric values keyed by metric name.
+
+    Example:
+        >>> metrics = await get_server_metrics()
+    """
+    try:
+        return success_response(
+            {**registry.snapshot(), "cache_hit_ratios": cache_hit_ratios()},
+            message="Server metrics retrieved successfully",
+        )
+
+    except Exception as e:
+        return _handle_error(e)
+
+
+async def get_api_key_usage() -> dict[str, Any]:
+    """
+    Get the usage of each pooled RajaOngkir API key.
+
+    Requests are spread over the keys in RAJAONGKIR_API_KEYS (and
+    RAJAONGKIR_API_KEY) by remaining daily quota and recent rate limiting.
+    Keys are shown by label and last 4 characters only. In multi-tenant
+    mode these are the keys the calling tenant's requests use.
+
+    Returns:
+        Per key: requests today, daily quota and remaining requests,
+        recent 429 rate, rest time left after a 429, whether it is enabled
+        (401/403 disable a key for a while) and the last HTTP status.
+        In multi-tenant mode meta.tenant holds the tenant's requests
+        today, quota, rate limit and refused requests.
+
+    Example:
+        >>> usage = await get_api_key_usage()
+    """
+    try:
+        client = get_client()
+        keys = client.keys.usage()
+        meta: dict[str, Any] = {"count": len(keys), "used_today": sum(key["used_today"] for key in keys)}
+        if client.limiter is not None:
+            meta["tenant"] = client.limiter.usage()
+        return success_response(
+            keys,
+            message=f"{sum(key['enabled'] for key in keys)} of {len(keys)} API keys enabled",
+            meta=meta,
+        )
+
+    except Exception as e:
+        return _handle_error(e)
+
+
+async def get_quota_status() -> dict[str, Any]:
+    """
+    Get today's upstream call budget: current and projected usage.
+
+    Upstream calls are counted per endpoint against the daily limit
+    (RAJAONGKIR_QUOTA_DAILY_LIMIT, or the sum of the API keys' daily
+    quotas). As the budget shrinks, or the current rate would use it up
+    before midnight WIB, the server degrades step by step: it reuses
+    cached answers for longer ("conserve"), serves older cached answers
+    ("stale"), then refuses low-priority tools ("shed"). In multi-tenant
+    mode this is the budget of the calling tenant's keys.
+
+    Returns:
+        Calls used today, the daily limit and calls left, the recent rate
+        per minute, the projected total for today, seconds until the
+        budget runs out at that rate (null if it lasts the day), the
+        policy in force, the cache age reused under it and calls per
+        endpoint.
+
+    Example:
+        >>> status = await get_quota_status()
+    """
+    try:
+        status = get_client().quota.status()
+        return success_response(
+            status,
+            message=f"Quota policy: {status['policy']}",
+        )
 
     except Exception as e:
         return _handle_error(e)
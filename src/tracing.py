@@ -0,0 +1,279 @@
+"""
+Tracing Module
+==============
+Lightweight spans from the MCP tool call down to the upstream HTTP request.
+
+A trace starts at the tool span and is sampled once, at its root
+(TRACE_SAMPLE_RATE); child spans (validation, HTTP request, response
+decoding) follow the root's decision. Unsampled calls only pay for a
+context variable lookup.
+
+Finished spans go to a pluggable exporter. Built-in exporters write to
+stderr (console) or to a JSON Lines file, so no collector is needed; any
+object with export(span) and shutdown() can be installed with
+set_exporter().
+"""
+
+import functools
+import json
+import os
+import random
+import sys
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from typing import Any, Protocol
+
+from .config import settings
+from .lifecycle import on_shutdown
+
+
+class Span:
+    """A timed operation with attributes, part of a trace."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id",
+        "start_ns", "end_ns", "attributes", "status",
+    )
+
+    sampled = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: dict[str, Any] = {}
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute to the span."""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict[str, Any]) -> None:
+        """Attach several attributes to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-friendly representation."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in for spans of unsampled traces; all operations are no-ops."""
+
+    __slots__ = ()
+
+    sampled = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict[str, Any]) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Span | _NoopSpan | None] = ContextVar("rajaongkir_span", default=None)
+
+
+class SpanExporter(Protocol):
+    """Receives finished spans."""
+
+    def export(self, span: Span) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class ConsoleExporter:
+    """Writes one line per span to stderr (stdout carries the stdio transport)."""
+
+    def export(self, span: Span) -> None:
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        print(
+            f"[trace {span.trace_id[:8]}] {span.name} {span.duration_ms:.2f}ms "
+            f"{span.status} {attributes}",
+            file=sys.stderr,
+        )
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesExporter:
+    """Appends spans as JSON lines to a file, buffered to avoid a write per span."""
+
+    def __init__(self, path: str, buffer_size: int = 64) -> None:
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer: list[str] = []
+
+    def export(self, span: Span) -> None:
+        self._buffer.append(json.dumps(span.to_dict(), default=str))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._buffer) + "\n")
+        self._buffer.clear()
+
+    def shutdown(self) -> None:
+        self.flush()
+
+
+class _NullExporter:
+    """Discards spans."""
+
+    def export(self, span: Span) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+class _SpanContext:
+    """Context manager that starts, activates and ends one span."""
+
+    __slots__ = ("tracer", "span", "token")
+
+    def __init__(self, tracer: "Tracer", span: Span) -> None:
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        _current_span.reset(self.token)
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc_type is not None:
+            span.status = "error"
+            span.attributes.setdefault("error", exc_type.__name__)
+        self.tracer.exporter.export(span)
+
+
+class _UnsampledContext:
+    """Marks a trace as unsampled so its children skip span creation."""
+
+    __slots__ = ("token",)
+
+    def __enter__(self) -> _NoopSpan:
+        self.token = _current_span.set(NOOP_SPAN)
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        _current_span.reset(self.token)
+
+
+class _NoopContext:
+    """Context manager used inside unsampled traces: does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+_NOOP_CONTEXT = _NoopContext()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter."""
+
+    def __init__(self, sample_rate: float, exporter: SpanExporter) -> None:
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def span(self, name: str, attributes: dict[str, Any] | None = None) -> Any:
+        """
+        Start a span as a context manager.
+
+        A span without an active parent starts a new trace and makes the
+        sampling decision for it; nested spans inherit that decision.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate <= 0.0:
+                return _NOOP_CONTEXT
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledContext()
+            span = Span(name, os.urandom(16).hex(), None)
+        elif not parent.sampled:
+            return _NOOP_CONTEXT
+        else:
+            span = Span(name, parent.trace_id, parent.span_id)
+
+        if attributes:
+            span.attributes.update(attributes)
+        return _SpanContext(self, span)
+
+
+def current_span() -> Span | _NoopSpan:
+    """The active span, or a no-op span outside sampled traces."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator that runs a synchronous function inside a child span."""
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            parent = _current_span.get()
+            if parent is None or not parent.sampled:
+                return fn(*args, **kwargs)
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def create_exporter(kind: str, path: str) -> SpanExporter:
+    """Build an exporter from its config name: console, file or none."""
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "file":
+        return JsonLinesExporter(path)
+    return _NullExporter()
+
+
+def set_exporter(exporter: SpanExporter) -> None:
+    """Install a custom exporter (e.g. a bridge to an OpenTelemetry SDK)."""
+    tracer.exporter.shutdown()
+    tracer.exporter = exporter
+
+
+# Global tracer instance
+tracer = Tracer(
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    exporter=create_exporter(settings.TRACE_EXPORTER, settings.TRACE_FILE),
+)
+on_shutdown(lambda: tracer.exporter.shutdown())
@@ -5,6 +5,9 @@ Input validation functions for all tools.
 """
 
 from .exceptions import ValidationError
+from .response import RESPONSE_FORMATS
+from .result_store import parse_cursor
+from .tracing import traced
 
 
 # Supported couriers for domestic shipping
@@ -18,6 +21,7 @@ DOMESTIC_COURIERS = [
 INTERNATIONAL_COURIERS = ["pos", "jne", "tiki", "pcp", "ems"]
 
 
+@traced("validate.query")
 def validate_query(query: str, min_length: int = 1) -> str:
     """
     Validate search query string.
@@ -48,6 +52,7 @@ def validate_query(query: str, min_length: int = 1) -> str:
     return cleaned
 
 
+@traced("validate.id")
 def validate_id(value: str | int, field_name: str = "ID") -> str:
     """
     Validate and convert ID to string.
@@ -85,6 +90,7 @@ def validate_id(value: str | int, field_name: str = "ID") -> str:
     return str_value
 
 
+@traced("validate.weight")
 def validate_weight(weight: int) -> int:
     """
     Validate package weight in grams.
@@ -122,6 +128,26 @@ def validate_weight(weight: int) -> int:
     return weight
 
 
+# Upper bounds (grams, inclusive) of the weight brackets used to group
+# calls in traces and statistics; heavier packages fall in the last one
+WEIGHT_BRACKETS = [(1000, "0-1kg"), (5000, "1-5kg"), (20000, "5-20kg"), (100000, "20-100kg")]
+
+
+def weight_bracket(weight: int) -> str:
+    """
+    Bracket label for a weight in grams.
+
+    Example:
+        >>> weight_bracket(1500)
+        '1-5kg'
+    """
+    for upper, label in WEIGHT_BRACKETS:
+        if weight <= upper:
+            return label
+    return ">100kg"
+
+
+@traced("validate.courier")
 def validate_courier(
     courier: str,
     courier_type: str = "domestic",
@@ -174,6 +200,7 @@ def validate_courier(
     return ":".join(courier_list)
 
 
+@traced("validate.awb")
 def validate_awb(awb: str) -> str:
     """
     Validate AWB (Air Waybill) / tracking number.
@@ -207,3 +234,155 @@ def validate_awb(awb: str) -> str:
         )
 
     return cleaned
+
+
+@traced("validate.fields")
+def validate_fields(fields: str | list[str] | None) -> list[str] | None:
+    """
+    Validate a field selector for response projection.
+
+    Args:
+        fields: Comma-separated keys (e.g. 'id,name') or a list of keys.
+            Dotted paths such as 'summary.status' reach into nested objects.
+
+    Returns:
+        List of field names, or None to keep all fields.
+
+    Raises:
+        ValidationError: If a field name is malformed.
+    """
+    if fields is None:
+        return None
+
+    if isinstance(fields, str):
+        field_list = [f.strip() for f in fields.split(",") if f.strip()]
+    elif isinstance(fields, list):
+        field_list = [str(f).strip() for f in fields if str(f).strip()]
+    else:
+        raise ValidationError(
+            message="Invalid fields selector",
+            detail="Fields must be a comma-separated string, e.g. 'id,name'.",
+        )
+
+    if not field_list:
+        return None
+
+    invalid_fields = [
+        f for f in field_list
+        if not all(part.replace("_", "").isalnum() for part in f.split("."))
+    ]
+    if invalid_fields:
+        raise ValidationError(
+            message=f"Invalid field name(s): {', '.join(invalid_fields)}",
+            detail="Field names may only contain letters, digits, '_' and '.'.",
+        )
+
+    # Drop duplicates, keep order
+    return list(dict.fromkeys(field_list))
+
+
+@traced("validate.response_format")
+def validate_response_format(response_format: str | None) -> str:
+    """
+    Validate the response encoding option.
+
+    Args:
+        response_format: 'json' or 'compact'.
+
+    Returns:
+        Normalized format name.
+
+    Raises:
+        ValidationError: If format is not supported.
+    """
+    cleaned = (response_format or "json").strip().lower()
+    if cleaned not in RESPONSE_FORMATS:
+        raise ValidationError(
+            message=f"Invalid response format: {response_format}",
+            detail=f"Valid formats: {', '.join(RESPONSE_FORMATS)}",
+        )
+
+    return cleaned
+
+
+@traced("validate.cursor")
+def validate_cursor(cursor: str) -> tuple[str, int]:
+    """
+    Validate a list paging cursor.
+
+    Args:
+        cursor: The `next_cursor` value from a list response.
+
+    Returns:
+        Tuple of (result token, page offset).
+
+    Raises:
+        ValidationError: If cursor is malformed.
+    """
+    parsed = parse_cursor(cursor) if isinstance(cursor, str) else None
+    if parsed is None:
+        raise ValidationError(
+            message="Invalid cursor",
+            detail="Pass the exact `next_cursor` value from a list response.",
+        )
+
+    return parsed
+
+
+@traced("validate.choice")
+def validate_choice(value: str | None, choices: list[str], field_name: str, default: str) -> str:
+    """
+    Validate an option that must be one of a fixed set of names.
+
+    Args:
+        value: The option (None or empty for the default).
+        choices: Accepted names.
+        field_name: Name for error messages.
+        default: Value used when none is given.
+
+    Returns:
+        Normalized option name.
+
+    Raises:
+        ValidationError: If the option is not one of `choices`.
+    """
+    cleaned = (value or default).strip().lower()
+    if cleaned not in choices:
+        raise ValidationError(
+            message=f"Invalid {field_name}: {value}",
+            detail=f"Valid values: {', '.join(choices)}",
+        )
+
+    return cleaned
+
+
+@traced("validate.days")
+def validate_days(days: int, maximum: int = 3650) -> int:
+    """
+    Validate a look-back window in days.
+
+    Args:
+        days: Number of days.
+        maximum: Largest accepted window.
+
+    Returns:
+        Validated number of days.
+
+    Raises:
+        ValidationError: If days is not a number in 1..maximum.
+    """
+    try:
+        days = int(days)
+    except (ValueError, TypeError):
+        raise ValidationError(
+            message="Days must be a number",
+            detail=f"Got invalid days value: '{days}'",
+        )
+
+    if not 1 <= days <= maximum:
+        raise ValidationError(
+            message="Days out of range",
+            detail=f"Use a window between 1 and {maximum} days.",
+        )
+
+    return days